@@ -0,0 +1,116 @@
+"""
+Benchmark: concurrent reads through the sync and the async database
+paths. The sync path runs the CRUD method in the threadpool the way
+Starlette runs a plain `def` endpoint (40 threads by default). The async
+one awaits its `_async` counterpart on the event loop with asyncpg.
+
+Both queries go to the database on every request:
+
+- show:  `buoy.show` / `show_async`, the lookup behind /moored/buoys/{buoy_id}.
+- index: `qualified_data.index` / `index_async`, the first `--limit`
+  rows of a buoy in the pagination order, i.e. one page of /qualified_data.
+
+`/qualified_data/last` is not measured: since the latest observation
+store it is answered from memory and never reaches the database.
+
+It needs the Postgres database of the REMOBS_QC_DB_* variables, holding
+the moored and qualified_data schemas:
+
+    python benchmarks/bench_async_load.py --query index --buoy-id 2 --requests 2000 --concurrency 200
+"""
+import argparse
+import asyncio
+import time
+
+import anyio
+from fastapi import HTTPException
+
+from pnboia_api.crud.crud_moored import buoy
+from pnboia_api.crud.crud_qualified_data import qualified_data
+from pnboia_api.db.base import AsyncSessionLocal, SessionLocal
+
+
+def show(db, buoy_id, limit):
+    return buoy.show(db=db, id_pk=buoy_id)
+
+
+async def show_async(db, buoy_id, limit):
+    return await buoy.show_async(db=db, id_pk=buoy_id)
+
+
+def index(db, buoy_id, limit):
+    return qualified_data.index(db=db, order=True, limit=limit, arguments={'buoy_id=': buoy_id})
+
+
+async def index_async(db, buoy_id, limit):
+    return await qualified_data.index_async(db=db, order=True, limit=limit, arguments={'buoy_id=': buoy_id})
+
+
+QUERIES = {
+    'show': (show, show_async),
+    'index': (index, index_async),
+}
+
+
+def sync_request(query, *args):
+    db = SessionLocal()
+    try:
+        return query(db, *args)
+    except HTTPException:
+        return []
+    finally:
+        db.close()
+
+
+async def async_request(query, *args):
+    async with AsyncSessionLocal() as db:
+        try:
+            return await query(db, *args)
+        except HTTPException:
+            return []
+
+
+async def run(name, request, total, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            await request()
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2]
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"  {name:<6} {total / elapsed:8.0f} req/s   p50 {p50 * 1000:7.1f} ms   p99 {p99 * 1000:7.1f} ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--query", choices=QUERIES, default="index")
+    parser.add_argument("--buoy-id", type=int, default=2)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    args = parser.parse_args()
+
+    sync_query, async_query = QUERIES[args.query]
+
+    async def threaded():
+        return await anyio.to_thread.run_sync(sync_request, sync_query, args.buoy_id, args.limit)
+
+    async def awaited():
+        return await async_request(async_query, args.buoy_id, args.limit)
+
+    print(f"{args.query}: {args.requests} requests, {args.concurrency} concurrent")
+    await run("sync", threaded, args.requests, args.concurrency)
+    await run("async", awaited, args.requests, args.concurrency)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,129 @@
+"""
+Benchmark: flag=all masking of a 30 day window on a 180 column
+qualified-data-like table. The old path fetches ORM rows and masks them
+through a pandas DataFrame. The new one lets the query mask the values
+with CASE expressions (CRUDBase.masked_columns).
+
+It runs on an in-memory SQLite copy of the table, so absolute numbers
+are not Postgres numbers; the difference between the two paths is what
+the benchmark is for.
+
+    python benchmarks/bench_flag_masking.py --days 30 --rows-per-day 144
+"""
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+# the engine in pnboia_api.db.base is created on import but never connected here
+for var in ("REMOBS_QC_DB_USR", "REMOBS_QC_DB_PASSWORD", "REMOBS_QC_DB_URL", "REMOBS_QC_DB"):
+    os.environ.setdefault(var, "benchmark")
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import Column, DateTime, Float, Integer, SmallInteger, create_engine, insert
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import Session
+
+from pnboia_api.crud.base import CRUDBase
+
+PARAMETERS = 89
+
+Base = declarative_base()
+
+attributes = {
+    "__tablename__": "qualified_bench",
+    "id": Column(Integer, primary_key=True),
+    "buoy_id": Column(Integer),
+    "date_time": Column(DateTime, index=True),
+    "latitude": Column(Float),
+    "longitude": Column(Float),
+    "flag_latitude": Column(SmallInteger),
+    "flag_longitude": Column(SmallInteger),
+}
+for i in range(PARAMETERS):
+    attributes[f"param{i}"] = Column(Float)
+    attributes[f"flag_param{i}"] = Column(SmallInteger)
+
+QualifiedBench = type("QualifiedBench", (Base,), attributes)
+
+
+def populate(db, days, rows_per_day):
+    start = datetime(2024, 1, 1)
+    step = timedelta(days=1) / rows_per_day
+    rows = []
+    for n in range(days * rows_per_day):
+        row = {"id": n, "buoy_id": 1, "date_time": start + n * step,
+               "latitude": -25.0, "longitude": -45.0, "flag_latitude": 0, "flag_longitude": 0}
+        for i in range(PARAMETERS):
+            row[f"param{i}"] = random.random()
+            row[f"flag_param{i}"] = random.choice((0, 0, 0, 0, 0, 0, 1, 4, 50))
+        rows.append(row)
+    db.execute(insert(QualifiedBench.__table__), rows)
+    db.commit()
+    return start, start + days * timedelta(days=1)
+
+
+def pandas_masking(crud, db, arguments, flag):
+    """The masking done in qualified_data_index before it moved to SQL."""
+    result = crud.index(db=db, order=True, arguments=arguments)
+    result_dict = []
+    for r in result:
+        result_dict.append(vars(r))
+    result_df = pd.DataFrame(result_dict)
+    column_flag = []
+    for column in result_df.columns:
+        if column[0:4] == "flag":
+            column_flag.append(column.split("_")[1])
+    for c in column_flag:
+        if c not in ['latitude', 'longitude']:
+            if flag == 'all':
+                result_df.loc[result_df[f"flag_{c}"]>0, f'{c}'] = np.nan
+            elif flag == 'soft':
+                result_df.loc[(result_df[f"flag_{c}"]>0)&(result_df[f"flag_{c}"]<50), f'{c}'] = np.nan
+    result_dict = result_df.to_dict(orient='records')
+    for idx, r in enumerate(result):
+        for key,value in result_dict[idx].items():
+            if value == np.nan:
+                delattr(result[idx],key)
+                delattr(result[idx],f"flag_{key}")
+    return result
+
+
+def sql_masking(crud, db, arguments, flag):
+    return crud.index(db=db, order=True, arguments=arguments, flag=flag)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--rows-per-day", type=int, default=144)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--flag", choices=("all", "soft"), default="all")
+    args = parser.parse_args()
+
+    random.seed(0)
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    crud = CRUDBase(QualifiedBench)
+
+    with Session(bind=engine) as db:
+        start, end = populate(db, args.days, args.rows_per_day)
+
+    arguments = {'buoy_id=': 1, 'date_time>=': start.isoformat(), 'date_time<=': end.isoformat()}
+    columns = len(QualifiedBench.__table__.c)
+    print(f"{args.days} days x {args.rows_per_day} rows/day, {columns} columns, flag={args.flag}")
+
+    for name, masking in (("pandas", pandas_masking), ("sql case", sql_masking)):
+        timings = []
+        for _ in range(args.repeat):
+            with Session(bind=engine) as db:
+                started = time.perf_counter()
+                rows = masking(crud, db, arguments, args.flag)
+                timings.append(time.perf_counter() - started)
+        print(f"{name:<9} best {min(timings) * 1000:8.1f} ms   median {sorted(timings)[len(timings) // 2] * 1000:8.1f} ms   rows {len(rows)}")
+
+
+if __name__ == "__main__":
+    main()
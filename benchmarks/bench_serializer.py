@@ -0,0 +1,92 @@
+"""
+Benchmark: JSON serialization of wide qualified-data rows. The old path
+builds and validates a pydantic model per row
+(`schema.from_orm(row).json(by_alias=True)`). The new one renders the row
+with the precomputed field list of `RowSerializer`.
+
+The rows are transient ORM instances filled with values of the column
+types (Decimal for Numeric, int, datetime), so no database is needed.
+Both paths are checked to produce the same JSON before they are timed.
+
+    python benchmarks/bench_serializer.py --rows 20000
+"""
+import argparse
+import json
+import os
+import random
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+# the engine in pnboia_api.db.base is created on import but never connected here
+for var in ("REMOBS_QC_DB_USR", "REMOBS_QC_DB_PASSWORD", "REMOBS_QC_DB_URL", "REMOBS_QC_DB"):
+    os.environ.setdefault(var, "benchmark")
+
+from sqlalchemy import Boolean, DateTime, Integer, Numeric, SmallInteger
+
+from pnboia_api.app.utils import RowSerializer
+from pnboia_api.models.qualified_data import BMOBrQualified, QualifiedData
+from pnboia_api.schemas.qualified_data import BMOBrQualifiedSchema, QualifiedDataBase
+
+CASES = (
+    ("bmobr_qualified", BMOBrQualified, BMOBrQualifiedSchema),
+    ("qualified_data", QualifiedData, QualifiedDataBase),
+)
+
+
+def column_value(column, n):
+    if isinstance(column.type, Boolean):
+        return random.random() < 0.5
+    if isinstance(column.type, DateTime):
+        return datetime(2024, 1, 1) + timedelta(minutes=10 * n)
+    if isinstance(column.type, (Integer, SmallInteger)):
+        return random.randint(0, 360)
+    if isinstance(column.type, Numeric):
+        return Decimal(f"{random.uniform(-100, 100):.3f}")
+    return None
+
+
+def make_rows(model, count):
+    rows = []
+    for n in range(count):
+        values = {column.key: column_value(column, n) for column in model.__table__.c}
+        rows.append(model(**values))
+    return rows
+
+
+def pydantic_path(rows, schema):
+    return [schema.from_orm(row).json(by_alias=True) for row in rows]
+
+
+def serializer_path(rows, schema):
+    serializer = RowSerializer.for_schema(schema)
+    return [serializer.dumps(row) for row in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    random.seed(0)
+
+    for name, model, schema in CASES:
+        rows = make_rows(model, args.rows)
+        print(f"{name}: {args.rows} rows, {len(schema.__fields__)} fields")
+
+        expected = [json.loads(row) for row in pydantic_path(rows[:100], schema)]
+        assert [json.loads(row) for row in serializer_path(rows[:100], schema)] == expected
+
+        for path_name, path in (("pydantic", pydantic_path), ("serializer", serializer_path)):
+            timings = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                path(rows, schema)
+                timings.append(time.perf_counter() - started)
+            best = min(timings)
+            print(f"  {path_name:<11} best {best * 1000:8.1f} ms   {args.rows / best:10.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,8 @@ from fastapi import FastAPI, APIRouter
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.responses import RedirectResponse
 
-from pnboia_api.app.v1 import auth, info, moored, drift, qualified_data, quality_control, sailbuoy
+from pnboia_api.app.compression import CompressionMiddleware
+from pnboia_api.app.v1 import auth, info, moored, drift, qualified_data, quality_control, sailbuoy, stats, stream
 
 
 app = FastAPI(title="PNBOIA API", openapi_url="/openapi.json")
@@ -12,9 +13,12 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-High-Water-Mark"],
     allow_credentials=True,
 )
 
+app.add_middleware(CompressionMiddleware)
+
 
 @app.get("/")
 def main():
@@ -34,6 +38,8 @@ app.include_router(qualified_data.router, prefix="/v1/qualified_data", tags=["qu
 app.include_router(info.router, prefix="/v1/info", tags=["info"])
 app.include_router(quality_control.router, prefix="/v1/quality_control", tags=["quality_control"])
 app.include_router(sailbuoy.router, prefix="/v1/sailbuoy", tags=["sailbuoy"])
+app.include_router(stats.router, prefix="/v1/stats", tags=["stats"])
+app.include_router(stream.router, prefix="/v1/stream", tags=["stream"])
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
 
 #######################
@@ -1,5 +1,62 @@
-from typing import Generator, Optional
-from  pnboia_api.db.base import SessionLocal
+import os
+from typing import AsyncGenerator, Generator
+
+from fastapi import Request
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from starlette.concurrency import run_in_threadpool
+
+from pnboia_api.core.cache import TTLCache
+from  pnboia_api.db.base import (
+    AsyncReplicaSessionLocal, AsyncSessionLocal, ReplicaSessionLocal, SessionLocal, engine, replica_engine
+)
+
+READ_METHODS = ('GET', 'HEAD')
+
+# reads by a token that wrote less than this many seconds ago go to the primary
+REPLICA_READ_AFTER_WRITE = int(os.getenv('REPLICA_READ_AFTER_WRITE', 10))
+# above this replication lag every read goes to the primary
+REPLICA_MAX_LAG = float(os.getenv('REPLICA_MAX_LAG', 30))
+REPLICA_LAG_CHECK = int(os.getenv('REPLICA_LAG_CHECK', 5))
+
+# recent writers are remembered per worker process: a read served by
+# another worker than the write may still go to the replica and miss the
+# write, for as long as the replication lag. Read-after-write across
+# workers needs the balancer to send each token to the same worker.
+recent_writes = TTLCache(maxsize=4096, ttl=REPLICA_READ_AFTER_WRITE, name='recent_writes')
+replica_lag_cache = TTLCache(maxsize=1, ttl=REPLICA_LAG_CHECK)
+
+# 0 when the standby has replayed everything it received, so an idle
+# primary does not look like lag
+REPLICA_LAG_QUERY = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE extract(epoch FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+
+def replica_lag() -> float:
+    """Replication lag of the replica in seconds, checked every REPLICA_LAG_CHECK seconds."""
+    lag = replica_lag_cache.get('lag')
+    if lag is None:
+        try:
+            with replica_engine.connect() as connection:
+                lag = float(connection.execute(REPLICA_LAG_QUERY).scalar() or 0)
+        except SQLAlchemyError:
+            lag = float('inf')
+        replica_lag_cache.set('lag', lag)
+    return lag
+
+
+def request_writer(request: Request) -> str:
+    return request.query_params.get('token') or (request.client.host if request.client else '')
+
+
+def use_replica(request: Request) -> bool:
+    if replica_engine is engine or request.method not in READ_METHODS:
+        return False
+    if recent_writes.get(request_writer(request)):
+        return False
+    return replica_lag() <= REPLICA_MAX_LAG
 
 
 def get_db() -> Generator:
@@ -10,3 +67,29 @@ def get_db() -> Generator:
     finally:
         db.close()
 
+
+def get_routed_db(request: Request) -> Generator:
+    """
+    `get_db` that opens GET/HEAD requests on the read replica and every
+    other method on the primary. Reads from a token that wrote in the last
+    REPLICA_READ_AFTER_WRITE seconds, and all reads while the replica lags
+    more than REPLICA_MAX_LAG, stay on the primary.
+    """
+    db = ReplicaSessionLocal() if use_replica(request) else SessionLocal()
+    db.current_user_id = None
+    try:
+        yield db
+    finally:
+        db.close()
+        if request.method not in READ_METHODS:
+            recent_writes.set(request_writer(request), True)
+
+
+async def get_async_db(request: Request) -> AsyncGenerator:
+    replica = replica_engine is not engine and await run_in_threadpool(use_replica, request)
+    db = AsyncReplicaSessionLocal() if replica else AsyncSessionLocal()
+    db.current_user_id = None
+    try:
+        yield db
+    finally:
+        await db.close()
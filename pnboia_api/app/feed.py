@@ -0,0 +1,200 @@
+import asyncio
+import os
+from operator import attrgetter
+from typing import Dict, FrozenSet, Iterable, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from pnboia_api.app.deps import REPLICA_MAX_LAG, replica_lag
+from pnboia_api.crud.crud_qualified_data import bmobr_qualified_data, qualified_data
+from pnboia_api.db.base import ReplicaSessionLocal, SessionLocal
+from pnboia_api.models.qualified_data import SYNOPTIC_HOURS
+
+STREAM_POLL_INTERVAL = float(os.getenv('STREAM_POLL_INTERVAL', 5))
+STREAM_QUEUE_SIZE = int(os.getenv('STREAM_QUEUE_SIZE', 100))
+# changed rows read per query by a poll or a replay
+STREAM_POLL_LIMIT = int(os.getenv('STREAM_POLL_LIMIT', 1000))
+
+# every feed, so /v1/stats can report them
+feeds: Dict[str, "ObservationFeed"] = {}
+
+
+def synoptic_buoys(user, buoys: Iterable) -> FrozenSet[int]:
+    """
+    The ids of the `buoys` of which `user` only sees the synoptic hours:
+    the project 2 buoys, for users other than admin and petrobras, as the
+    REST endpoints restrict them with `synoptic=True`.
+    """
+    if user.user_type in ['admin', 'petrobras']:
+        return frozenset()
+    return frozenset(buoy.buoy_id for buoy in buoys if buoy.project_id == 2)
+
+
+class Subscription:
+    """
+    The rows waiting to be sent to one client, for its `buoy_ids` (None
+    for all) and changed after `since` (the change_id of the last row the
+    client has, None for a new client). Of the buoys in `synoptic`, only
+    the rows of the synoptic hours are sent.
+    """
+
+    def __init__(self, buoy_ids: Optional[Iterable[int]] = None, since: int = None, synoptic: Iterable[int] = ()):
+        self.buoy_ids = frozenset(buoy_ids) if buoy_ids is not None else None
+        self.synoptic = frozenset(synoptic)
+        self.since = since
+        self.queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+
+    def visible(self, row) -> bool:
+        """Whether the client may see `row`, whenever it changed."""
+        if self.buoy_ids is not None and row.buoy_id not in self.buoy_ids:
+            return False
+        return row.buoy_id not in self.synoptic or row.date_time.hour in SYNOPTIC_HOURS
+
+    def wants(self, row) -> bool:
+        if self.since is not None and (getattr(row, 'change_id', None) or 0) <= self.since:
+            return False
+        return self.visible(row)
+
+    def put(self, row) -> bool:
+        """Queue `row`; False when the oldest row had to be dropped for it."""
+        dropped = False
+        # a client that stopped reading loses its own oldest rows
+        if self.queue.full():
+            self.queue.get_nowait()
+            dropped = True
+        self.queue.put_nowait(row)
+        return not dropped
+
+
+class ObservationFeed:
+    """
+    New and updated observations of a qualified table pushed to the
+    clients of /v1/stream.
+
+    A single watcher task per worker reads the changes of the table
+    (`CRUDBase.changes`) past its high-water mark every `interval`
+    seconds, and queues every changed row for the subscriptions of its
+    buoy, so rows written between two polls are all sent. The first poll
+    starts from the current high-water mark with the latest row of every
+    buoy (`LatestObservationStore`). The task is started by the first
+    subscription and stops when the last one is closed.
+
+    The rows carry their change_id, which a client reconnecting sends
+    back to be replayed the changes it missed (`replay`).
+    """
+
+    def __init__(self, crud, name: str, interval: float = STREAM_POLL_INTERVAL):
+        self.crud = crud
+        self.name = name
+        self.interval = interval
+        self.subscriptions = set()
+        self.latest = {}
+        self.high_water_mark = None
+        self.task = None
+        self.polls = 0
+        self.published = 0
+        self.dropped = 0
+        self.errors = 0
+
+        feeds[name] = self
+
+    def subscribe(self, buoy_ids: Optional[Iterable[int]] = None, since: int = None, synoptic: Iterable[int] = ()) -> Subscription:
+        """
+        Open a subscription, starting with the last observation seen of
+        each buoy, or only with the rows changed after `since`.
+        """
+        subscription = Subscription(buoy_ids, since=since, synoptic=synoptic)
+        if since is None:
+            for row in self.latest.values():
+                if subscription.wants(row):
+                    subscription.put(row)
+
+        self.subscriptions.add(subscription)
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self.watch())
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self.subscriptions.discard(subscription)
+
+    async def watch(self) -> None:
+        while self.subscriptions:
+            try:
+                rows = await run_in_threadpool(self.poll)
+            except Exception:
+                # the database is unreachable: keep the clients and retry
+                self.errors += 1
+            else:
+                self.publish(rows)
+            await asyncio.sleep(self.interval)
+
+    def session(self):
+        """A session on the replica, or on the primary while the replica lags more than REPLICA_MAX_LAG."""
+        return ReplicaSessionLocal() if replica_lag() <= REPLICA_MAX_LAG else SessionLocal()
+
+    def check(self) -> None:
+        """Raise a 501 when the table is not set up for `changes`, before a stream is opened."""
+        db = self.session()
+        try:
+            self.crud.check_change_tracking(db)
+        finally:
+            db.close()
+
+    def poll(self) -> list:
+        db = self.session()
+        try:
+            if self.high_water_mark is None:
+                high_water_mark = self.crud.high_water_mark(db) or 0
+                rows = sorted(self.crud.latest.reload(db).values(), key=attrgetter('buoy_id'))
+            else:
+                rows, high_water_mark = [], self.high_water_mark
+                while True:
+                    page, high_water_mark = self.crud.changes(db, since_id=high_water_mark, limit=STREAM_POLL_LIMIT)
+                    rows += page
+                    if len(page) < STREAM_POLL_LIMIT:
+                        break
+        finally:
+            db.close()
+        self.high_water_mark = high_water_mark
+        self.polls += 1
+        return rows
+
+    def replay(self, since: int, subscription: Subscription) -> Tuple[list, int]:
+        """
+        A page of the rows `subscription` may see changed after `since`,
+        and the high-water mark of the page.
+        """
+        buoy_ids = subscription.buoy_ids
+        arguments = {'buoy_id': ['in', sorted(buoy_ids)]} if buoy_ids is not None else None
+        db = self.session()
+        try:
+            rows, high_water_mark = self.crud.changes(db, since_id=since, limit=STREAM_POLL_LIMIT, arguments=arguments)
+        finally:
+            db.close()
+        return [row for row in rows if subscription.visible(row)], high_water_mark
+
+    def publish(self, rows: list) -> None:
+        for row in rows:
+            seen = self.latest.get(row.buoy_id)
+            if seen is None or seen.date_time <= row.date_time:
+                self.latest[row.buoy_id] = row
+
+            self.published += 1
+            for subscription in list(self.subscriptions):
+                if subscription.wants(row) and not subscription.put(row):
+                    self.dropped += 1
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self.subscriptions),
+            "buoys": len(self.latest),
+            "polls": self.polls,
+            "published": self.published,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "high_water_mark": self.high_water_mark,
+            "interval": self.interval,
+        }
+
+qualified_data_feed = ObservationFeed(qualified_data, name='qualified_data')
+petrobras_feed = ObservationFeed(bmobr_qualified_data, name='petrobras')
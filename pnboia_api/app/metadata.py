@@ -0,0 +1,138 @@
+import os
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from pnboia_api.core.cache import RefreshingRegistry, fingerprint_query
+from pnboia_api.models.moored import BuoysMetadata, Parameters, RegisterBuoys, SetupBuoy
+from pnboia_api.schemas.qualified_data import (
+    BMOBrQualifiedSchema, CriosferaQualifiedSchema, SpotterQualifiedSchema, TriaxysQualifiedSchema
+)
+
+METADATA_CHECK = int(os.getenv('METADATA_CHECK', 60))
+
+# parameters of each buoy type are the fields of its qualified data schema
+BUOY_TYPE_SCHEMAS = {
+    'SPOTTER': SpotterQualifiedSchema,
+    'TRIAXYS': TriaxysQualifiedSchema,
+    'METOCEAN': BMOBrQualifiedSchema,
+    'CRIOSFERA': CriosferaQualifiedSchema,
+}
+# ADCP parameters HTMLUtils.list_parameters also lists for METOCEAN buoys
+CURRENT_PARAMETERS = ("cspd", "cdir")
+
+REFERENCE_MODELS = (RegisterBuoys, SetupBuoy, BuoysMetadata, Parameters)
+
+
+def buoy_type_key(buoy_type: list) -> str:
+    """Key of `BUOY_TYPE_SCHEMAS` for the first two words of a buoy name."""
+    if buoy_type[0] == "METOCEAN":
+        return "CRIOSFERA" if buoy_type[1] == "CRIOSFERA" else "METOCEAN"
+    return buoy_type[0]
+
+
+def adcp_bin_depths(setup: SetupBuoy) -> tuple:
+    """
+    Depth (m) of each ADCP bin of a setup_buoy row: depth_adcp is the top
+    of the first cell (as /v1/info/metadata shows it) and the next ones
+    follow cell_size_adcp apart.
+    """
+    return tuple(
+        float(setup.depth_adcp + setup.cell_size_adcp * n) for n in range(int(setup.number_cells_adcp))
+    )
+
+
+class MetadataService(RefreshingRegistry):
+    """
+    The reference tables behind /v1/info/metadata (register_buoys,
+    setup_buoy, buoys_metadata and parameters), loaded once per worker and
+    indexed by buoy_id, with the parameter list of each buoy type worked
+    out in advance.
+
+    Every `refresh` seconds a fingerprint of the tables is compared with
+    the loaded one and the tables are only read again when it changed.
+    The fingerprint is part of the response ETag, so rendered documents
+    cached by ETag are dropped with it.
+    """
+
+    fingerprint = fingerprint_query(*REFERENCE_MODELS)
+
+    def load(self, db: Session) -> dict:
+        fingerprint = db.execute(self.fingerprint).scalar()
+        if self._data is not None and self._data['fingerprint'] == fingerprint:
+            return self._data
+
+        register_buoys = {}
+        for register in db.query(RegisterBuoys).order_by(RegisterBuoys.start_date.nullslast()).all():
+            register_buoys.setdefault(register.buoy_id, []).append(register)
+
+        setup_all = db.query(SetupBuoy).order_by(SetupBuoy.id).all()
+        setup_buoys = {}
+        for setup in setup_all:
+            setup_buoys.setdefault(setup.register_id, []).append(setup)
+
+        buoys_metadata = {}
+        for metadata in db.query(BuoysMetadata).all():
+            buoys_metadata.setdefault(metadata.buoy_id, []).append(metadata)
+
+        parameters = db.query(Parameters).order_by(Parameters.id).all()
+
+        return {
+            'fingerprint': fingerprint,
+            'register_buoys': register_buoys,
+            'setup_buoys': setup_buoys,
+            'setup_all': setup_all,
+            # the latest setup of each buoy is the one of its current deployment
+            'adcp_bin_depths': {
+                buoy_id: adcp_bin_depths(setups[-1]) for buoy_id, setups in setup_buoys.items()
+            },
+            'buoys_metadata': buoys_metadata,
+            'parameters': self.type_parameters(parameters),
+        }
+
+    def type_parameters(self, parameters: list) -> dict:
+        """
+        For each buoy type, its schema fields and the `parameters` rows the
+        TXT/JSON (`parameters`) and HTML (`html_parameters`) lists keep.
+        """
+        result = {}
+        for key, schema in BUOY_TYPE_SCHEMAS.items():
+            fields = frozenset(schema.__fields__)
+            strict = [param for param in parameters if param.parameter in fields]
+            if key == 'METOCEAN':
+                html = [
+                    param for param in parameters
+                    if param.parameter in fields or any(item in param.parameter for item in CURRENT_PARAMETERS)
+                ]
+            else:
+                html = strict
+            result[key] = {'buoy_parameters': fields, 'parameters': strict, 'html_parameters': html}
+        return result
+
+    def adcp_bin_depths(self, db: Session) -> dict:
+        """ADCP bin depths of the buoys with a setup_buoy row, by buoy_id."""
+        return self.get_all(db)['adcp_bin_depths']
+
+    def document(self, db: Session, buoy) -> dict:
+        """Everything the HTML/TXT/JSON `compose_final_response` need for `buoy`."""
+        data = self.get_all(db)
+        buoy_type = buoy.name.split(" ")[0:2]
+
+        type_parameters = data['parameters'].get(buoy_type_key(buoy_type))
+        if type_parameters is None:
+            raise HTTPException(
+                status_code=400,
+                detail=f"There is no metadata for the type of buoy {buoy.buoy_id}.",
+            )
+
+        return {
+            'fingerprint': data['fingerprint'],
+            'buoy_type': buoy_type,
+            'register_buoys': data['register_buoys'].get(buoy.buoy_id, []),
+            # buoys without a setup of their own keep getting the first one
+            'setup_buoys': data['setup_buoys'].get(buoy.buoy_id) or data['setup_all'],
+            'buoys_metadata': data['buoys_metadata'].get(buoy.buoy_id, []),
+            **type_parameters,
+        }
+
+metadata_service = MetadataService(refresh=METADATA_CHECK, name='metadata')
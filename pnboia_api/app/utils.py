@@ -1,39 +1,453 @@
 import csv
+import hashlib
+import io
+import json
+import os
+from decimal import Decimal
+from email.utils import format_datetime, parsedate_to_datetime
 from io import StringIO
-from fastapi import Response
-from sqlalchemy import inspect
-from datetime import datetime
+from itertools import chain
+from fastapi import HTTPException, Response
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from pydantic.fields import SHAPE_SINGLETON
+from pydantic.json import pydantic_encoder
+from sqlalchemy import BigInteger, Boolean, Date, DateTime, Float, Integer, Numeric, SmallInteger, inspect
+from datetime import datetime, timezone
+
+from pnboia_api.core.cache import TTLCache
+from pnboia_api.crud.base import STREAM_BATCH_SIZE
+
+try:
+    import pyarrow
+    import pyarrow.compute
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:  # parquet/arrow downloads are only offered when the package is installed
+    pyarrow = None
+
+RENDERED_CACHE_SIZE = int(os.getenv('RENDERED_CACHE_SIZE', 256))
+RENDERED_CACHE_TTL = int(os.getenv('RENDERED_CACHE_TTL', 3600))
+
+# rendered HTML/TXT/JSON of the buoy list and metadata endpoints, by ETag
+rendered_responses = TTLCache(maxsize=RENDERED_CACHE_SIZE, ttl=RENDERED_CACHE_TTL, name='rendered')
+
+PARQUET_ROW_GROUP_SIZE = int(os.getenv('PARQUET_ROW_GROUP_SIZE', 10000))
+
+# response_type: (media type, file extension)
+COLUMNAR_FORMATS = {
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrows'),
+}
+RESPONSE_TYPES = ('json', 'csv', *COLUMNAR_FORMATS)
+
+
+class RowSerializer:
+    """
+    Renders ORM rows as JSON with the fields of a response schema, the
+    way `schema.from_orm(row).json(by_alias=True)` would, without building
+    a pydantic model for every row.
+
+    The field list is computed once per schema (or per request, when it
+    is restricted to the `fields=` of the request). Values already of the
+    field's type (and None) are written as they are, numbers are cast to
+    the field's int/float, and anything else (fields with validators such
+    as `geom`, other types) goes through that field's own pydantic
+    validation.
+    """
+
+    serializers = {}
+
+    @classmethod
+    def for_schema(cls, schema, fields: list = None):
+        if fields:
+            return cls(schema, fields)
+
+        serializer = cls.serializers.get(schema)
+        if serializer is None:
+            serializer = cls.serializers[schema] = cls(schema)
+        return serializer
+
+    def __init__(self, schema, fields: list = None):
+        self.schema = schema
+        self.fields = []
+
+        for field in schema.__fields__.values():
+            if fields and field.alias not in fields:
+                continue
+
+            field_type = None
+            coerce = self.validator(field)
+
+            if field.shape == SHAPE_SINGLETON and not field.class_validators:
+                field_type = field.outer_type_
+                if field_type in (int, float):
+                    coerce = self.number_coercion(field_type, coerce)
+
+            self.fields.append((field.alias, field.get_default(), field_type, coerce))
+
+    def validator(self, field):
+        def validate(value):
+            value, errors = field.validate(value, {}, loc=field.alias, cls=self.schema)
+            if errors:
+                raise ValidationError([errors], self.schema)
+            return value
+        return validate
+
+    def number_coercion(self, number_type, fallback):
+        def coerce(value):
+            if isinstance(value, (int, float, Decimal)):
+                return number_type(value)
+            return fallback(value)
+        return coerce
+
+    def to_dict(self, row) -> dict:
+        data = {}
+        for key, default, field_type, coerce in self.fields:
+            value = getattr(row, key, default)
+            if value is not None and type(value) is not field_type:
+                value = coerce(value)
+            data[key] = value
+        return data
+
+    def dumps(self, row) -> str:
+        return json.dumps(self.to_dict(row), default=pydantic_encoder)
+
+    def dumps_list(self, rows) -> str:
+        return json.dumps([self.to_dict(row) for row in rows], default=pydantic_encoder)
+
+
+
+def arrow_type(column_type):
+    """Arrow type for the values of a column of SQLAlchemy type `column_type`."""
+    if isinstance(column_type, SmallInteger):
+        return pyarrow.int16()
+    if isinstance(column_type, BigInteger):
+        return pyarrow.int64()
+    if isinstance(column_type, Integer):
+        return pyarrow.int32()
+    if isinstance(column_type, Float):
+        return pyarrow.float64()
+    if isinstance(column_type, Numeric):
+        if column_type.precision and column_type.scale is not None:
+            return pyarrow.decimal128(column_type.precision, column_type.scale)
+        return pyarrow.float64()
+    if isinstance(column_type, DateTime):
+        return pyarrow.timestamp('us', tz='UTC' if column_type.timezone else None)
+    if isinstance(column_type, Date):
+        return pyarrow.date32()
+    if isinstance(column_type, Boolean):
+        return pyarrow.bool_()
+    return pyarrow.string()
+
+
+def arrow_array(values: list, value_type):
+    """
+    `values` as an Arrow array of `value_type`. Values it cannot take
+    as they are (Decimals of unconstrained numeric columns, aggregates of
+    a resample with more digits than the column) are converted, rounding
+    decimals to the scale of the column.
+    """
+    try:
+        return pyarrow.array(values, type=value_type)
+    except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError):
+        array = pyarrow.array(values)
+        if pyarrow.types.is_decimal(value_type) and pyarrow.types.is_decimal(array.type):
+            array = pyarrow.compute.round(array, ndigits=value_type.scale)
+        return array.cast(value_type, safe=False)
+
+
+class ColumnarSink(io.RawIOBase):
+    """
+    Write-only file the Parquet/Arrow writers write into, handing out
+    what was written so far with `drain`. `tell` keeps counting from the
+    start of the file, as the Parquet footer records absolute offsets.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.chunks = []
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
 
 
 class APIUtils:
     def __init__(self):
         pass
 
-    def csv_response(self, result:list, filename:str):
-        if not filename:
-            return result
-            
-        first_object = result[0]
-        inspector = inspect(first_object.__class__)
+    def stream_rows(self, rows, empty_detail:str=None):
+        """
+        Fetch the first row of `rows` before the response starts, so an
+        empty result can still be answered with a 400 (when `empty_detail`
+        is given) instead of an empty body.
+        """
+        rows = iter(rows)
+        first_row = next(rows, None)
+
+        if first_row is None:
+            if empty_detail:
+                raise HTTPException(status_code=400, detail=empty_detail)
+            return iter(())
+
+        return chain([first_row], rows)
+
+    def csv_stream_response(self, rows, model, filename:str, batch_size:int=STREAM_BATCH_SIZE, empty_detail:str=None, next_cursor:str=None, fields:list=None, high_water_mark:int=None):
+        """
+        Stream `rows` (e.g. from `CRUDBase.iter_index`) as CSV, flushing
+        every `batch_size` rows. `next_cursor` is sent in the
+        `X-Next-Cursor` header when the rows are a page of a larger result,
+        and `high_water_mark` (see `CRUDBase.changes`) in `X-High-Water-Mark`.
+        `fields` restricts the columns to the ones selected by the query.
+        """
+        rows = self.stream_rows(rows, empty_detail=empty_detail)
+        inspector = inspect(model)
 
         cols_to_ignore = ['id','raw_id','geom']
 
-        column_names = [column.key for column in inspector.columns if column.key not in cols_to_ignore]
-        csv_data = StringIO()
-        csv_writer = csv.DictWriter(csv_data, fieldnames=column_names)
-        csv_writer.writeheader()
+        column_names = [column.key for column in inspector.columns
+            if column.key not in cols_to_ignore and (not fields or column.key in fields)]
 
-        for r in result:
-            obj_dict = {column.key: getattr(r, column.key) for column in inspector.columns if column.key not in cols_to_ignore}
-            csv_writer.writerow(obj_dict)
+        def generate():
+            csv_data = StringIO()
+            csv_writer = csv.writer(csv_data)
+            csv_writer.writerow(column_names)
 
-        csv_response = Response(content=csv_data.getvalue())
+            for idx, row in enumerate(rows, start=1):
+                csv_writer.writerow([getattr(row, key) for key in column_names])
+                if idx % batch_size == 0:
+                    yield csv_data.getvalue()
+                    csv_data.seek(0)
+                    csv_data.truncate(0)
+
+            yield csv_data.getvalue()
+
+        csv_response = StreamingResponse(generate(), media_type="text/csv")
         csv_response.headers["Content-Disposition"] = f"attachment; filename=\"{filename}.csv\""
-        csv_response.headers["Content-Type"] = "text/csv"
-        # print(csv_response.body)
-        
+        if next_cursor:
+            csv_response.headers["X-Next-Cursor"] = next_cursor
+        if high_water_mark is not None:
+            csv_response.headers["X-High-Water-Mark"] = str(high_water_mark)
+
         return csv_response
 
+    def columnar_stream_response(self, rows, model, filename:str, response_type:str, batch_size:int=None, empty_detail:str=None, next_cursor:str=None, fields:list=None, high_water_mark:int=None):
+        """
+        Stream `rows` as Parquet or as an Arrow IPC stream (`response_type`
+        'parquet' or 'arrow'), with the columns of the CSV download typed
+        after `model`. Every `batch_size` rows (a Parquet row group) are
+        written as a record batch and sent; the Parquet footer closes the body.
+        """
+        if pyarrow is None:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Response type '{response_type}' is not available.",
+            )
+
+        media_type, extension = COLUMNAR_FORMATS[response_type]
+        if batch_size is None:
+            batch_size = PARQUET_ROW_GROUP_SIZE if response_type == 'parquet' else STREAM_BATCH_SIZE
+
+        rows = self.stream_rows(rows, empty_detail=empty_detail)
+        inspector = inspect(model)
+
+        cols_to_ignore = ['id','raw_id','geom']
+
+        schema = pyarrow.schema([(column.key, arrow_type(column.type)) for column in inspector.columns
+            if column.key not in cols_to_ignore and (not fields or column.key in fields)])
+
+        def record_batch(batch):
+            return pyarrow.record_batch(
+                [arrow_array([getattr(row, field.name) for row in batch], field.type) for field in schema],
+                schema=schema,
+            )
+
+        def generate():
+            sink = ColumnarSink()
+            if response_type == 'parquet':
+                writer = pyarrow.parquet.ParquetWriter(sink, schema)
+            else:
+                writer = pyarrow.ipc.new_stream(sink, schema)
+
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) == batch_size:
+                    writer.write_batch(record_batch(batch))
+                    batch = []
+                    yield sink.drain()
+
+            if batch:
+                writer.write_batch(record_batch(batch))
+            writer.close()
+            yield sink.drain()
+
+        columnar_response = StreamingResponse(generate(), media_type=media_type)
+        columnar_response.headers["Content-Disposition"] = f"attachment; filename=\"{filename}.{extension}\""
+        if next_cursor:
+            columnar_response.headers["X-Next-Cursor"] = next_cursor
+        if high_water_mark is not None:
+            columnar_response.headers["X-High-Water-Mark"] = str(high_water_mark)
+
+        return columnar_response
+
+    def json_stream_response(self, rows, schema, batch_size:int=STREAM_BATCH_SIZE, empty_detail:str=None, next_cursor:str=None, fields:list=None, high_water_mark:int=None):
+        """
+        Stream `rows` as a JSON array, serializing each one with the
+        endpoint's response `schema` so the body matches what the
+        `response_model` would have produced, reduced to `fields` when
+        the query selected only those columns.
+        """
+        rows = self.stream_rows(rows, empty_detail=empty_detail)
+        serializer = RowSerializer.for_schema(schema, fields=fields)
+
+        def generate():
+            chunk = []
+            separator = "["
+            for row in rows:
+                chunk.append(separator + serializer.dumps(row))
+                separator = ","
+                if len(chunk) == batch_size:
+                    yield "".join(chunk)
+                    chunk = []
+
+            if separator == "[":
+                chunk.append(separator)
+            chunk.append("]")
+            yield "".join(chunk)
+
+        json_response = StreamingResponse(generate(), media_type="application/json")
+        if next_cursor:
+            json_response.headers["X-Next-Cursor"] = next_cursor
+        if high_water_mark is not None:
+            json_response.headers["X-High-Water-Mark"] = str(high_water_mark)
+
+        return json_response
+
+    def check_response_type(self, response_type:str):
+        """400 for a `response_type` not in RESPONSE_TYPES, before anything is queried."""
+        if response_type not in RESPONSE_TYPES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid response type. ['json', 'csv', 'parquet' or 'arrow'] available.",
+            )
+
+    def rows_response(self, rows, response_type:str, model, schema, filename:str, empty_detail:str=None, next_cursor:str=None, fields:list=None, high_water_mark:int=None):
+        """
+        `rows` as `response_type`: a CSV, Parquet or Arrow download named
+        `filename` with the columns of `model`, or a JSON array with the
+        fields of `schema`. The other arguments are the ones of the
+        `*_stream_response` methods.
+        """
+        self.check_response_type(response_type)
+        options = dict(empty_detail=empty_detail, next_cursor=next_cursor, fields=fields, high_water_mark=high_water_mark)
+
+        if response_type == "csv":
+            return self.csv_stream_response(rows=rows, model=model, filename=filename, **options)
+        if response_type in COLUMNAR_FORMATS:
+            return self.columnar_stream_response(rows=rows, model=model, filename=filename, response_type=response_type, **options)
+        return self.json_stream_response(rows=rows, schema=schema, **options)
+
+    def json_groups_stream_response(self, groups:list, batch_size:int=STREAM_BATCH_SIZE):
+        """
+        Stream a JSON object with one array per group, `groups` being
+        `(key, rows, schema, fields)` tuples whose rows are serialized
+        as in `json_stream_response`. Rows are only read from a group once
+        the previous ones were sent.
+        """
+        def generate():
+            separator = "{"
+            for key, rows, schema, fields in groups:
+                serializer = RowSerializer.for_schema(schema, fields=fields)
+                chunk = [separator + json.dumps(key) + ":["]
+                row_separator = ""
+                for row in rows:
+                    chunk.append(row_separator + serializer.dumps(row))
+                    row_separator = ","
+                    if len(chunk) == batch_size:
+                        yield "".join(chunk)
+                        chunk = []
+                chunk.append("]")
+                yield "".join(chunk)
+                separator = ","
+
+            yield "{}" if separator == "{" else "}"
+
+        return StreamingResponse(generate(), media_type="application/json")
+
+    def json_response(self, rows, schema):
+        """
+        Pre-rendered JSON array of `rows` for list endpoints, skipping the
+        `response_model` validation FastAPI would run on every row.
+        """
+        return Response(content=RowSerializer.for_schema(schema).dumps_list(rows), media_type="application/json")
+
+    def etag(self, *parts) -> str:
+        """
+        Strong ETag of `parts`, strings or lists of ORM rows (hashed by their
+        column values), so it is known before anything is rendered.
+        """
+        digest = hashlib.sha1()
+        for part in parts:
+            if isinstance(part, (list, tuple)):
+                for row in part:
+                    values = [getattr(row, column.key) for column in inspect(row.__class__).columns]
+                    digest.update("\x1f".join(map(str, values)).encode())
+                    digest.update(b"\x1e")
+            else:
+                digest.update(str(part).encode())
+            digest.update(b"\x1d")
+        return f'"{digest.hexdigest()}"'
+
+    def conditional_response(self, request, etag:str, render, last_modified:datetime=None):
+        """
+        304 Not Modified when the client holds `etag` (If-None-Match) or,
+        without If-None-Match, when nothing changed since If-Modified-Since.
+        Otherwise the response returned by `render()`, kept in
+        `rendered_responses` so each content is rendered once.
+        """
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if last_modified:
+            last_modified = last_modified.replace(tzinfo=timezone.utc, microsecond=0)
+            headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            # weak comparison: a compressing proxy may have marked it W/
+            if etag in [tag.strip().replace("W/", "", 1) for tag in if_none_match.split(",")]:
+                return Response(status_code=304, headers=headers)
+        elif last_modified and request.headers.get("if-modified-since"):
+            try:
+                since = parsedate_to_datetime(request.headers["if-modified-since"])
+            except (TypeError, ValueError):
+                since = None
+            if since and since.tzinfo and last_modified <= since:
+                return Response(status_code=304, headers=headers)
+
+        cached = rendered_responses.get(etag)
+        if cached is None:
+            response = render()
+            cached = (response.body, response.status_code, dict(response.headers))
+            rendered_responses.set(etag, cached)
+
+        body, status_code, response_headers = cached
+        return Response(content=body, status_code=status_code, headers={**response_headers, **headers})
+
     def file_name_composition(self, buoy_name:str, start_date:datetime=None, end_date:datetime=None):
         buoy_name = (buoy_name
                 .lower()
@@ -7,7 +7,7 @@ from sqlalchemy.orm.session import Session
 from pnboia_api.schemas.adm import *
 from pnboia_api.models.adm import *
 import pnboia_api.crud as crud
-from pnboia_api.app.deps import get_db
+from pnboia_api.app.deps import get_routed_db
 
 from pnboia_api.core.security import credentials_exception, create_token
 
@@ -16,7 +16,7 @@ router = APIRouter()
 @router.get("/", response_model=UserShowBase)
 def show_user(
         email: str,
-        db: Session = Depends(get_db),
+        db: Session = Depends(get_routed_db),
         token: str = None
     ) -> Any:   
 
@@ -43,7 +43,7 @@ def show_user(
 
 @router.get("/me", response_model=UserShowBase)
 def me(
-        db: Session = Depends(get_db),
+        db: Session = Depends(get_routed_db),
         token: str = None,
     ) -> Any:   
 
@@ -53,7 +53,7 @@ def me(
     if token == None:
         raise credentials_exception
 
-    user = crud.crud_adm.user.verify(db=db, arguments={'token=': token})
+    user = crud.crud_adm.user.verify(db=db, arguments={'token=': token}, cache=False)
 
     return user
 
@@ -62,7 +62,7 @@ def me(
 def create_user(
         *,
         token: str,
-        db: Session = Depends(get_db),
+        db: Session = Depends(get_routed_db),
         user_in: UserCreateBase
     ) -> Any:
     """
@@ -95,7 +95,7 @@ def create_user(
 def update_user(
         *,
         token: str,
-        db: Session = Depends(get_db),
+        db: Session = Depends(get_routed_db),
         update_token: bool =False,
         user_in: UserCreateBase
     ) -> Any:
@@ -128,7 +128,7 @@ def update_user(
 def delete_user(
         *,
         token: str,
-        db: Session = Depends(get_db),
+        db: Session = Depends(get_routed_db),
         user_in: UserUpdateBase
     ) -> Any:
     """
@@ -4,6 +4,7 @@ import numpy as np
 from typing import Optional, Any, List
 
 from fastapi import APIRouter, Query, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from pnboia_api.core.security import credentials_exception
@@ -13,7 +14,9 @@ import pnboia_api.crud as crud
 from  pnboia_api.db.base import Base, engine
 from datetime import datetime, timedelta, date
 
-from pnboia_api.app.deps import get_db
+from pnboia_api.app.deps import get_async_db, get_routed_db
+
+from pnboia_api.app.utils import APIUtils
 
 
 
@@ -28,35 +31,35 @@ router = APIRouter()
 #######################
 
 @router.get("/buoys/{buoy_id}", status_code=200, response_model=BuoyDriftBase)
-def buoy_show(
+async def buoy_show(
         *,
         buoy_id: int,
         token: str,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_async_db),
     ) -> Any:
     """
     Fetch a single buoy by ID
     """
 
-    user = crud.crud_adm.user.verify(db=db, arguments={'token=': token})
+    user = await crud.crud_adm.user.verify_async(db=db, arguments={'token=': token})
     
-    result = crud.crud_drift.buoy_drift.show(db=db, id_pk = buoy_id)
+    result = await crud.crud_drift.buoy_drift.show_async(db=db, id_pk = buoy_id)
 
     return result
 
 @router.get("/buoys", status_code=200, response_model=List[BuoyDriftBase])
-def buoy_index(
+async def buoy_index(
         token: str,
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
     ) -> Any:   
 
     """
     Fetch a single buoy by ID
     """    
 
-    user = crud.crud_adm.user.verify(db=db, arguments={'token=': token})
+    user = await crud.crud_adm.user.verify_async(db=db, arguments={'token=': token})
 
-    result = crud.crud_drift.buoy_drift.index(db=db)
+    result = await crud.crud_drift.buoy_drift.index_async(db=db)
 
     return result
 
@@ -66,7 +69,7 @@ def buoy_index(
 def buoy_create(
         token: str,
         buoy_in: BuoyDriftNewBase,
-        db: Session = Depends(get_db)
+        db: Session = Depends(get_routed_db)
     ) -> Any:
     """
     Create new buoy
@@ -98,7 +101,7 @@ def buoy_update(
         buoy_id: int,
         token: str,
         buoy_in: BuoyDriftNewBase,
-        db: Session = Depends(get_db)
+        db: Session = Depends(get_routed_db)
     ) -> Any:
     """
     Create new buoy
@@ -128,7 +131,7 @@ def buoy_update(
         *,
         buoy_id: int,
         token: str,
-        db: Session = Depends(get_db)
+        db: Session = Depends(get_routed_db)
     ) -> Any:
     """
     Create new buoy
@@ -172,7 +175,10 @@ def spootter_general_drift_index(
         end_date: Optional[str] = Query(default=(date.today() + timedelta(days=2)),
             title="date format is yyyy-mm-dd",
             regex="^\d{4}\-(0[1-9]|1[012])\-(0[1-9]|[12][0-9]|3[01])$"),
-        db: Session = Depends(get_db)
+        db: Session = Depends(get_routed_db),
+        limit: int = None,
+        cursor: str = None,
+        fields: str = None
     ) -> Any:
 
     user = crud.crud_adm.user.verify(db=db, arguments={'token=': token})
@@ -192,9 +198,11 @@ def spootter_general_drift_index(
 
     print(arguments)
 
-    result = crud.crud_drift.spotter_general.index(db=db, arguments=arguments)
+    fields = crud.crud_drift.spotter_general.select_fields(fields)
 
-    return result
+    rows, next_cursor = crud.crud_drift.spotter_general.paginate(db=db, limit=limit, cursor=cursor, arguments=arguments, fields=fields)
+
+    return APIUtils().json_stream_response(rows=rows, schema=SpotterGeneralDriftBase, next_cursor=next_cursor, fields=fields)
 
 
 #######################
@@ -211,7 +219,10 @@ def spotter_system_drift_index(
         end_date: Optional[str] = Query(default=(date.today() + timedelta(days=2)),
             title="date format is yyyy-mm-dd",
             regex="^\d{4}\-(0[1-9]|1[012])\-(0[1-9]|[12][0-9]|3[01])$"),
-        db: Session = Depends(get_db)
+        db: Session = Depends(get_routed_db),
+        limit: int = None,
+        cursor: str = None,
+        fields: str = None
     ) -> Any:
 
     user = crud.crud_adm.user.verify(db=db, arguments={'token=': token})
@@ -231,9 +242,11 @@ def spotter_system_drift_index(
 
     print(arguments)
 
-    result = crud.crud_drift.spotter_system.index(db=db, arguments=arguments)
+    fields = crud.crud_drift.spotter_system.select_fields(fields)
 
-    return result
+    rows, next_cursor = crud.crud_drift.spotter_system.paginate(db=db, limit=limit, cursor=cursor, arguments=arguments, fields=fields)
+
+    return APIUtils().json_stream_response(rows=rows, schema=SpotterSystemDriftBase, next_cursor=next_cursor, fields=fields)
 
 
 
@@ -251,7 +264,10 @@ def spotter_system_drift_index(
         end_date: Optional[str] = Query(default=(date.today() + timedelta(days=2)),
             title="date format is yyyy-mm-dd",
             regex="^\d{4}\-(0[1-9]|1[012])\-(0[1-9]|[12][0-9]|3[01])$"),
-        db: Session = Depends(get_db)
+        db: Session = Depends(get_routed_db),
+        limit: int = None,
+        cursor: str = None,
+        fields: str = None
     ) -> Any:
 
     user = crud.crud_adm.user.verify(db=db, arguments={'token=': token})
@@ -271,9 +287,11 @@ def spotter_system_drift_index(
 
     print(arguments)
 
-    result = crud.crud_drift.spotter_waves.index(db=db, arguments=arguments)
+    fields = crud.crud_drift.spotter_waves.select_fields(fields)
 
-    return result
+    rows, next_cursor = crud.crud_drift.spotter_waves.paginate(db=db, limit=limit, cursor=cursor, arguments=arguments, fields=fields)
+
+    return APIUtils().json_stream_response(rows=rows, schema=SpotterWavesDriftBase, next_cursor=next_cursor, fields=fields)
 
 
 
@@ -2,7 +2,7 @@ import pandas as pd
 import numpy as np
 
 from typing import Optional, Any, List
-from fastapi import APIRouter, Query, Depends, HTTPException
+from fastapi import APIRouter, Query, Depends, HTTPException, Request
 from fastapi.responses import PlainTextResponse, JSONResponse, HTMLResponse, FileResponse, Response
 from fastapi.encoders import jsonable_encoder
 
@@ -19,7 +19,8 @@ import pnboia_api.crud as crud
 from  pnboia_api.db.base import Base, engine
 from datetime import datetime, timedelta, date
 
-from pnboia_api.app.deps import get_db
+from pnboia_api.app.deps import get_routed_db
+from pnboia_api.app.metadata import metadata_service
 
 from pnboia_api.app.utils import APIUtils, HTMLUtils, TXTUtils, JSONUtils
 
@@ -33,15 +34,16 @@ router = APIRouter()
 
 @router.get("/metadata", status_code=200) #response_model=List[SetupBuoySchema]) #response_class=PlainTextResponse)
 def return_metadata(
+            request: Request,
             buoy_id: int,
             token: str,
-            db: Session = Depends(get_db),
+            db: Session = Depends(get_routed_db),
             response_type:str="html"
 ):
 
     user = crud.crud_adm.user.verify(db=db, arguments={'token=': token})
 
-    buoy = crud.crud_moored.buoy.show(db=db, id_pk = buoy_id)
+    buoy = crud.crud_moored.buoy.show_cached(db=db, id_pk = buoy_id)
 
     if not buoy.open_data and not user.user_type == 'admin':
         if not user.user_type == 'admin':
@@ -50,71 +52,61 @@ def return_metadata(
                 detail="You do not have permission to do this action",
             )
 
-    register_buoys = crud.crud_moored.register_buoys.index_register(db=db, arguments={'buoy_id=': buoy_id}, order=True)
-
-    buoy_type = buoy.name.split(" ")[0:2]
-    setup_buoys = crud.crud_moored.setup_buoy.index(db=db)
-    buoys_metadata = crud.crud_moored.buoys_metadata.index(db=db, arguments={'buoy_id=': buoy_id})
-    parameters_moored = crud.crud_moored.parameters.index_parameters(db=db, order=True)
-
-    if buoy_type[0] == "SPOTTER":
-        buoy_params = list(SpotterQualifiedSchema.__fields__.keys())
-    if buoy_type[0] == "TRIAXYS":
-            buoy_params = list(TriaxysQualifiedSchema.__fields__.keys())
-    if buoy_type[0] == "METOCEAN" and buoy_type[1] != "CRIOSFERA":
-        buoy_params = list(BMOBrQualifiedSchema.__fields__.keys())
-    if buoy_type[0] == "METOCEAN" and buoy_type[1] == "CRIOSFERA":
-        buoy_params = list(CriosferaQualifiedSchema.__fields__.keys())
-
-
-
-    if response_type == 'html':
-        final_response = HTMLUtils().compose_final_response(buoy=buoy,
-                                                     buoys_metadata=buoys_metadata,
-                                                     register_buoys=register_buoys,
-                                                     setup_buoys=setup_buoys,
-                                                     buoy_parameters=buoy_params,
-                                                     buoy_type=buoy_type,
-                                                     parameters=parameters_moored)
-        return HTMLResponse(final_response)
-
-    elif response_type == "txt":
-
-        final_response = TXTUtils().compose_final_response(buoy=buoy,
-                                                     buoys_metadata=buoys_metadata,
-                                                     setup_buoys=setup_buoys,
-                                                     buoy_parameters=buoy_params,
-                                                     buoy_type=buoy_type,
-                                                     parameters=parameters_moored)
-
-        txt_response = Response(content=final_response)
-        file_name = TXTUtils().file_name_composition(buoy_name=buoy.name)
-        txt_response.headers["Content-Disposition"] = f'attachment; filename="{file_name}.txt"'
-        txt_response.headers["Content-Type"] = "text/csv"
-
-        return txt_response
-
-    elif response_type == "json":
-        final_response = JSONUtils().compose_final_response(buoy=buoy,
-                                                     buoys_metadata=buoys_metadata,
-                                                     register_buoys=register_buoys,
-                                                     setup_buoys=setup_buoys,
-                                                     buoy_parameters=buoy_params,
-                                                     buoy_type=buoy_type,
-                                                     parameters=parameters_moored)
-        return JSONResponse(jsonable_encoder(final_response))
-
-    else:
-        raise HTTPException(
-                status_code=400,
-                detail=f"Invalid response type. ['html', 'json' or 'txt'] available.",
-            )
+    document = metadata_service.document(db=db, buoy=buoy)
+
+    def render():
+        if response_type == 'html':
+            final_response = HTMLUtils().compose_final_response(buoy=buoy,
+                                                         buoys_metadata=document['buoys_metadata'],
+                                                         register_buoys=document['register_buoys'],
+                                                         setup_buoys=document['setup_buoys'],
+                                                         buoy_parameters=document['buoy_parameters'],
+                                                         buoy_type=document['buoy_type'],
+                                                         parameters=document['html_parameters'])
+            return HTMLResponse(final_response)
+
+        elif response_type == "txt":
+
+            final_response = TXTUtils().compose_final_response(buoy=buoy,
+                                                         buoys_metadata=document['buoys_metadata'],
+                                                         setup_buoys=document['setup_buoys'],
+                                                         buoy_parameters=document['buoy_parameters'],
+                                                         buoy_type=document['buoy_type'],
+                                                         parameters=document['parameters'])
+
+            txt_response = Response(content=final_response)
+            file_name = TXTUtils().file_name_composition(buoy_name=buoy.name)
+            txt_response.headers["Content-Disposition"] = f'attachment; filename="{file_name}.txt"'
+            txt_response.headers["Content-Type"] = "text/csv"
+
+            return txt_response
+
+        elif response_type == "json":
+            final_response = JSONUtils().compose_final_response(buoy=buoy,
+                                                         buoys_metadata=document['buoys_metadata'],
+                                                         register_buoys=document['register_buoys'],
+                                                         setup_buoys=document['setup_buoys'],
+                                                         buoy_parameters=document['buoy_parameters'],
+                                                         buoy_type=document['buoy_type'],
+                                                         parameters=document['parameters'])
+            return JSONResponse(jsonable_encoder(final_response))
+
+        else:
+            raise HTTPException(
+                    status_code=400,
+                    detail=f"Invalid response type. ['html', 'json' or 'txt'] available.",
+                )
+
+    etag = APIUtils().etag('metadata', response_type, document['fingerprint'], [buoy])
+
+    return APIUtils().conditional_response(request=request, etag=etag, render=render)
 
 
 @router.get("/available_buoys", status_code=200, response_model=List[AvailableBuoysSchema])
 def obj_index(
+        request: Request,
         token: str,
-        db: Session = Depends(get_db),
+        db: Session = Depends(get_routed_db),
         order:Optional[bool]=False,
         operative:Optional[bool]=False,
         response_type:Optional[str]='html'
@@ -134,25 +126,31 @@ def obj_index(
 
     buoys = crud.crud_moored.buoy.index(db=db, order=order, arguments=arguments)
 
-    if response_type == 'html':
-        final_response = HTMLUtils().compose_base_available_buoys(buoys=buoys)
-        return HTMLResponse(final_response)
+    def render():
+        if response_type == 'html':
+            final_response = HTMLUtils().compose_base_available_buoys(buoys=buoys)
+            return HTMLResponse(final_response)
 
-    elif response_type == "json":
-        return buoys
+        elif response_type == "json":
+            return APIUtils().json_response(rows=buoys, schema=AvailableBuoysSchema)
 
-    elif response_type == "txt":
-        final_response = TXTUtils().compose_base_available_buoys(buoys=buoys)
-        txt_response = Response(content=final_response)
-        txt_response.headers["Content-Disposition"] = f'attachment; filename="pnboia_available_buoys.txt"'
-        txt_response.headers["Content-Type"] = "text/csv"
-        return txt_response
+        elif response_type == "txt":
+            final_response = TXTUtils().compose_base_available_buoys(buoys=buoys)
+            txt_response = Response(content=final_response)
+            txt_response.headers["Content-Disposition"] = f'attachment; filename="pnboia_available_buoys.txt"'
+            txt_response.headers["Content-Type"] = "text/csv"
+            return txt_response
 
-    else:
-        raise HTTPException(
-                status_code=400,
-                detail=f"Invalid response type. ['html', 'json' or 'txt'] available.",
-            )
+        else:
+            raise HTTPException(
+                    status_code=400,
+                    detail=f"Invalid response type. ['html', 'json' or 'txt'] available.",
+                )
+
+    etag = APIUtils().etag('available_buoys', response_type, buoys)
+    last_modified = max((buoy.last_date_time for buoy in buoys if buoy.last_date_time), default=None)
+
+    return APIUtils().conditional_response(request=request, etag=etag, render=render, last_modified=last_modified)
 
 
 # @router.get("/pnboia", status_code=200, response_model=List[PNBoiaQualifiedSchema])
@@ -165,7 +163,7 @@ def obj_index(
 #         end_date: Optional[str] = Query(default=(datetime.utcnow().replace(microsecond=0) + timedelta(days=2)),
 #                     title="date_time format is yyyy-mm-ddTHH:MM:SS",
 #                     regex="\d{4}-\d?\d-\d?\dT(?:2[0-3]|[01]?[0-9]):[0-5]?[0-9]:[0-5]?[0-9]"),
-#         db: Session = Depends(get_db),
+#         db: Session = Depends(get_routed_db),
 #         limit: int = None,
 #         response_type:str="json"
 #     ) -> Any:
@@ -1,6 +1,7 @@
 from typing import Optional, Any, List
-from fastapi import APIRouter, Query, Depends, HTTPException
+from fastapi import APIRouter, Query, Depends, HTTPException, Request
 from fastapi.responses import PlainTextResponse, JSONResponse, HTMLResponse, FileResponse, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from pnboia_api.schemas.moored import *
@@ -9,7 +10,7 @@ import pnboia_api.crud as crud
 from  pnboia_api.db.base import Base, engine
 from datetime import datetime, timedelta, date
 
-from pnboia_api.app.deps import get_db
+from pnboia_api.app.deps import get_async_db, get_routed_db
 
 from pnboia_api.app.utils import APIUtils, HTMLUtils, TXTUtils, JSONUtils
 
@@ -23,26 +24,26 @@ router = APIRouter()
 #######################
 
 @router.get("/buoys/{buoy_id}", status_code=200, response_model=BuoyBase)
-def buoy_show(
+async def buoy_show(
         *,
         buoy_id: int,
         token: str,
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
     ) -> Any:
     """
     Fetch a single buoy by ID
     """
 
-    user = crud.crud_adm.user.verify(db=db, arguments={'token=': token})
+    user = await crud.crud_adm.user.verify_async(db=db, arguments={'token=': token})
 
-    result = crud.crud_moored.buoy.show(db=db, id_pk = buoy_id)
+    result = await crud.crud_moored.buoy.show_async(db=db, id_pk = buoy_id)
 
     return result
 
 @router.get("/buoys_internal", status_code=200, response_model=List[BuoyBase])
-def obj_index(
+async def obj_index(
         token: str,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_async_db),
         status:Optional[bool]=None,
         order:Optional[bool]=False,
     ) -> Any:
@@ -51,14 +52,14 @@ def obj_index(
     Fetch a single buoy by ID
     """
 
-    user = crud.crud_adm.user.verify(db=db, arguments={'token=': token})
+    user = await crud.crud_adm.user.verify_async(db=db, arguments={'token=': token})
 
     if status != None:
         arguments = {'status=': status}
     else:
         arguments = {}
 
-    result = crud.crud_moored.buoy.index(db=db, order=order, arguments=arguments)
+    result = await crud.crud_moored.buoy.index_async(db=db, order=order, arguments=arguments)
 
     return result
 
@@ -67,7 +68,7 @@ def obj_index(
 def buoy_create(
         token: str,
         obj_in: BuoyNewBase,
-        db: Session = Depends(get_db)
+        db: Session = Depends(get_routed_db)
     ) -> Any:
     """
     Create new buoy
@@ -92,6 +93,7 @@ def buoy_create(
 
 
     result = crud.crud_moored.buoy.create(db=db, obj_in=obj_in)
+    crud.crud_moored.buoy_registry.invalidate()
 
     return result
 
@@ -101,7 +103,7 @@ def buoy_update(
         buoy_id: int,
         token: str,
         obj_in: BuoyNewBase,
-        db: Session = Depends(get_db)
+        db: Session = Depends(get_routed_db)
     ) -> Any:
     """
     Create new buoy
@@ -124,6 +126,7 @@ def buoy_update(
         )
 
     result = crud.crud_moored.buoy.update(db=db, id_pk = buoy_id, obj_in=obj_in)
+    crud.crud_moored.buoy_registry.invalidate()
 
     return result
 
@@ -132,7 +135,7 @@ def buoy_update(
         *,
         buoy_id: int,
         token: str,
-        db: Session = Depends(get_db)
+        db: Session = Depends(get_routed_db)
     ) -> Any:
     """
     Create new buoy
@@ -156,14 +159,16 @@ def buoy_update(
 
 
     result = crud.crud_moored.buoy.delete(db=db, id_pk = buoy_id)
+    crud.crud_moored.buoy_registry.invalidate()
 
     return result
 
 
 @router.get("/buoys", status_code=200, response_model=List[AvailableBuoysSchema])
 def obj_index(
+        request: Request,
         token: str,
-        db: Session = Depends(get_db),
+        db: Session = Depends(get_routed_db),
         status:Optional[bool]=None,
         order:Optional[bool]=False,
         operative:Optional[bool]=False,
@@ -186,25 +191,31 @@ def obj_index(
 
     buoys = crud.crud_moored.buoy.index(db=db, order=order, arguments=arguments)
 
-    if response_type == 'html':
-        final_response = HTMLUtils().compose_base_available_buoys(buoys=buoys)
-        return HTMLResponse(final_response)
+    def render():
+        if response_type == 'html':
+            final_response = HTMLUtils().compose_base_available_buoys(buoys=buoys)
+            return HTMLResponse(final_response)
 
-    elif response_type == "json":
-        return buoys
+        elif response_type == "json":
+            return APIUtils().json_response(rows=buoys, schema=AvailableBuoysSchema)
 
-    elif response_type == "txt":
-        final_response = TXTUtils().compose_base_available_buoys(buoys=buoys)
-        txt_response = Response(content=final_response)
-        txt_response.headers["Content-Disposition"] = f'attachment; filename="pnboia_available_buoys.txt"'
-        txt_response.headers["Content-Type"] = "text/csv"
-        return txt_response
+        elif response_type == "txt":
+            final_response = TXTUtils().compose_base_available_buoys(buoys=buoys)
+            txt_response = Response(content=final_response)
+            txt_response.headers["Content-Disposition"] = f'attachment; filename="pnboia_available_buoys.txt"'
+            txt_response.headers["Content-Type"] = "text/csv"
+            return txt_response
 
-    else:
-        raise HTTPException(
-                status_code=400,
-                detail=f"Invalid response type. ['html', 'json' or 'txt'] available.",
-            )
+        else:
+            raise HTTPException(
+                    status_code=400,
+                    detail=f"Invalid response type. ['html', 'json' or 'txt'] available.",
+                )
+
+    etag = APIUtils().etag('buoys', response_type, buoys)
+    last_modified = max((buoy.last_date_time for buoy in buoys if buoy.last_date_time), default=None)
+
+    return APIUtils().conditional_response(request=request, etag=etag, render=render, last_modified=last_modified)
 
 
 #######################
@@ -221,7 +232,12 @@ def axys_general_index(
         end_date: Optional[str] = Query(default=(date.today() + timedelta(days=2)),
             title="date_time format is yyyy-mm-dd",
             regex="^\d{4}\-(0[1-9]|1[012])\-(0[1-9]|[12][0-9]|3[01])$"),
-        db: Session = Depends(get_db)
+        db: Session = Depends(get_routed_db),
+        limit: int = None,
+        cursor: str = None,
+        fields: str = None,
+        since_id: int = None,
+        since_ts: str = None
     ) -> Any:
 
     user = crud.crud_adm.user.verify(db=db, arguments={'token=': token})
@@ -241,9 +257,15 @@ def axys_general_index(
 
     print(arguments)
 
-    result = crud.crud_moored.axys_general.index(db=db, arguments=arguments)
+    fields = crud.crud_moored.axys_general.select_fields(fields)
 
-    return result
+    if since_id is not None or since_ts:
+        rows, high_water_mark = crud.crud_moored.axys_general.changes(db=db, since_id=since_id, since_ts=since_ts, limit=limit, arguments={'buoy_id=': buoy_id}, fields=fields)
+        return APIUtils().json_stream_response(rows=rows, schema=AxysGeneralBase, fields=fields, high_water_mark=high_water_mark)
+
+    rows, next_cursor = crud.crud_moored.axys_general.paginate(db=db, limit=limit, cursor=cursor, arguments=arguments, fields=fields)
+
+    return APIUtils().json_stream_response(rows=rows, schema=AxysGeneralBase, next_cursor=next_cursor, fields=fields)
 
 #######################
 # MOORED.BMOBRRAW ENDPOINT
@@ -259,7 +281,12 @@ def bmobr_raw_index(
         end_date: Optional[str] = Query(default=(date.today() + timedelta(days=2)),
             title="date_time format is yyyy-mm-dd",
             regex="^\d{4}\-(0[1-9]|1[012])\-(0[1-9]|[12][0-9]|3[01])$"),
-        db: Session = Depends(get_db)
+        db: Session = Depends(get_routed_db),
+        limit: int = None,
+        cursor: str = None,
+        fields: str = None,
+        since_id: int = None,
+        since_ts: str = None
     ) -> Any:
 
     user = crud.crud_adm.user.verify(db=db, arguments={'token=': token})
@@ -279,9 +306,15 @@ def bmobr_raw_index(
 
     print(arguments)
 
-    result = crud.crud_moored.bmobr_raw.index(db=db, arguments=arguments)
+    fields = crud.crud_moored.bmobr_raw.select_fields(fields)
 
-    return result
+    if since_id is not None or since_ts:
+        rows, high_water_mark = crud.crud_moored.bmobr_raw.changes(db=db, since_id=since_id, since_ts=since_ts, limit=limit, arguments={'buoy_id=': buoy_id}, fields=fields)
+        return APIUtils().json_stream_response(rows=rows, schema=BmobrRawBase, fields=fields, high_water_mark=high_water_mark)
+
+    rows, next_cursor = crud.crud_moored.bmobr_raw.paginate(db=db, limit=limit, cursor=cursor, arguments=arguments, fields=fields)
+
+    return APIUtils().json_stream_response(rows=rows, schema=BmobrRawBase, next_cursor=next_cursor, fields=fields)
 
 
 #######################
@@ -298,7 +331,12 @@ def bmobr_triaxys_raw_index(
         end_date: Optional[str] = Query(default=(date.today() + timedelta(days=2)),
             title="date_time format is yyyy-mm-dd",
             regex="^\d{4}\-(0[1-9]|1[012])\-(0[1-9]|[12][0-9]|3[01])$"),
-        db: Session = Depends(get_db)
+        db: Session = Depends(get_routed_db),
+        limit: int = None,
+        cursor: str = None,
+        fields: str = None,
+        since_id: int = None,
+        since_ts: str = None
     ) -> Any:
 
     user = crud.crud_adm.user.verify(db=db, arguments={'token=': token})
@@ -318,9 +356,15 @@ def bmobr_triaxys_raw_index(
 
     print(arguments)
 
-    result = crud.crud_moored.bmobr_triaxys_raw.index(db=db, arguments=arguments)
+    fields = crud.crud_moored.bmobr_triaxys_raw.select_fields(fields)
 
-    return result
+    if since_id is not None or since_ts:
+        rows, high_water_mark = crud.crud_moored.bmobr_triaxys_raw.changes(db=db, since_id=since_id, since_ts=since_ts, limit=limit, arguments={'buoy_id=': buoy_id}, fields=fields)
+        return APIUtils().json_stream_response(rows=rows, schema=BmobrTriaxysRawBase, fields=fields, high_water_mark=high_water_mark)
+
+    rows, next_cursor = crud.crud_moored.bmobr_triaxys_raw.paginate(db=db, limit=limit, cursor=cursor, arguments=arguments, fields=fields)
+
+    return APIUtils().json_stream_response(rows=rows, schema=BmobrTriaxysRawBase, next_cursor=next_cursor, fields=fields)
 
 #######################
 # MOORED.SPOTTERALL ENDPOINT
@@ -336,7 +380,12 @@ def spotter_general_index(
         end_date: Optional[str] = Query(default=(date.today() + timedelta(days=2)),
             title="date_time format is yyyy-mm-dd",
             regex="^\d{4}\-(0[1-9]|1[012])\-(0[1-9]|[12][0-9]|3[01])$"),
-        db: Session = Depends(get_db)
+        db: Session = Depends(get_routed_db),
+        limit: int = None,
+        cursor: str = None,
+        fields: str = None,
+        since_id: int = None,
+        since_ts: str = None
     ) -> Any:
 
     user = crud.crud_adm.user.verify(db=db, arguments={'token=': token})
@@ -356,9 +405,15 @@ def spotter_general_index(
 
     print(arguments)
 
-    result = crud.crud_moored.spotter_all.index(db=db, arguments=arguments)
+    fields = crud.crud_moored.spotter_all.select_fields(fields)
 
-    return result
+    if since_id is not None or since_ts:
+        rows, high_water_mark = crud.crud_moored.spotter_all.changes(db=db, since_id=since_id, since_ts=since_ts, limit=limit, arguments={'buoy_id=': buoy_id}, fields=fields)
+        return APIUtils().json_stream_response(rows=rows, schema=SpotterAllBase, fields=fields, high_water_mark=high_water_mark)
+
+    rows, next_cursor = crud.crud_moored.spotter_all.paginate(db=db, limit=limit, cursor=cursor, arguments=arguments, fields=fields)
+
+    return APIUtils().json_stream_response(rows=rows, schema=SpotterAllBase, next_cursor=next_cursor, fields=fields)
 
 
 #######################
@@ -366,19 +421,19 @@ def spotter_general_index(
 #######################
 
 @router.get("/spotter_smart_mooring_config", status_code=200, response_model=List[SpotterSmartMooringConfigBase])
-def spotter_smart_mooring_config_index(
+async def spotter_smart_mooring_config_index(
         buoy_id: int,
         token: str,
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
     ) -> Any:
 
-    user = crud.crud_adm.user.verify(db=db, arguments={'token=': token})
+    user = await crud.crud_adm.user.verify_async(db=db, arguments={'token=': token})
 
     arguments = {'buoy_id=': buoy_id}
 
     print(arguments)
 
-    result = crud.crud_moored.spotter_smart_mooring_config.index(db=db, arguments=arguments)
+    result = await crud.crud_moored.spotter_smart_mooring_config.index_async(db=db, arguments=arguments)
 
     return result
 
@@ -386,7 +441,7 @@ def spotter_smart_mooring_config_index(
 def spotter_smart_mooring_config_create(
         token: str,
         obj_in: SpotterSmartMooringConfigNewBase,
-        db: Session = Depends(get_db)
+        db: Session = Depends(get_routed_db)
     ) -> Any:
     """
     Create new buoy
@@ -410,7 +465,7 @@ def spotter_smart_mooring_config_update(
         id: int,
         token: str,
         obj_in: SpotterSmartMooringConfigNewBase,
-        db: Session = Depends(get_db)
+        db: Session = Depends(get_routed_db)
     ) -> Any:
     """
     Create new buoy
@@ -441,7 +496,7 @@ def spotter_smart_mooring_config_update(
         *,
         id: int,
         token: str,
-        db: Session = Depends(get_db)
+        db: Session = Depends(get_routed_db)
     ) -> Any:
     """
     Create new buoy
@@ -481,7 +536,12 @@ def spotter_system_index(
         end_date: Optional[str] = Query(default=(date.today() + timedelta(days=2)),
             title="date_time format is yyyy-mm-dd",
             regex="^\d{4}\-(0[1-9]|1[012])\-(0[1-9]|[12][0-9]|3[01])$"),
-        db: Session = Depends(get_db)
+        db: Session = Depends(get_routed_db),
+        limit: int = None,
+        cursor: str = None,
+        fields: str = None,
+        since_id: int = None,
+        since_ts: str = None
     ) -> Any:
 
     user = crud.crud_adm.user.verify(db=db, arguments={'token=': token})
@@ -501,9 +561,15 @@ def spotter_system_index(
 
     print(arguments)
 
-    result = crud.crud_moored.spotter_system.index(db=db, arguments=arguments)
+    fields = crud.crud_moored.spotter_system.select_fields(fields)
 
-    return result
+    if since_id is not None or since_ts:
+        rows, high_water_mark = crud.crud_moored.spotter_system.changes(db=db, since_id=since_id, since_ts=since_ts, limit=limit, arguments={'buoy_id=': buoy_id}, fields=fields)
+        return APIUtils().json_stream_response(rows=rows, schema=SpotterSystemBase, fields=fields, high_water_mark=high_water_mark)
+
+    rows, next_cursor = crud.crud_moored.spotter_system.paginate(db=db, limit=limit, cursor=cursor, arguments=arguments, fields=fields)
+
+    return APIUtils().json_stream_response(rows=rows, schema=SpotterSystemBase, next_cursor=next_cursor, fields=fields)
 
 
 #######################
@@ -520,7 +586,12 @@ def bmobr_general_index(
         end_date: Optional[str] = Query(default=(date.today() + timedelta(days=2)),
             title="date_time format is yyyy-mm-dd",
             regex="^\d{4}\-(0[1-9]|1[012])\-(0[1-9]|[12][0-9]|3[01])$"),
-        db: Session = Depends(get_db)
+        db: Session = Depends(get_routed_db),
+        limit: int = None,
+        cursor: str = None,
+        fields: str = None,
+        since_id: int = None,
+        since_ts: str = None
     ) -> Any:
 
     user = crud.crud_adm.user.verify(db=db, arguments={'token=': token})
@@ -540,18 +611,24 @@ def bmobr_general_index(
 
     print(arguments)
 
-    result = crud.crud_moored.bmobr_general.index(db=db, arguments=arguments)
+    fields = crud.crud_moored.bmobr_general.select_fields(fields)
 
-    return result
+    if since_id is not None or since_ts:
+        rows, high_water_mark = crud.crud_moored.bmobr_general.changes(db=db, since_id=since_id, since_ts=since_ts, limit=limit, arguments={'buoy_id=': buoy_id}, fields=fields)
+        return APIUtils().json_stream_response(rows=rows, schema=BmobrGeneralBase, fields=fields, high_water_mark=high_water_mark)
+
+    rows, next_cursor = crud.crud_moored.bmobr_general.paginate(db=db, limit=limit, cursor=cursor, arguments=arguments, fields=fields)
+
+    return APIUtils().json_stream_response(rows=rows, schema=BmobrGeneralBase, next_cursor=next_cursor, fields=fields)
 
 #######################
 # MOORED.ALERTS ENDPOINT
 #######################
 
 @router.get("/alerts", status_code=200, response_model=List[AlertBase])
-def obj_index(
+async def obj_index(
         token: str,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_async_db),
         buoy_id:Optional[int] = None
     ) -> Any:
 
@@ -559,14 +636,14 @@ def obj_index(
     Fetch a single alert by buoy_id
     """
 
-    user = crud.crud_adm.user.verify(db=db, arguments={'token=': token})
+    user = await crud.crud_adm.user.verify_async(db=db, arguments={'token=': token})
 
     if buoy_id != None:
         arguments = {'buoy_id=': buoy_id}
     else:
         arguments = {}
 
-    result = crud.crud_moored.alert.index(db=db, arguments=arguments)
+    result = await crud.crud_moored.alert.index_async(db=db, arguments=arguments)
 
     if not result:
         raise HTTPException(
@@ -582,7 +659,7 @@ def obj_index(
 def buoy_create(
         token: str,
         obj_in: AlertNewBase,
-        db: Session = Depends(get_db)
+        db: Session = Depends(get_routed_db)
     ) -> Any:
     """
     Create a new alert
@@ -615,7 +692,7 @@ def buoy_update(
         token: str,
         buoy_id: int,
         obj_in: AlertNewBase,
-        db: Session = Depends(get_db)
+        db: Session = Depends(get_routed_db)
     ) -> Any:
     """
     Update an alert
@@ -644,7 +721,7 @@ def buoy_update(
         *,
         token: str,
         buoy_id: int,
-        db: Session = Depends(get_db)
+        db: Session = Depends(get_routed_db)
     ) -> Any:
     """
     Delete an alert
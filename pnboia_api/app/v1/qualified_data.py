@@ -1,8 +1,8 @@
-import pandas as pd
-import numpy as np
-
+import operator
+from itertools import chain
 from typing import Optional, Any, List
 from fastapi import APIRouter, Query, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from pnboia_api.schemas.qualified_data import *
@@ -15,14 +15,88 @@ import pnboia_api.crud as crud
 from  pnboia_api.db.base import Base, engine
 from datetime import datetime, timedelta, date
 
-from pnboia_api.app.deps import get_db
+from pnboia_api.app.deps import get_async_db, get_routed_db
 
+from pnboia_api.app.metadata import buoy_type_key, metadata_service
 from pnboia_api.app.utils import APIUtils
+from pnboia_api.crud.base import RESAMPLE_MAX_DAYS
 
 Base.metadata.create_all(bind=engine)
 
 router = APIRouter()
 
+# QualifiedDataPetrobrasBase field <- qualified data column. Every pair also
+# maps its flag, flag_<field> <- flag_<column>.
+PETROBRAS_FIELDS = (
+    ('HMS_HUMIDITY', 'rh'),
+    ('HMS_PRESSURE', 'pres'),
+    ('HMS_TEMPERATURE', 'atmp'),
+    ('HMS_WIND_SPEED1', 'wspd1'),
+    ('HMS_WIND_DIRECTION1', 'wdir1'),
+    ('HMS_WIND_SPEED2', 'wspd2'),
+    ('HMS_WIND_DIRECTION2', 'wdir2'),
+    ('HMS_WIND_RAJADA1', 'gust1'),
+    ('HMS_WIND_RAJADA2', 'gust2'),
+    ('TEMPERATURA_AGUA', 'sst'),
+    *((f'ADCP_BIN{n}_{field}', f'{column}{n}')
+        for n in range(1, 21)
+        for field, column in (('SPEED', 'cspd'), ('DIRECTION', 'cdir'))),
+    ('ONDA_ALTURA_SENSOR1', 'swvht1'),
+    ('ONDA_PERIODO_SENSOR1', 'tp1'),
+    ('ONDA_DIRECAOMED_SENSOR1', 'wvdir1'),
+    ('ONDA_ALTURAMAX_SENSOR1', 'mxwvht1'),
+    ('ONDA_ESPALHAMENTO1', 'wvspread1'),
+    ('ONDA_ALTURA_SENSOR2', 'swvht2'),
+    ('ONDA_PERIODO_SENSOR2', 'tp2'),
+    ('ONDA_DIRECAOMED_SENSOR2', 'wvdir2'),
+    ('battery', 'battery'),
+)
+# sent without a flag
+PETROBRAS_UNFLAGGED_FIELDS = ('id', 'buoy_id', 'date_time', 'latitude', 'longitude')
+# only sent by /petrobras/last, with the same name as the column
+PETROBRAS_EXTRA_FIELDS = ('wcdir1', 'wcspd1', 'wavgdir1', 'wavgspd1', 'gustdir1', 'wavgcdir1', 'wavgcspd1',
+    'gustcdir1', 'gustc1', 'windstat1', 'pres_sl1', 'rh1', 'atmp1', 'precipt1', 'pricipi1', 'srad1')
+
+ADCP_BIN_DEPTH_FIELDS = tuple(f'ADCP_BIN{n}_DEPTH' for n in range(1, 21))
+# depth (m) of the 20 ADCP bins, 3.5 m apart, of the buoys that had them
+# before moored.setup_buoy; the buoys without a setup row keep these
+ADCP_BIN_DEPTHS = {
+    **dict.fromkeys((2, 36), tuple(5.0 + 3.5 * n for n in range(20))),
+    **dict.fromkeys((22, 37), tuple(1.5 + 3.5 * n for n in range(20))),
+}
+
+
+def petrobras_mapping(extra_fields: bool = False) -> List[tuple]:
+    mapping = [(field, field) for field in PETROBRAS_UNFLAGGED_FIELDS]
+    for field, column in PETROBRAS_FIELDS:
+        mapping += [(field, column), (f'flag_{field}', f'flag_{column}')]
+    if extra_fields:
+        for field in PETROBRAS_EXTRA_FIELDS:
+            mapping += [(field, field), (f'flag_{field}', f'flag_{field}')]
+    return mapping
+
+
+PETROBRAS_MAPPINGS = {extra_fields: petrobras_mapping(extra_fields) for extra_fields in (False, True)}
+
+
+def petrobras_rows(rows, extra_fields: bool = False, bin_depths: dict = None):
+    """
+    Rename qualified data rows (model instances or masked rows) to the
+    QualifiedDataPetrobrasBase fields, adding Timestamp and the ADCP bin
+    depths of the buoy, from `bin_depths` (`metadata_service.adcp_bin_depths`)
+    or else `ADCP_BIN_DEPTHS`.
+    """
+    bin_depths = {**ADCP_BIN_DEPTHS, **(bin_depths or {})}
+    mapping = PETROBRAS_MAPPINGS[extra_fields]
+    fields = [field for field, _ in mapping]
+    get_values = operator.attrgetter(*[column for _, column in mapping])
+
+    for row in rows:
+        values = dict(zip(fields, get_values(row)))
+        values['Timestamp'] = int(row.date_time.timestamp()*1000)
+        values.update(zip(ADCP_BIN_DEPTH_FIELDS, bin_depths.get(row.buoy_id, ())))
+        yield QualifiedDataPetrobrasBase.construct(**values)
+
 #######################
 # QUALIFIED_DATA.QualifiedData ENDPOINT
 #######################
@@ -37,13 +111,21 @@ def qualified_data_index(
         end_date: Optional[str] = Query(default=(date.today() + timedelta(days=2)),
             title="date_time format is yyyy-mm-ddTHH:MM:SS",
             regex="\d{4}-\d?\d-\d?\dT(?:2[0-3]|[01]?[0-9]):[0-5]?[0-9]:[0-5]?[0-9]"),
-        db: Session = Depends(get_db),
+        db: Session = Depends(get_routed_db),
         flag: str = None,
         limit: int = None,
+        cursor: str = None,
+        fields: str = None,
+        resample: str = None,
+        agg: str = 'mean',
         order:Optional[bool]=True,
+        since_id: int = None,
+        since_ts: str = None,
         response_type:str="json"
     ) -> Any:
 
+    APIUtils().check_response_type(response_type)
+
     user = crud.crud_adm.user.verify(db=db, arguments={'token=': token})
 
     arguments = {}
@@ -58,17 +140,19 @@ def qualified_data_index(
         start_date = (datetime.utcnow() - timedelta(days=3))
     if start_date >= end_date:
         start_date = (end_date - timedelta(days=1))
-    if (end_date - start_date).days > 30:
-        end_date = (start_date + timedelta(days=30))
+    max_days = RESAMPLE_MAX_DAYS if resample else 30
+    if (end_date - start_date).days > max_days:
+        end_date = (start_date + timedelta(days=max_days))
 
 
     arguments = {'buoy_id=': buoy_id, 'date_time>=': start_date.strftime("%Y-%m-%dT%H:%M:%S"), 'date_time<=': end_date.strftime("%Y-%m-%dT%H:%M:%S")}
 
-    buoy = crud.crud_moored.buoy.show(db=db, id_pk = buoy_id)
+    buoy = crud.crud_moored.buoy.show_cached(db=db, id_pk = buoy_id)
 
+    synoptic = False
     if buoy.project_id == 2:
         if user.user_type not in ['admin', 'petrobras']:
-            arguments['extract(hour from date_time)'] = ['in', [0, 3, 6, 9, 12, 15, 18, 21]]
+            synoptic = True
 
     if not buoy.open_data and not user.user_type == 'admin':
         if not user.user_type == 'admin':
@@ -76,37 +160,21 @@ def qualified_data_index(
                 status_code=400,
                 detail="You do not have permission to do this action",
             )
+    elif since_id is not None or since_ts:
+        fields = crud.crud_qualified_data.qualified_data.select_fields(fields)
+        rows, high_water_mark = crud.crud_qualified_data.qualified_data.changes(db=db, since_id=since_id, since_ts=since_ts, limit=limit, arguments={'buoy_id=': buoy_id}, flag=flag, fields=fields, synoptic=synoptic)
+        filename = APIUtils().file_name_composition(buoy_name=buoy.name)
+        return APIUtils().rows_response(rows=rows, response_type=response_type, model=QualifiedData, schema=QualifiedDataBase, filename=filename, fields=fields, high_water_mark=high_water_mark)
+    elif resample:
+        fields = crud.crud_qualified_data.qualified_data.select_fields(fields)
+        rows, fields = crud.crud_qualified_data.qualified_data.resample(db=db, interval=resample, agg=agg, arguments=arguments, fields=fields, synoptic=synoptic)
+        filename = APIUtils().file_name_composition(buoy_name=buoy.name, start_date=start_date, end_date=end_date)
+        return APIUtils().rows_response(rows=rows, response_type=response_type, model=QualifiedData, schema=QualifiedDataBase, filename=filename, fields=fields)
     else:
-        result = crud.crud_qualified_data.qualified_data.index(db=db, order=order, arguments=arguments, limit=limit)
-
-    if flag:
-        result_dict = []
-        for r in result:
-            result_dict.append(vars(r))
-        result_df = pd.DataFrame(result_dict)
-        column_flag = []
-        for column in result_df.columns:
-            if column[0:4] == "flag":
-                column_flag.append(column.split("_")[1])
-        for c in column_flag:
-            if c not in ['latitude', 'longitude']:
-                if flag == 'all':
-                    result_df.loc[result_df[f"flag_{c}"]>0, f'{c}'] = np.nan
-                elif flag == 'soft':
-                    result_df.loc[(result_df[f"flag_{c}"]>0)&(result_df[f"flag_{c}"]<50), f'{c}'] = np.nan
-        result_dict = result_df.to_dict(orient='records')
-        for idx, r in enumerate(result):
-            for key,value in result_dict[idx].items():
-                if value == np.nan:
-                    delattr(result[idx],key)
-                    delattr(result[idx],f"flag_{key}")
-
-
-    if response_type == "csv":
+        fields = crud.crud_qualified_data.qualified_data.select_fields(fields)
+        rows, next_cursor = crud.crud_qualified_data.qualified_data.paginate(db=db, order=order, limit=limit, cursor=cursor, arguments=arguments, flag=flag, fields=fields, synoptic=synoptic)
         filename = APIUtils().file_name_composition(buoy_name=buoy.name, start_date=start_date, end_date=end_date)
-        return APIUtils().csv_response(result=result, filename=filename)
-    elif response_type == "json":
-        return result
+        return APIUtils().rows_response(rows=rows, response_type=response_type, model=QualifiedData, schema=QualifiedDataBase, filename=filename, next_cursor=next_cursor, fields=fields)
 
 
 @router.get("/petrobras", status_code=200, response_model=List[QualifiedDataPetrobrasBase])
@@ -119,11 +187,14 @@ def qualified_data_index(
         end_date: Optional[str] = Query(default=(datetime.utcnow() + timedelta(hours=4)).strftime("%Y-%m-%dT%H:%M:%S"),
             title="date_time format is yyyy-mm-ddTHH:MM:SS",
             regex="\d{4}-\d?\d-\d?\dT(?:2[0-3]|[01]?[0-9]):[0-5]?[0-9]:[0-5]?[0-9]"),
-        db: Session = Depends(get_db),
+        db: Session = Depends(get_routed_db),
         flag: str = None,
         limit: int = None,
+        cursor: str = None,
         order:Optional[bool]=True,
         last: bool = False,
+        since_id: int = None,
+        since_ts: str = None,
     ) -> Any:
 
     user = crud.crud_adm.user.verify(db=db, arguments={'token=': token})
@@ -140,16 +211,14 @@ def qualified_data_index(
     if (end_date - start_date).days > 10:
         start_date = (end_date - timedelta(days=10))
 
-    print(start_date)
-    print(end_date)
-
     arguments = {'buoy_id=': buoy_id, 'date_time>=': start_date.strftime("%Y-%m-%dT%H:%M:%S"), 'date_time<=': end_date.strftime("%Y-%m-%dT%H:%M:%S")}
 
-    buoy = crud.crud_moored.buoy.show(db=db, id_pk = buoy_id)
+    buoy = crud.crud_moored.buoy.show_cached(db=db, id_pk = buoy_id)
 
+    synoptic = False
     if buoy.project_id == 2:
         if user.user_type not in ['admin', 'petrobras']:
-            arguments['extract(hour from date_time)'] = ['in', [0, 3, 6, 9, 12, 15, 18, 21]]
+            synoptic = True
 
     if not buoy.open_data and not user.user_type == 'admin':
         if not user.user_type == 'admin':
@@ -157,487 +226,82 @@ def qualified_data_index(
                 status_code=400,
                 detail="You do not have permission to do this action",
             )
+    elif since_id is not None or since_ts:
+        next_cursor = None
+        result, high_water_mark = crud.crud_qualified_data.qualified_data.changes(db=db, since_id=since_id, since_ts=since_ts, limit=limit, arguments={'buoy_id=': buoy_id}, flag=flag, synoptic=synoptic)
     else:
-        result = crud.crud_qualified_data.qualified_data.index(db=db, order=order, arguments=arguments, limit=limit)
-
-
-    if flag:
-        result_dict = []
-        for r in result:
-            result_dict.append(vars(r))
-        result_df = pd.DataFrame(result_dict)
-        column_flag = []
-        for column in result_df.columns:
-            if column[0:4] == "flag":
-                column_flag.append(column.split("_")[1])
-        for c in column_flag:
-            if c not in ['latitude', 'longitude']:
-                if flag == 'all':
-                    result_df.loc[result_df[f"flag_{c}"]>0, f'{c}'] = np.nan
-                elif flag == 'soft':
-                    result_df.loc[(result_df[f"flag_{c}"]>0)&(result_df[f"flag_{c}"]<50), f'{c}'] = np.nan
-        result_dict = result_df.to_dict(orient='records')
-        for idx, r in enumerate(result):
-            for key,value in result_dict[idx].items():
-                if value == np.nan:
-                    delattr(result[idx],key)
-                    delattr(result[idx],f"flag_{key}")
-
-    result1 = []
-    for r in result:
-        r1 =  QualifiedDataPetrobrasBase()
-        r1.HMS_HUMIDITY = r.rh
-        r1.flag_HMS_HUMIDITY = r.flag_rh
-        r1.HMS_PRESSURE = r.pres
-        r1.flag_HMS_PRESSURE = r.flag_pres
-        r1.HMS_TEMPERATURE = r.atmp
-        r1.flag_HMS_TEMPERATURE = r.flag_atmp
-        r1.HMS_WIND_SPEED1 = r.wspd1
-        r1.flag_HMS_WIND_SPEED1 = r.flag_wspd1
-        r1.HMS_WIND_DIRECTION1 = r.wdir1
-        r1.flag_HMS_WIND_DIRECTION1 = r.flag_wdir1
-        r1.HMS_WIND_SPEED2 = r.wspd2
-        r1.flag_HMS_WIND_SPEED2 = r.flag_wspd2
-        r1.HMS_WIND_DIRECTION2 = r.wdir2
-        r1.flag_HMS_WIND_DIRECTION2 = r.flag_wdir2
-        r1.TEMPERATURA_AGUA = r.sst
-        r1.flag_TEMPERATURA_AGUA = r.flag_sst
-        r1.ADCP_BIN1_SPEED = r.cspd1
-        r1.flag_ADCP_BIN1_SPEED = r.flag_cspd1
-        r1.ADCP_BIN1_DIRECTION = r.cdir1
-        r1.flag_ADCP_BIN1_DIRECTION = r.flag_cdir1
-        r1.ADCP_BIN2_SPEED = r.cspd2
-        r1.flag_ADCP_BIN2_SPEED = r.flag_cspd2
-        r1.ADCP_BIN2_DIRECTION = r.cdir2
-        r1.flag_ADCP_BIN2_DIRECTION = r.flag_cdir2
-        r1.ADCP_BIN3_SPEED = r.cspd3
-        r1.flag_ADCP_BIN3_SPEED = r.flag_cspd3
-        r1.ADCP_BIN3_DIRECTION = r.cdir3
-        r1.flag_ADCP_BIN3_DIRECTION = r.flag_cdir3
-        r1.ADCP_BIN4_SPEED = r.cspd4
-        r1.flag_ADCP_BIN4_SPEED = r.flag_cspd4
-        r1.ADCP_BIN4_DIRECTION = r.cdir4
-        r1.flag_ADCP_BIN4_DIRECTION = r.flag_cdir4
-        r1.ADCP_BIN5_SPEED = r.cspd5
-        r1.flag_ADCP_BIN5_SPEED = r.flag_cspd5
-        r1.ADCP_BIN5_DIRECTION = r.cdir5
-        r1.flag_ADCP_BIN5_DIRECTION = r.flag_cdir5
-        r1.ADCP_BIN6_SPEED = r.cspd6
-        r1.flag_ADCP_BIN6_SPEED = r.flag_cspd6
-        r1.ADCP_BIN6_DIRECTION = r.cdir6
-        r1.flag_ADCP_BIN6_DIRECTION = r.flag_cdir6
-        r1.ADCP_BIN7_SPEED = r.cspd7
-        r1.flag_ADCP_BIN7_SPEED = r.flag_cspd7
-        r1.ADCP_BIN7_DIRECTION = r.cdir7
-        r1.flag_ADCP_BIN7_DIRECTION = r.flag_cdir7
-        r1.ADCP_BIN8_SPEED = r.cspd8
-        r1.flag_ADCP_BIN8_SPEED = r.flag_cspd8
-        r1.ADCP_BIN8_DIRECTION = r.cdir8
-        r1.flag_ADCP_BIN8_DIRECTION = r.flag_cdir8
-        r1.ADCP_BIN9_SPEED = r.cspd9
-        r1.flag_ADCP_BIN9_SPEED = r.flag_cspd9
-        r1.ADCP_BIN9_DIRECTION = r.cdir9
-        r1.flag_ADCP_BIN9_DIRECTION = r.flag_cdir9
-        r1.ADCP_BIN10_SPEED = r.cspd10
-        r1.flag_ADCP_BIN10_SPEED = r.flag_cspd10
-        r1.ADCP_BIN10_DIRECTION = r.cdir10
-        r1.flag_ADCP_BIN10_DIRECTION = r.flag_cdir10
-        r1.ADCP_BIN11_SPEED = r.cspd11
-        r1.flag_ADCP_BIN11_SPEED = r.flag_cspd11
-        r1.ADCP_BIN11_DIRECTION = r.cdir11
-        r1.flag_ADCP_BIN11_DIRECTION = r.flag_cdir11
-        r1.ADCP_BIN12_SPEED = r.cspd12
-        r1.flag_ADCP_BIN12_SPEED = r.flag_cspd12
-        r1.ADCP_BIN12_DIRECTION = r.cdir12
-        r1.flag_ADCP_BIN12_DIRECTION = r.flag_cdir12
-        r1.ADCP_BIN13_SPEED = r.cspd13
-        r1.flag_ADCP_BIN13_SPEED = r.flag_cspd13
-        r1.ADCP_BIN13_DIRECTION = r.cdir13
-        r1.flag_ADCP_BIN13_DIRECTION = r.flag_cdir13
-        r1.ADCP_BIN14_SPEED = r.cspd14
-        r1.flag_ADCP_BIN14_SPEED = r.flag_cspd14
-        r1.ADCP_BIN14_DIRECTION = r.cdir14
-        r1.flag_ADCP_BIN14_DIRECTION = r.flag_cdir14
-        r1.ADCP_BIN15_SPEED = r.cspd15
-        r1.flag_ADCP_BIN15_SPEED = r.flag_cspd15
-        r1.ADCP_BIN15_DIRECTION = r.cdir15
-        r1.flag_ADCP_BIN15_DIRECTION = r.flag_cdir15
-        r1.ADCP_BIN16_SPEED = r.cspd16
-        r1.flag_ADCP_BIN16_SPEED = r.flag_cspd16
-        r1.ADCP_BIN16_DIRECTION = r.cdir16
-        r1.flag_ADCP_BIN16_DIRECTION = r.flag_cdir16
-        r1.ADCP_BIN17_SPEED = r.cspd17
-        r1.flag_ADCP_BIN17_SPEED = r.flag_cspd17
-        r1.ADCP_BIN17_DIRECTION = r.cdir17
-        r1.flag_ADCP_BIN17_DIRECTION = r.flag_cdir17
-        r1.ADCP_BIN18_SPEED = r.cspd18
-        r1.flag_ADCP_BIN18_SPEED = r.flag_cspd18
-        r1.ADCP_BIN18_DIRECTION = r.cdir18
-        r1.flag_ADCP_BIN18_DIRECTION = r.flag_cdir18
-        r1.ADCP_BIN19_SPEED = r.cspd19
-        r1.flag_ADCP_BIN19_SPEED = r.flag_cspd19
-        r1.ADCP_BIN19_DIRECTION = r.cdir19
-        r1.flag_ADCP_BIN19_DIRECTION = r.flag_cdir19
-        r1.ADCP_BIN20_SPEED = r.cspd20
-        r1.flag_ADCP_BIN20_SPEED = r.flag_cspd20
-        r1.ADCP_BIN20_DIRECTION = r.cdir20
-        r1.flag_ADCP_BIN20_DIRECTION = r.flag_cdir20
-        if r.buoy_id in (2,36):
-            r1.ADCP_BIN1_DEPTH = 5.0
-            r1.ADCP_BIN2_DEPTH = 8.5
-            r1.ADCP_BIN3_DEPTH = 12.0
-            r1.ADCP_BIN4_DEPTH = 15.5
-            r1.ADCP_BIN5_DEPTH = 19.0
-            r1.ADCP_BIN6_DEPTH = 22.5
-            r1.ADCP_BIN7_DEPTH = 26.0
-            r1.ADCP_BIN8_DEPTH = 29.5
-            r1.ADCP_BIN9_DEPTH = 33.0
-            r1.ADCP_BIN10_DEPTH = 36.5
-            r1.ADCP_BIN11_DEPTH = 40.0
-            r1.ADCP_BIN12_DEPTH = 43.5
-            r1.ADCP_BIN13_DEPTH = 47.0
-            r1.ADCP_BIN14_DEPTH = 50.5
-            r1.ADCP_BIN15_DEPTH = 54.0
-            r1.ADCP_BIN16_DEPTH = 57.5
-            r1.ADCP_BIN17_DEPTH = 61.0
-            r1.ADCP_BIN18_DEPTH = 64.5
-            r1.ADCP_BIN19_DEPTH = 68.0
-            r1.ADCP_BIN20_DEPTH = 71.5
-        elif r.buoy_id in (22,37):
-            r1.ADCP_BIN1_DEPTH = 1.5
-            r1.ADCP_BIN2_DEPTH = 5.0
-            r1.ADCP_BIN3_DEPTH = 8.5
-            r1.ADCP_BIN4_DEPTH = 12.0
-            r1.ADCP_BIN5_DEPTH = 15.5
-            r1.ADCP_BIN6_DEPTH = 19.0
-            r1.ADCP_BIN7_DEPTH = 22.5
-            r1.ADCP_BIN8_DEPTH = 26.0
-            r1.ADCP_BIN9_DEPTH = 29.5
-            r1.ADCP_BIN10_DEPTH = 33.0
-            r1.ADCP_BIN11_DEPTH = 36.5
-            r1.ADCP_BIN12_DEPTH = 40.0
-            r1.ADCP_BIN13_DEPTH = 43.5
-            r1.ADCP_BIN14_DEPTH = 47.0
-            r1.ADCP_BIN15_DEPTH = 50.5
-            r1.ADCP_BIN16_DEPTH = 54.0
-            r1.ADCP_BIN17_DEPTH = 57.5
-            r1.ADCP_BIN18_DEPTH = 61.0
-            r1.ADCP_BIN19_DEPTH = 64.5
-            r1.ADCP_BIN20_DEPTH = 68.0
-        r1.ONDA_ALTURA_SENSOR1 = r.swvht1
-        r1.flag_ONDA_ALTURA_SENSOR1 = r.flag_swvht1
-        r1.ONDA_PERIODO_SENSOR1 = r.tp1
-        r1.flag_ONDA_PERIODO_SENSOR1 = r.flag_tp1
-        r1.ONDA_DIRECAOMED_SENSOR1 = r.wvdir1
-        r1.flag_ONDA_DIRECAOMED_SENSOR1 = r.flag_wvdir1
-        r1.ONDA_ALTURA_SENSOR2 = r.swvht2
-        r1.flag_ONDA_ALTURA_SENSOR2 = r.flag_swvht2
-        r1.ONDA_PERIODO_SENSOR2 = r.tp2
-        r1.flag_ONDA_PERIODO_SENSOR2 = r.flag_tp2
-        r1.ONDA_DIRECAOMED_SENSOR2 = r.wvdir2
-        r1.flag_ONDA_DIRECAOMED_SENSOR2 = r.flag_wvdir2
-        r1.Timestamp = int(r.date_time.timestamp()*1000)
-        r1.id = r.id
-        # r1.raw_id = r.raw_id
-        r1.buoy_id = r.buoy_id
-        r1.date_time = r.date_time
-        r1.latitude = r.latitude
-        r1.longitude = r.longitude
-        # r1.geom = r.geom
-        r1.battery = r.battery
-        r1.flag_battery = r.flag_battery
-        r1.HMS_WIND_RAJADA1 = r.gust1
-        r1.flag_HMS_WIND_RAJADA1 = r.flag_gust1
-        r1.HMS_WIND_RAJADA2 = r.gust2
-        r1.flag_HMS_WIND_RAJADA2 = r.flag_gust2
-        # r1.srad = r.srad
-        # r1.flag_srad = r.flag_srad
-        # r1.dewpt = r.dewpt
-        # r1.flag_dewpt = r.flag_dewpt
-        r1.ONDA_ALTURAMAX_SENSOR1 = r.mxwvht1
-        r1.flag_ONDA_ALTURAMAX_SENSOR1 = r.flag_mxwvht1
-        r1.ONDA_ESPALHAMENTO1 = r.wvspread1
-        r1.flag_ONDA_ESPALHAMENTO1 = r.flag_wvspread1
-        # r1.tm1 = r.tm1
-        # r1.flag_tm1 = r.flag_tm1
-        # r1.pkdir1 = r.pkdir1
-        # r1.flag_pkdir1 = r.flag_pkdir1
-        # r1.pkspread1 = r.pkspread1
-        # r1.flag_pkspread1 = r.flag_pkspread1
-        # r1.sensors_data_flagged = r.sensors_data_flagged
-        # r1.cond = r.cond
-        # r1.flag_cond = r.flag_cond
-        # r1.sss = r.sss
-        # r1.flag_sss = r.flag_sss
-
-        result1.append(r1)
-
-    return result1
+        high_water_mark = None
+        result, next_cursor = crud.crud_qualified_data.qualified_data.paginate(db=db, order=order, limit=limit, cursor=cursor, arguments=arguments, flag=flag, synoptic=synoptic)
+
+    result = petrobras_rows(result, bin_depths=metadata_service.adcp_bin_depths(db))
+
+    return APIUtils().json_stream_response(rows=result, schema=QualifiedDataPetrobrasBase, next_cursor=next_cursor, high_water_mark=high_water_mark)
 
 
 
 
 @router.get("/petrobras/last", status_code=200, response_model=List[QualifiedDataPetrobrasBase])
-def qualified_data_last(
+async def qualified_data_last(
         token: str,
         buoy_id:int = None,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_async_db),
         last: bool = True,
         open_data: bool = False,
     ) -> Any:
-
-    user = crud.crud_adm.user.verify(db=db, arguments={'token=': token})
+    """
+    The latest row of each buoy (or `buoy_id`), with the PETROBRAS
+    field names and the ADCP bin depths. With `last`, requests on the read
+    replica are answered from an in-memory copy of the latest rows,
+    reloaded every LATEST_OBSERVATION_REFRESH seconds (60 by default), so
+    a new row can take that long to show up; /v1/stream/petrobras sends
+    rows as they arrive. Requests kept on the primary (right after a
+    write by the same token, or while the replica lags) query the
+    database instead. Without a replica every request uses the copy.
+    """
+
+    user = await crud.crud_adm.user.verify_async(db=db, arguments={'token=': token})
 
     arguments = {'buoy_id=': buoy_id}
 
     if open_data:
         arguments['open_data='] = True
 
-    result = crud.crud_qualified_data.bmobr_qualified_data.last(db=db, arguments=arguments, last=last, buoy_sel=True)
-
-    result1 = []
-    for r in result:
-        r1 =  QualifiedDataPetrobrasBase()
-        r1.HMS_HUMIDITY = r.rh
-        r1.flag_HMS_HUMIDITY = r.flag_rh
-        r1.HMS_PRESSURE = r.pres
-        r1.flag_HMS_PRESSURE = r.flag_pres
-        r1.HMS_TEMPERATURE = r.atmp
-        r1.flag_HMS_TEMPERATURE = r.flag_atmp
-        r1.HMS_WIND_SPEED1 = r.wspd1
-        r1.flag_HMS_WIND_SPEED1 = r.flag_wspd1
-        r1.HMS_WIND_DIRECTION1 = r.wdir1
-        r1.flag_HMS_WIND_DIRECTION1 = r.flag_wdir1
-        r1.HMS_WIND_SPEED2 = r.wspd2
-        r1.flag_HMS_WIND_SPEED2 = r.flag_wspd2
-        r1.HMS_WIND_DIRECTION2 = r.wdir2
-        r1.flag_HMS_WIND_DIRECTION2 = r.flag_wdir2
-        r1.TEMPERATURA_AGUA = r.sst
-        r1.flag_TEMPERATURA_AGUA = r.flag_sst
-        r1.ADCP_BIN1_SPEED = r.cspd1
-        r1.flag_ADCP_BIN1_SPEED = r.flag_cspd1
-        r1.ADCP_BIN1_DIRECTION = r.cdir1
-        r1.flag_ADCP_BIN1_DIRECTION = r.flag_cdir1
-        r1.ADCP_BIN2_SPEED = r.cspd2
-        r1.flag_ADCP_BIN2_SPEED = r.flag_cspd2
-        r1.ADCP_BIN2_DIRECTION = r.cdir2
-        r1.flag_ADCP_BIN2_DIRECTION = r.flag_cdir2
-        r1.ADCP_BIN3_SPEED = r.cspd3
-        r1.flag_ADCP_BIN3_SPEED = r.flag_cspd3
-        r1.ADCP_BIN3_DIRECTION = r.cdir3
-        r1.flag_ADCP_BIN3_DIRECTION = r.flag_cdir3
-        r1.ADCP_BIN4_SPEED = r.cspd4
-        r1.flag_ADCP_BIN4_SPEED = r.flag_cspd4
-        r1.ADCP_BIN4_DIRECTION = r.cdir4
-        r1.flag_ADCP_BIN4_DIRECTION = r.flag_cdir4
-        r1.ADCP_BIN5_SPEED = r.cspd5
-        r1.flag_ADCP_BIN5_SPEED = r.flag_cspd5
-        r1.ADCP_BIN5_DIRECTION = r.cdir5
-        r1.flag_ADCP_BIN5_DIRECTION = r.flag_cdir5
-        r1.ADCP_BIN6_SPEED = r.cspd6
-        r1.flag_ADCP_BIN6_SPEED = r.flag_cspd6
-        r1.ADCP_BIN6_DIRECTION = r.cdir6
-        r1.flag_ADCP_BIN6_DIRECTION = r.flag_cdir6
-        r1.ADCP_BIN7_SPEED = r.cspd7
-        r1.flag_ADCP_BIN7_SPEED = r.flag_cspd7
-        r1.ADCP_BIN7_DIRECTION = r.cdir7
-        r1.flag_ADCP_BIN7_DIRECTION = r.flag_cdir7
-        r1.ADCP_BIN8_SPEED = r.cspd8
-        r1.flag_ADCP_BIN8_SPEED = r.flag_cspd8
-        r1.ADCP_BIN8_DIRECTION = r.cdir8
-        r1.flag_ADCP_BIN8_DIRECTION = r.flag_cdir8
-        r1.ADCP_BIN9_SPEED = r.cspd9
-        r1.flag_ADCP_BIN9_SPEED = r.flag_cspd9
-        r1.ADCP_BIN9_DIRECTION = r.cdir9
-        r1.flag_ADCP_BIN9_DIRECTION = r.flag_cdir9
-        r1.ADCP_BIN10_SPEED = r.cspd10
-        r1.flag_ADCP_BIN10_SPEED = r.flag_cspd10
-        r1.ADCP_BIN10_DIRECTION = r.cdir10
-        r1.flag_ADCP_BIN10_DIRECTION = r.flag_cdir10
-        r1.ADCP_BIN11_SPEED = r.cspd11
-        r1.flag_ADCP_BIN11_SPEED = r.flag_cspd11
-        r1.ADCP_BIN11_DIRECTION = r.cdir11
-        r1.flag_ADCP_BIN11_DIRECTION = r.flag_cdir11
-        r1.ADCP_BIN12_SPEED = r.cspd12
-        r1.flag_ADCP_BIN12_SPEED = r.flag_cspd12
-        r1.ADCP_BIN12_DIRECTION = r.cdir12
-        r1.flag_ADCP_BIN12_DIRECTION = r.flag_cdir12
-        r1.ADCP_BIN13_SPEED = r.cspd13
-        r1.flag_ADCP_BIN13_SPEED = r.flag_cspd13
-        r1.ADCP_BIN13_DIRECTION = r.cdir13
-        r1.flag_ADCP_BIN13_DIRECTION = r.flag_cdir13
-        r1.ADCP_BIN14_SPEED = r.cspd14
-        r1.flag_ADCP_BIN14_SPEED = r.flag_cspd14
-        r1.ADCP_BIN14_DIRECTION = r.cdir14
-        r1.flag_ADCP_BIN14_DIRECTION = r.flag_cdir14
-        r1.ADCP_BIN15_SPEED = r.cspd15
-        r1.flag_ADCP_BIN15_SPEED = r.flag_cspd15
-        r1.ADCP_BIN15_DIRECTION = r.cdir15
-        r1.flag_ADCP_BIN15_DIRECTION = r.flag_cdir15
-        r1.ADCP_BIN16_SPEED = r.cspd16
-        r1.flag_ADCP_BIN16_SPEED = r.flag_cspd16
-        r1.ADCP_BIN16_DIRECTION = r.cdir16
-        r1.flag_ADCP_BIN16_DIRECTION = r.flag_cdir16
-        r1.ADCP_BIN17_SPEED = r.cspd17
-        r1.flag_ADCP_BIN17_SPEED = r.flag_cspd17
-        r1.ADCP_BIN17_DIRECTION = r.cdir17
-        r1.flag_ADCP_BIN17_DIRECTION = r.flag_cdir17
-        r1.ADCP_BIN18_SPEED = r.cspd18
-        r1.flag_ADCP_BIN18_SPEED = r.flag_cspd18
-        r1.ADCP_BIN18_DIRECTION = r.cdir18
-        r1.flag_ADCP_BIN18_DIRECTION = r.flag_cdir18
-        r1.ADCP_BIN19_SPEED = r.cspd19
-        r1.flag_ADCP_BIN19_SPEED = r.flag_cspd19
-        r1.ADCP_BIN19_DIRECTION = r.cdir19
-        r1.flag_ADCP_BIN19_DIRECTION = r.flag_cdir19
-        r1.ADCP_BIN20_SPEED = r.cspd20
-        r1.flag_ADCP_BIN20_SPEED = r.flag_cspd20
-        r1.ADCP_BIN20_DIRECTION = r.cdir20
-        r1.flag_ADCP_BIN20_DIRECTION = r.flag_cdir20
-        if r.buoy_id in (2,36):
-            r1.ADCP_BIN1_DEPTH = 5.0
-            r1.ADCP_BIN2_DEPTH = 8.5
-            r1.ADCP_BIN3_DEPTH = 12.0
-            r1.ADCP_BIN4_DEPTH = 15.5
-            r1.ADCP_BIN5_DEPTH = 19.0
-            r1.ADCP_BIN6_DEPTH = 22.5
-            r1.ADCP_BIN7_DEPTH = 26.0
-            r1.ADCP_BIN8_DEPTH = 29.5
-            r1.ADCP_BIN9_DEPTH = 33.0
-            r1.ADCP_BIN10_DEPTH = 36.5
-            r1.ADCP_BIN11_DEPTH = 40.0
-            r1.ADCP_BIN12_DEPTH = 43.5
-            r1.ADCP_BIN13_DEPTH = 47.0
-            r1.ADCP_BIN14_DEPTH = 50.5
-            r1.ADCP_BIN15_DEPTH = 54.0
-            r1.ADCP_BIN16_DEPTH = 57.5
-            r1.ADCP_BIN17_DEPTH = 61.0
-            r1.ADCP_BIN18_DEPTH = 64.5
-            r1.ADCP_BIN19_DEPTH = 68.0
-            r1.ADCP_BIN20_DEPTH = 71.5
-        elif r.buoy_id in (22,37):
-            r1.ADCP_BIN1_DEPTH = 1.5
-            r1.ADCP_BIN2_DEPTH = 5.0
-            r1.ADCP_BIN3_DEPTH = 8.5
-            r1.ADCP_BIN4_DEPTH = 12.0
-            r1.ADCP_BIN5_DEPTH = 15.5
-            r1.ADCP_BIN6_DEPTH = 19.0
-            r1.ADCP_BIN7_DEPTH = 22.5
-            r1.ADCP_BIN8_DEPTH = 26.0
-            r1.ADCP_BIN9_DEPTH = 29.5
-            r1.ADCP_BIN10_DEPTH = 33.0
-            r1.ADCP_BIN11_DEPTH = 36.5
-            r1.ADCP_BIN12_DEPTH = 40.0
-            r1.ADCP_BIN13_DEPTH = 43.5
-            r1.ADCP_BIN14_DEPTH = 47.0
-            r1.ADCP_BIN15_DEPTH = 50.5
-            r1.ADCP_BIN16_DEPTH = 54.0
-            r1.ADCP_BIN17_DEPTH = 57.5
-            r1.ADCP_BIN18_DEPTH = 61.0
-            r1.ADCP_BIN19_DEPTH = 64.5
-            r1.ADCP_BIN20_DEPTH = 68.0
-        r1.ONDA_ALTURA_SENSOR1 = r.swvht1
-        r1.flag_ONDA_ALTURA_SENSOR1 = r.flag_swvht1
-        r1.ONDA_PERIODO_SENSOR1 = r.tp1
-        r1.flag_ONDA_PERIODO_SENSOR1 = r.flag_tp1
-        r1.ONDA_DIRECAOMED_SENSOR1 = r.wvdir1
-        r1.flag_ONDA_DIRECAOMED_SENSOR1 = r.flag_wvdir1
-        r1.ONDA_ALTURA_SENSOR2 = r.swvht2
-        r1.flag_ONDA_ALTURA_SENSOR2 = r.flag_swvht2
-        r1.ONDA_PERIODO_SENSOR2 = r.tp2
-        r1.flag_ONDA_PERIODO_SENSOR2 = r.flag_tp2
-        r1.ONDA_DIRECAOMED_SENSOR2 = r.wvdir2
-        r1.flag_ONDA_DIRECAOMED_SENSOR2 = r.flag_wvdir2
-        r1.Timestamp = int(r.date_time.timestamp()*1000)
-        r1.id = r.id
-        # r1.raw_id = r.raw_id
-        r1.buoy_id = r.buoy_id
-        r1.date_time = r.date_time
-        r1.latitude = r.latitude
-        r1.longitude = r.longitude
-        # r1.geom = r.geom
-        r1.battery = r.battery
-        r1.flag_battery = r.flag_battery
-        r1.HMS_WIND_RAJADA1 = r.gust1
-        r1.flag_HMS_WIND_RAJADA1 = r.flag_gust1
-        r1.HMS_WIND_RAJADA2 = r.gust2
-        r1.flag_HMS_WIND_RAJADA2 = r.flag_gust2
-        # r1.srad = r.srad
-        # r1.flag_srad = r.flag_srad
-        # r1.dewpt = r.dewpt
-        # r1.flag_dewpt = r.flag_dewpt
-        r1.ONDA_ALTURAMAX_SENSOR1 = r.mxwvht1
-        r1.flag_ONDA_ALTURAMAX_SENSOR1 = r.flag_mxwvht1
-        r1.ONDA_ESPALHAMENTO1 = r.wvspread1
-        r1.flag_ONDA_ESPALHAMENTO1 = r.flag_wvspread1
-        # r1.tm1 = r.tm1
-        # r1.flag_tm1 = r.flag_tm1
-        # r1.pkdir1 = r.pkdir1
-        # r1.flag_pkdir1 = r.flag_pkdir1
-        # r1.pkspread1 = r.pkspread1
-        # r1.flag_pkspread1 = r.flag_pkspread1
-        # r1.sensors_data_flagged = r.sensors_data_flagged
-        # r1.cond = r.cond
-        # r1.flag_cond = r.flag_cond
-        # r1.sss = r.sss
-        # r1.flag_sss = r.flag_sss
-        # Map new fields
-        r1.wcdir1 = r.wcdir1
-        r1.flag_wcdir1 = r.flag_wcdir1
-        r1.wcspd1 = r.wcspd1
-        r1.flag_wcspd1 = r.flag_wcspd1
-        r1.wavgdir1 = r.wavgdir1
-        r1.flag_wavgdir1 = r.flag_wavgdir1
-        r1.wavgspd1 = r.wavgspd1
-        r1.flag_wavgspd1 = r.flag_wavgspd1
-        r1.gustdir1 = r.gustdir1
-        r1.flag_gustdir1 = r.flag_gustdir1
-        r1.wavgcdir1 = r.wavgcdir1
-        r1.flag_wavgcdir1 = r.flag_wavgcdir1
-        r1.wavgcspd1 = r.wavgcspd1
-        r1.flag_wavgcspd1 = r.flag_wavgcspd1
-        r1.gustcdir1 = r.gustcdir1
-        r1.flag_gustcdir1 = r.flag_gustcdir1
-        r1.gustc1 = r.gustc1
-        r1.flag_gustc1 = r.flag_gustc1
-        r1.windstat1 = r.windstat1
-        r1.flag_windstat1 = r.flag_windstat1
-        r1.pres_sl1 = r.pres_sl1
-        r1.flag_pres_sl1 = r.flag_pres_sl1
-        r1.rh1 = r.rh1
-        r1.flag_rh1 = r.flag_rh1
-        r1.atmp1 = r.atmp1
-        r1.flag_atmp1 = r.flag_atmp1
-        r1.precipt1 = r.precipt1
-        r1.flag_precipt1 = r.flag_precipt1
-        r1.pricipi1 = r.pricipi1
-        r1.flag_pricipi1 = r.flag_pricipi1
-        r1.srad1 = r.srad1
-        r1.flag_srad1 = r.flag_srad1
-        result1.append(r1)
-
-    return result1
+    result = await crud.crud_qualified_data.bmobr_qualified_data.last_async(db=db, arguments=arguments, last=last, buoy_sel=True)
+
+    bin_depths = await db.run_sync(metadata_service.adcp_bin_depths)
+    result = petrobras_rows(result, extra_fields=True, bin_depths=bin_depths)
+
+    return APIUtils().json_response(rows=result, schema=QualifiedDataPetrobrasBase)
 
 
 @router.get("/qualified_data/last", status_code=200, response_model=List[QualifiedDataPetrobrasBase])
-def qualified_data_last(
+async def qualified_data_last(
         token: str,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_async_db),
         last: bool = True,
         open_data: bool = False,
         buoy_id:int = None,
     ) -> Any:
-
-    user = crud.crud_adm.user.verify(db=db, arguments={'token=': token})
+    """
+    The latest row of each buoy. With `last`, requests on the read
+    replica are answered from an in-memory copy of the latest rows,
+    reloaded every LATEST_OBSERVATION_REFRESH seconds (60 by default), so
+    a new row can take that long to show up; /v1/stream/qualified_data sends
+    rows as they arrive. Requests kept on the primary (right after a
+    write by the same token, or while the replica lags) query the
+    database instead. Without a replica every request uses the copy.
+    """
+
+    user = await crud.crud_adm.user.verify_async(db=db, arguments={'token=': token})
 
     arguments = {}
 
     if open_data:
         arguments['open_data='] = True
 
-    result = crud.crud_qualified_data.qualified_data.last(db=db, arguments=arguments, last=last)
+    result = await crud.crud_qualified_data.qualified_data.last_async(db=db, arguments=arguments, last=last)
 
-    return result
+    return APIUtils().json_response(rows=result, schema=QualifiedDataPetrobrasBase)
 
 
 @router.get("/spotter", status_code=200, response_model=List[SpotterQualifiedSchema])
@@ -650,12 +314,20 @@ def qualified_data_index(
         end_date: Optional[str] = Query(default=(datetime.utcnow().replace(microsecond=0) + timedelta(days=2)),
                     title="date_time format is yyyy-mm-ddTHH:MM:SS",
                     regex="\d{4}-\d?\d-\d?\dT(?:2[0-3]|[01]?[0-9]):[0-5]?[0-9]:[0-5]?[0-9]"),
-        db: Session = Depends(get_db),
+        db: Session = Depends(get_routed_db),
         limit: int = None,
+        cursor: str = None,
+        fields: str = None,
+        resample: str = None,
+        agg: str = 'mean',
         last: bool = False,
+        since_id: int = None,
+        since_ts: str = None,
         response_type:str="json"
     ) -> Any:
 
+    APIUtils().check_response_type(response_type)
+
     user = crud.crud_adm.user.verify(db=db, arguments={'token=': token})
 
     arguments = {}
@@ -680,13 +352,14 @@ def qualified_data_index(
                 status_code=400,
                 detail=f"Provided start date is more recent than the provided end date. Please review your requested period.",
             )
-    if (end_date - start_date).days > 30:
-        end_date = (start_date + timedelta(days=30))
+    max_days = RESAMPLE_MAX_DAYS if resample else 30
+    if (end_date - start_date).days > max_days:
+        end_date = (start_date + timedelta(days=max_days))
 
 
     arguments = {'buoy_id=': buoy_id, 'date_time>=': start_date.strftime("%Y-%m-%d"), 'date_time<=': end_date.strftime("%Y-%m-%d")}
 
-    buoy = crud.crud_moored.buoy.show(db=db, id_pk = buoy_id)
+    buoy = crud.crud_moored.buoy.show_cached(db=db, id_pk = buoy_id)
 
     if "SPOTTER" not in buoy.name:
         raise HTTPException(
@@ -705,32 +378,27 @@ def qualified_data_index(
                 detail="You do not have permission to do this action",
             )
     else:
-        if last:
-            arguments = {"buoy_id=":buoy_id}
-            result = crud.crud_qualified_data.spotter_qualified_data.last(db=db, arguments=arguments, last=last, buoy_sel=True)
-        else:
-            result = crud.crud_qualified_data.spotter_qualified_data.index(db=db, order=True, arguments=arguments, limit=limit)
-
-
-    if not result:
-        raise HTTPException(
-                status_code=400,
-                detail=f"No data for buoy {buoy_id} for the period.",
-            )
+        qualified = crud.crud_qualified_data.spotter_qualified_data
+        fields = qualified.select_fields(fields)
+        filename = APIUtils().file_name_composition(buoy_name=buoy.name, start_date=start_date, end_date=end_date)
+        empty_detail = f"No data for buoy {buoy_id} for the period."
+        next_cursor = high_water_mark = None
 
-    if response_type == "csv":
         if last:
             filename = APIUtils().file_name_composition(buoy_name=buoy.name)
+            rows = qualified.last(db=db, arguments={"buoy_id=": buoy_id}, last=last, buoy_sel=True)
+            fields = None
+        elif since_id is not None or since_ts:
+            filename = APIUtils().file_name_composition(buoy_name=buoy.name)
+            empty_detail = None
+            rows, high_water_mark = qualified.changes(db=db, since_id=since_id, since_ts=since_ts, limit=limit, arguments={"buoy_id=": buoy_id}, fields=fields)
+        elif resample:
+            rows, fields = qualified.resample(db=db, interval=resample, agg=agg, arguments=arguments, fields=fields)
         else:
-            filename = APIUtils().file_name_composition(buoy_name=buoy.name, start_date=start_date, end_date=end_date)
-        return APIUtils().csv_response(result=result, filename=filename)
-    elif response_type == "json":
-        return result
-    else:
-        raise HTTPException(
-                status_code=400,
-                detail=f"Invalid response type. ['json' or 'csv'] available.",
-            )
+            rows, next_cursor = qualified.paginate(db=db, order=True, limit=limit, cursor=cursor, arguments=arguments, fields=fields)
+
+        return APIUtils().rows_response(rows=rows, response_type=response_type, model=SpotterQualified, schema=SpotterQualifiedSchema, filename=filename,
+            empty_detail=empty_detail, next_cursor=next_cursor, fields=fields, high_water_mark=high_water_mark)
 
 
 @router.get("/triaxys", status_code=200, response_model=List[TriaxysQualifiedSchema])
@@ -743,12 +411,20 @@ def qualified_data_index(
         end_date: Optional[str] = Query(default=(datetime.utcnow().replace(microsecond=0) + timedelta(days=2)),
                     title="date_time format is yyyy-mm-ddTHH:MM:SS",
                     regex="\d{4}-\d?\d-\d?\dT(?:2[0-3]|[01]?[0-9]):[0-5]?[0-9]:[0-5]?[0-9]"),
-        db: Session = Depends(get_db),
+        db: Session = Depends(get_routed_db),
         limit: int = None,
+        cursor: str = None,
+        fields: str = None,
+        resample: str = None,
+        agg: str = 'mean',
         last: bool = False,
+        since_id: int = None,
+        since_ts: str = None,
         response_type:str="json"
     ) -> Any:
 
+    APIUtils().check_response_type(response_type)
+
     user = crud.crud_adm.user.verify(db=db, arguments={'token=': token})
 
     arguments = {}
@@ -772,13 +448,14 @@ def qualified_data_index(
                 status_code=400,
                 detail=f"Provided start date is more recent than the provided end date. Please review your requested period.",
             )
-    if (end_date - start_date).days > 30:
-        end_date = (start_date + timedelta(days=30))
+    max_days = RESAMPLE_MAX_DAYS if resample else 30
+    if (end_date - start_date).days > max_days:
+        end_date = (start_date + timedelta(days=max_days))
 
 
     arguments = {'buoy_id=': buoy_id, 'date_time>=': start_date.strftime("%Y-%m-%d"), 'date_time<=': end_date.strftime("%Y-%m-%d")}
 
-    buoy = crud.crud_moored.buoy.show(db=db, id_pk = buoy_id)
+    buoy = crud.crud_moored.buoy.show_cached(db=db, id_pk = buoy_id)
 
     if "TRIAXYS" not in buoy.name:
         raise HTTPException(
@@ -797,30 +474,28 @@ def qualified_data_index(
                 detail="You do not have permission to do this action",
             )
     else:
-        if last:
-            arguments = {"buoy_id=":buoy_id}
-            result = crud.crud_qualified_data.triaxys_qualified_data.last(db=db, arguments=arguments, last=last, buoy_sel=True)
-        else:
-            result = crud.crud_qualified_data.triaxys_qualified_data.index(db=db, order=True, arguments=arguments, limit=limit)
-    if not result:
-        raise HTTPException(
-                status_code=400,
-                detail=f"No data for buoy {buoy_id} for the period.",
-            )
+        qualified = crud.crud_qualified_data.triaxys_qualified_data
+        fields = qualified.select_fields(fields)
+        filename = APIUtils().file_name_composition(buoy_name=buoy.name, start_date=start_date, end_date=end_date)
+        empty_detail = f"No data for buoy {buoy_id} for the period."
+        next_cursor = high_water_mark = None
 
-    if response_type == "csv":
         if last:
             filename = APIUtils().file_name_composition(buoy_name=buoy.name)
+            rows = qualified.last(db=db, arguments={"buoy_id=": buoy_id}, last=last, buoy_sel=True)
+            fields = None
+        elif since_id is not None or since_ts:
+            filename = APIUtils().file_name_composition(buoy_name=buoy.name)
+            empty_detail = None
+            rows, high_water_mark = qualified.changes(db=db, since_id=since_id, since_ts=since_ts, limit=limit, arguments={"buoy_id=": buoy_id}, fields=fields)
+        elif resample:
+            rows, fields = qualified.resample(db=db, interval=resample, agg=agg, arguments=arguments, fields=fields)
         else:
-            filename = APIUtils().file_name_composition(buoy_name=buoy.name, start_date=start_date, end_date=end_date)
-        return APIUtils().csv_response(result=result, filename=filename)
-    elif response_type == "json":
-        return result
-    else:
-        raise HTTPException(
-                status_code=400,
-                detail=f"Invalid response type. ['json' or 'csv'] available.",
-            )
+            rows, next_cursor = qualified.paginate(db=db, order=True, limit=limit, cursor=cursor, arguments=arguments, fields=fields)
+
+        return APIUtils().rows_response(rows=rows, response_type=response_type, model=TriaxysQualified, schema=TriaxysQualifiedSchema, filename=filename,
+            empty_detail=empty_detail, next_cursor=next_cursor, fields=fields, high_water_mark=high_water_mark)
+
 
 @router.get("/bmobr", status_code=200, response_model=List[BMOBrQualifiedSchema])
 def qualified_data_index(
@@ -832,12 +507,20 @@ def qualified_data_index(
         end_date: Optional[str] = Query(default=(datetime.utcnow().replace(microsecond=0) + timedelta(days=2)),
                     title="date_time format is yyyy-mm-ddTHH:MM:SS",
                     regex="\d{4}-\d?\d-\d?\dT(?:2[0-3]|[01]?[0-9]):[0-5]?[0-9]:[0-5]?[0-9]"),
-        db: Session = Depends(get_db),
+        db: Session = Depends(get_routed_db),
         limit: int = None,
+        cursor: str = None,
+        fields: str = None,
+        resample: str = None,
+        agg: str = 'mean',
         last: bool = False,
+        since_id: int = None,
+        since_ts: str = None,
         response_type:str="json"
     ) -> Any:
 
+    APIUtils().check_response_type(response_type)
+
     user = crud.crud_adm.user.verify(db=db, arguments={'token=': token})
 
     arguments = {}
@@ -861,13 +544,14 @@ def qualified_data_index(
                 status_code=400,
                 detail=f"Provided start date is more recent than the provided end date. Please review your requested period.",
             )
-    if (end_date - start_date).days > 30:
-        end_date = (start_date + timedelta(days=30))
+    max_days = RESAMPLE_MAX_DAYS if resample else 30
+    if (end_date - start_date).days > max_days:
+        end_date = (start_date + timedelta(days=max_days))
 
 
     arguments = {'buoy_id=': buoy_id, 'date_time>=': start_date.strftime("%Y-%m-%d"), 'date_time<=': end_date.strftime("%Y-%m-%d")}
 
-    buoy = crud.crud_moored.buoy.show(db=db, id_pk = buoy_id)
+    buoy = crud.crud_moored.buoy.show_cached(db=db, id_pk = buoy_id)
 
     if "METOCEAN" not in buoy.name:
         raise HTTPException(
@@ -875,9 +559,10 @@ def qualified_data_index(
                 detail=f"Please check in the PNBoia documentation if the correct endpoint is being used for the required buoy (Buoy ID = {buoy_id}).",
             )
 
+    synoptic = False
     if buoy.project_id == 2:
         if user.user_type not in ['admin', 'petrobras']:
-            arguments['extract(hour from date_time)'] = ['in', [0, 3, 6, 9, 12, 15, 18, 21]]
+            synoptic = True
 
     if not buoy.open_data and not user.user_type == 'admin':
         if not user.user_type == 'admin':
@@ -886,30 +571,28 @@ def qualified_data_index(
                 detail="You do not have permission to do this action",
             )
     else:
-        if last:
-            arguments = {"buoy_id=":buoy_id}
-            result = crud.crud_qualified_data.bmobr_qualified_data.last(db=db, arguments=arguments, last=last, buoy_sel=True)
-        else:
-            result = crud.crud_qualified_data.bmobr_qualified_data.index(db=db, order=True, arguments=arguments, limit=limit)
-    if not result:
-        raise HTTPException(
-                status_code=400,
-                detail=f"No data for buoy {buoy_id} for the period.",
-            )
+        qualified = crud.crud_qualified_data.bmobr_qualified_data
+        fields = qualified.select_fields(fields)
+        filename = APIUtils().file_name_composition(buoy_name=buoy.name, start_date=start_date, end_date=end_date)
+        empty_detail = f"No data for buoy {buoy_id} for the period."
+        next_cursor = high_water_mark = None
 
-    if response_type == "csv":
         if last:
             filename = APIUtils().file_name_composition(buoy_name=buoy.name)
+            rows = qualified.last(db=db, arguments={"buoy_id=": buoy_id}, last=last, buoy_sel=True)
+            fields = None
+        elif since_id is not None or since_ts:
+            filename = APIUtils().file_name_composition(buoy_name=buoy.name)
+            empty_detail = None
+            rows, high_water_mark = qualified.changes(db=db, since_id=since_id, since_ts=since_ts, limit=limit, arguments={"buoy_id=": buoy_id}, fields=fields, synoptic=synoptic)
+        elif resample:
+            rows, fields = qualified.resample(db=db, interval=resample, agg=agg, arguments=arguments, fields=fields, synoptic=synoptic)
         else:
-            filename = APIUtils().file_name_composition(buoy_name=buoy.name, start_date=start_date, end_date=end_date)
-        return APIUtils().csv_response(result=result, filename=filename)
-    elif response_type == "json":
-        return result
-    else:
-        raise HTTPException(
-                status_code=400,
-                detail=f"Invalid response type. ['json' or 'csv'] available.",
-            )
+            rows, next_cursor = qualified.paginate(db=db, order=True, limit=limit, cursor=cursor, arguments=arguments, fields=fields, synoptic=synoptic)
+
+        return APIUtils().rows_response(rows=rows, response_type=response_type, model=BMOBrQualified, schema=BMOBrQualifiedSchema, filename=filename,
+            empty_detail=empty_detail, next_cursor=next_cursor, fields=fields, high_water_mark=high_water_mark)
+
 
 @router.get("/pnboia", status_code=200, response_model=List[PNBoiaQualifiedSchema])
 def qualified_data_index(
@@ -921,12 +604,20 @@ def qualified_data_index(
         end_date: Optional[str] = Query(default=(datetime.utcnow().replace(microsecond=0) + timedelta(days=2)),
                     title="date_time format is yyyy-mm-ddTHH:MM:SS",
                     regex="\d{4}-\d?\d-\d?\dT(?:2[0-3]|[01]?[0-9]):[0-5]?[0-9]:[0-5]?[0-9]"),
-        db: Session = Depends(get_db),
+        db: Session = Depends(get_routed_db),
         limit: int = None,
+        cursor: str = None,
+        fields: str = None,
+        resample: str = None,
+        agg: str = 'mean',
         last: bool = False,
+        since_id: int = None,
+        since_ts: str = None,
         response_type:str="json"
     ) -> Any:
 
+    APIUtils().check_response_type(response_type)
+
     user = crud.crud_adm.user.verify(db=db, arguments={'token=': token})
 
     arguments = {}
@@ -950,13 +641,14 @@ def qualified_data_index(
                 status_code=400,
                 detail=f"Provided start date is more recent than the provided end date. Please review your requested period.",
             )
-    if (end_date - start_date).days > 30:
-        end_date = (start_date + timedelta(days=30))
+    max_days = RESAMPLE_MAX_DAYS if resample else 30
+    if (end_date - start_date).days > max_days:
+        end_date = (start_date + timedelta(days=max_days))
 
 
     arguments = {'buoy_id=': buoy_id, 'date_time>=': start_date.strftime("%Y-%m-%d"), 'date_time<=': end_date.strftime("%Y-%m-%d")}
 
-    buoy = crud.crud_moored.buoy.show(db=db, id_pk = buoy_id)
+    buoy = crud.crud_moored.buoy.show_cached(db=db, id_pk = buoy_id)
 
     if "METOCEAN" not in buoy.name:
         raise HTTPException(
@@ -971,31 +663,28 @@ def qualified_data_index(
                 detail="You do not have permission to do this action",
             )
     else:
-        if last:
-            arguments = {"buoy_id=":buoy_id}
-            result = crud.crud_qualified_data.pnboia_qualified_data.last(db=db, arguments=arguments, last=last, buoy_sel=True)
-        else:
-            result = crud.crud_qualified_data.pnboia_qualified_data.index(db=db, order=True, arguments=arguments, limit=limit)
-
-    if not result:
-        raise HTTPException(
-                status_code=400,
-                detail=f"No data for buoy {buoy_id} for the period.",
-            )
+        qualified = crud.crud_qualified_data.pnboia_qualified_data
+        fields = qualified.select_fields(fields)
+        filename = APIUtils().file_name_composition(buoy_name=buoy.name, start_date=start_date, end_date=end_date)
+        empty_detail = f"No data for buoy {buoy_id} for the period."
+        next_cursor = high_water_mark = None
 
-    if response_type == "csv":
         if last:
             filename = APIUtils().file_name_composition(buoy_name=buoy.name)
+            rows = qualified.last(db=db, arguments={"buoy_id=": buoy_id}, last=last, buoy_sel=True)
+            fields = None
+        elif since_id is not None or since_ts:
+            filename = APIUtils().file_name_composition(buoy_name=buoy.name)
+            empty_detail = None
+            rows, high_water_mark = qualified.changes(db=db, since_id=since_id, since_ts=since_ts, limit=limit, arguments={"buoy_id=": buoy_id}, fields=fields)
+        elif resample:
+            rows, fields = qualified.resample(db=db, interval=resample, agg=agg, arguments=arguments, fields=fields)
         else:
-            filename = APIUtils().file_name_composition(buoy_name=buoy.name, start_date=start_date, end_date=end_date)
-        return APIUtils().csv_response(result=result, filename=filename)
-    elif response_type == "json":
-        return result
-    else:
-        raise HTTPException(
-                status_code=400,
-                detail=f"Invalid response type. ['json' or 'csv'] available.",
-            )
+            rows, next_cursor = qualified.paginate(db=db, order=True, limit=limit, cursor=cursor, arguments=arguments, fields=fields)
+
+        return APIUtils().rows_response(rows=rows, response_type=response_type, model=PNBoiaQualified, schema=PNBoiaQualifiedSchema, filename=filename,
+            empty_detail=empty_detail, next_cursor=next_cursor, fields=fields, high_water_mark=high_water_mark)
+
 
 @router.get("/criosfera", status_code=200, response_model=List[CriosferaQualifiedSchema])
 def qualified_data_index(
@@ -1007,12 +696,20 @@ def qualified_data_index(
         end_date: Optional[str] = Query(default=(datetime.utcnow().replace(microsecond=0) + timedelta(days=2)),
                     title="date_time format is yyyy-mm-ddTHH:MM:SS",
                     regex="\d{4}-\d?\d-\d?\dT(?:2[0-3]|[01]?[0-9]):[0-5]?[0-9]:[0-5]?[0-9]"),
-        db: Session = Depends(get_db),
+        db: Session = Depends(get_routed_db),
         limit: int = None,
+        cursor: str = None,
+        fields: str = None,
+        resample: str = None,
+        agg: str = 'mean',
+        since_id: int = None,
+        since_ts: str = None,
         response_type:str="json",
         last: bool=False
     ) -> Any:
 
+    APIUtils().check_response_type(response_type)
+
     user = crud.crud_adm.user.verify(db=db, arguments={'token=': token})
 
     arguments = {}
@@ -1036,13 +733,14 @@ def qualified_data_index(
                 status_code=400,
                 detail=f"Provided start date is more recent than the provided end date. Please review your requested period.",
             )
-    if (end_date - start_date).days > 30:
-        end_date = (start_date + timedelta(days=30))
+    max_days = RESAMPLE_MAX_DAYS if resample else 30
+    if (end_date - start_date).days > max_days:
+        end_date = (start_date + timedelta(days=max_days))
 
 
     arguments = {'buoy_id=': buoy_id, 'date_time>=': start_date.strftime("%Y-%m-%d"), 'date_time<=': end_date.strftime("%Y-%m-%d")}
 
-    buoy = crud.crud_moored.buoy.show(db=db, id_pk = buoy_id)
+    buoy = crud.crud_moored.buoy.show_cached(db=db, id_pk = buoy_id)
 
     if "METOCEAN" not in buoy.name:
         raise HTTPException(
@@ -1058,25 +756,156 @@ def qualified_data_index(
             )
 
     else:
+        qualified = crud.crud_qualified_data.criosfera_qualified_data
+        fields = qualified.select_fields(fields)
+        filename = APIUtils().file_name_composition(buoy_name=buoy.name, start_date=start_date, end_date=end_date)
+        empty_detail = f"No data for buoy {buoy_id} for the period."
+        next_cursor = high_water_mark = None
+
         if last:
-            arguments = {"buoy_id=":buoy_id}
-            result = crud.crud_qualified_data.criosfera_qualified_data.last(db=db, arguments=arguments, last=last, buoy_sel=True)
+            filename = APIUtils().file_name_composition(buoy_name=buoy.name)
+            rows = qualified.last(db=db, arguments={"buoy_id=": buoy_id}, last=last, buoy_sel=True)
+            fields = None
+        elif since_id is not None or since_ts:
+            filename = APIUtils().file_name_composition(buoy_name=buoy.name)
+            empty_detail = None
+            rows, high_water_mark = qualified.changes(db=db, since_id=since_id, since_ts=since_ts, limit=limit, arguments={"buoy_id=": buoy_id}, fields=fields)
+        elif resample:
+            rows, fields = qualified.resample(db=db, interval=resample, agg=agg, arguments=arguments, fields=fields)
         else:
-            result = crud.crud_qualified_data.criosfera_qualified_data.index(db=db, order=True, arguments=arguments, limit=limit)
+            rows, next_cursor = qualified.paginate(db=db, order=True, limit=limit, cursor=cursor, arguments=arguments, fields=fields)
+
+        return APIUtils().rows_response(rows=rows, response_type=response_type, model=CriosferaQualified, schema=CriosferaQualifiedSchema, filename=filename,
+            empty_detail=empty_detail, next_cursor=next_cursor, fields=fields, high_water_mark=high_water_mark)
+
+
+# family -> CRUD and response schema of its /<family> endpoint
+QUALIFIED_FAMILIES = {
+    'spotter': (crud.crud_qualified_data.spotter_qualified_data, SpotterQualifiedSchema),
+    'triaxys': (crud.crud_qualified_data.triaxys_qualified_data, TriaxysQualifiedSchema),
+    'bmobr': (crud.crud_qualified_data.bmobr_qualified_data, BMOBrQualifiedSchema),
+    'pnboia': (crud.crud_qualified_data.pnboia_qualified_data, PNBoiaQualifiedSchema),
+    'criosfera': (crud.crud_qualified_data.criosfera_qualified_data, CriosferaQualifiedSchema),
+}
+# family of the buoys whose api_endpoint names none, by buoy_type_key
+BUOY_TYPE_FAMILIES = {
+    'SPOTTER': 'spotter',
+    'TRIAXYS': 'triaxys',
+    'METOCEAN': 'bmobr',
+    'CRIOSFERA': 'criosfera',
+}
+# families whose endpoint keeps only the synoptic hours of project 2 buoys
+SYNOPTIC_FAMILIES = ('bmobr',)
+
+
+def qualified_family(buoy) -> Optional[str]:
+    """The QUALIFIED_FAMILIES key of the table holding the data of `buoy`."""
+    endpoint = (buoy.api_endpoint or "").strip("/").split("/")[-1].lower()
+    if endpoint in QUALIFIED_FAMILIES:
+        return endpoint
+    if not buoy.name:
+        return None
+    return BUOY_TYPE_FAMILIES.get(buoy_type_key((buoy.name.split(" ") + [""])[0:2]))
+
+
+@router.get("/batch", status_code=200)
+def qualified_data_batch(
+        token: str,
+        buoy_ids: str = Query(default="all",
+                    title="Comma separated buoy ids, or 'all' for every buoy with open data"),
+        start_date: Optional[str] = Query(default=(datetime.utcnow().replace(microsecond=0) - timedelta(days=1)),
+                    title="date_time format is yyyy-mm-ddTHH:MM:SS",
+                    regex="\d{4}-\d?\d-\d?\dT(?:2[0-3]|[01]?[0-9]):[0-5]?[0-9]:[0-5]?[0-9]"),
+        end_date: Optional[str] = Query(default=(datetime.utcnow().replace(microsecond=0) + timedelta(days=2)),
+                    title="date_time format is yyyy-mm-ddTHH:MM:SS",
+                    regex="\d{4}-\d?\d-\d?\dT(?:2[0-3]|[01]?[0-9]):[0-5]?[0-9]:[0-5]?[0-9]"),
+        db: Session = Depends(get_routed_db),
+        fields: str = None,
+        response_type:str="json"
+    ) -> Any:
+    """
+    Qualified data of several buoys in one request: one
+    `buoy_id = ANY(:ids)` query per family of qualified table, streamed
+    as a JSON object with the rows of each family (each row carrying its
+    buoy_id). CSV, Parquet and Arrow need the buoys to share a family.
+    """
+
+    APIUtils().check_response_type(response_type)
+
+    user = crud.crud_adm.user.verify(db=db, arguments={'token=': token})
+
+    try:
+        start_date = datetime.strptime(start_date, "%Y-%m-%dT%H:%M:%S")
+        end_date = datetime.strptime(end_date, "%Y-%m-%dT%H:%M:%S")
+    except:
+        start_date = datetime.combine(start_date, datetime.min.time())
+        end_date = datetime.combine(end_date, datetime.min.time())
 
-    if not result:
+    if start_date >= end_date:
         raise HTTPException(
                 status_code=400,
-                detail=f"No data for buoy {buoy_id} for the period.",
+                detail=f"Provided start date is more recent than the provided end date. Please review your requested period.",
             )
+    if (end_date - start_date).days > 30:
+        end_date = (start_date + timedelta(days=30))
 
-    if response_type == "csv":
-        filename = APIUtils().file_name_composition(buoy_name=buoy.name, start_date=start_date, end_date=end_date)
-        return APIUtils().csv_response(result=result, filename=filename)
-    elif response_type == "json":
-        return result
+    if buoy_ids.strip().lower() == "all":
+        buoys = [buoy for buoy in crud.crud_moored.buoy_registry.get_all(db).values()
+            if buoy.open_data and qualified_family(buoy)]
     else:
+        try:
+            ids = list(dict.fromkeys(int(buoy_id) for buoy_id in buoy_ids.split(",")))
+        except ValueError:
+            raise HTTPException(
+                    status_code=400,
+                    detail="Invalid buoy_ids. Comma separated buoy ids or 'all' available.",
+                )
+
+        buoys = [crud.crud_moored.buoy.show_cached(db=db, id_pk=buoy_id) for buoy_id in ids]
+        for buoy in buoys:
+            if not buoy.open_data and not user.user_type == 'admin':
+                raise HTTPException(
+                    status_code=400,
+                    detail="You do not have permission to do this action",
+                )
+            if not qualified_family(buoy):
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Please check in the PNBoia documentation if the correct endpoint is being used for the required buoy (Buoy ID = {buoy.buoy_id}).",
+                )
+
+    # family -> synoptic -> buoy ids
+    groups = {}
+    for buoy in buoys:
+        family = qualified_family(buoy)
+        synoptic = family in SYNOPTIC_FAMILIES and buoy.project_id == 2 and user.user_type not in ['admin', 'petrobras']
+        groups.setdefault(family, {}).setdefault(synoptic, []).append(buoy.buoy_id)
+
+    families = []
+    for family, (crud_family, schema) in QUALIFIED_FAMILIES.items():
+        if family not in groups:
+            continue
+        family_fields = crud_family.select_fields(fields)
+        rows = chain.from_iterable([
+            crud_family.iter_index(db=db, order=True, fields=family_fields, synoptic=synoptic, arguments={
+                'buoy_id': ['any', sorted(ids)],
+                'date_time>=': start_date.strftime("%Y-%m-%dT%H:%M:%S"),
+                'date_time<=': end_date.strftime("%Y-%m-%dT%H:%M:%S"),
+            })
+            for synoptic, ids in groups[family].items()
+        ])
+        families.append((family, rows, crud_family.model, schema, family_fields))
+
+    if response_type == "json":
+        return APIUtils().json_groups_stream_response(
+            groups=[(family, rows, schema, family_fields) for family, rows, model, schema, family_fields in families]
+        )
+
+    if len(families) != 1:
         raise HTTPException(
                 status_code=400,
-                detail=f"Invalid response type. ['json' or 'csv'] available.",
+                detail=f"Only buoys of a single family are available as '{response_type}'. Use 'json' for {', '.join(groups) or 'these buoys'}.",
             )
+    family, rows, model, schema, family_fields = families[0]
+    filename = APIUtils().file_name_composition(buoy_name=f"{family} batch", start_date=start_date, end_date=end_date)
+    return APIUtils().rows_response(rows=rows, response_type=response_type, model=model, schema=schema, filename=filename, fields=family_fields)
@@ -11,7 +11,7 @@ import pnboia_api.crud as crud
 from  pnboia_api.db.base import Base, engine
 from datetime import datetime, timedelta, date
 
-from pnboia_api.app.deps import get_db
+from pnboia_api.app.deps import get_routed_db
 
 Base.metadata.create_all(bind=engine)
 
@@ -25,7 +25,7 @@ router = APIRouter()
 @router.get("/quality_control", status_code=200, response_model=List[GeneralBase])
 def quality_control_index(
         token: str,
-        db: Session = Depends(get_db),
+        db: Session = Depends(get_routed_db),
         status:Optional[bool]=None
     ) -> Any:
 
@@ -47,7 +47,7 @@ def quality_control_index(
 def general_create(
         token: str,
         obj_in: GeneralNewBase,
-        db: Session = Depends(get_db)
+        db: Session = Depends(get_routed_db)
     ) -> Any:
     """
     Create new quality control value
@@ -79,7 +79,7 @@ def general_update(
         buoy_id: int,
         token: str,
         obj_in: GeneralNewBase,
-        db: Session = Depends(get_db)
+        db: Session = Depends(get_routed_db)
     ) -> Any:
     """
     Update qc_config
@@ -110,7 +110,7 @@ def buoy_update(
         *,
         buoy_id: int,
         token: str,
-        db: Session = Depends(get_db)
+        db: Session = Depends(get_routed_db)
     ) -> Any:
     """
     Create new buoy
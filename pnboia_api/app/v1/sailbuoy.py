@@ -1,8 +1,9 @@
-from typing import List, Optional, Dict, Any, Union
+from typing import Callable, List, Optional, Dict, Any, Union
 from datetime import datetime, date
 from dateutil.parser import parse as parse_date
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.routing import APIRoute
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from sqlalchemy import desc
@@ -20,7 +21,8 @@ from pnboia_api.schemas.sailbuoy import (
     DataloggerDataUpdate,
     AutopilotDataSynopticResponse,
     DataloggerDataSynopticResponse,
-    PaginatedResponse
+    PaginatedResponse,
+    BulkInsertResponse
 )
 from pnboia_api.crud.crud_sailbuoy import (
     sailbuoy_metadata,
@@ -54,7 +56,37 @@ def verify_token(token: str = Query(..., description="API token for authenticati
         )
     return True
 
-router = APIRouter()
+class NDJSONRequest(Request):
+    """
+    An `application/x-ndjson` request read as the JSON array of its
+    lines, so a `List[...]` body parameter validates it.
+    """
+
+    def __init__(self, scope, receive):
+        headers = [(key, value) for key, value in scope["headers"] if key != b"content-type"]
+        super().__init__({**scope, "headers": headers + [(b"content-type", b"application/json")]}, receive)
+
+    async def body(self) -> bytes:
+        if not hasattr(self, "_ndjson"):
+            lines = [line for line in (await super().body()).splitlines() if line.strip()]
+            self._ndjson = b"[" + b",".join(lines) + b"]"
+        return self._ndjson
+
+
+class NDJSONRoute(APIRoute):
+    """Route that also takes its JSON array body as NDJSON, one object per line."""
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def ndjson_handler(request: Request) -> Response:
+            if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+                request = NDJSONRequest(request.scope, request.receive)
+            return await handler(request)
+
+        return ndjson_handler
+
+router = APIRouter(route_class=NDJSONRoute)
 
 #######################
 # SAILBUOY METADATA ENDPOINTS
@@ -187,6 +219,18 @@ def create_autopilot_data(
     """
     return autopilot_data.create(db=db, obj_in=data)
 
+@router.post("/autopilot/bulk", response_model=BulkInsertResponse, dependencies=[Depends(verify_token)])
+def create_autopilot_data_bulk(
+    data: List[AutopilotDataCreate],
+    db: Session = Depends(get_db),
+):
+    """
+    Create many autopilot messages at once, sent as a JSON array of
+    AutopilotDataCreate or as NDJSON. The batch is inserted in a single
+    transaction.
+    """
+    return autopilot_data.create_bulk(db=db, objs_in=data)
+
 @router.get("/autopilot/latest/{sailbuoy_id}", response_model=List[AutopilotDataResponse], dependencies=[Depends(verify_token)])
 def get_latest_autopilot_data(
     sailbuoy_id: str,
@@ -245,6 +289,18 @@ def create_datalogger_data(
     """
     return datalogger_data.create(db=db, obj_in=data)
 
+@router.post("/datalogger/bulk", response_model=BulkInsertResponse, dependencies=[Depends(verify_token)])
+def create_datalogger_data_bulk(
+    data: List[DataloggerDataCreate],
+    db: Session = Depends(get_db),
+):
+    """
+    Create many datalogger messages at once, sent as a JSON array of
+    DataloggerDataCreate or as NDJSON. The batch is inserted in a single
+    transaction.
+    """
+    return datalogger_data.create_bulk(db=db, objs_in=data)
+
 @router.get("/datalogger/latest/{sailbuoy_id}", response_model=List[DataloggerDataResponse], dependencies=[Depends(verify_token)])
 def get_latest_datalogger_data(
     sailbuoy_id: str,
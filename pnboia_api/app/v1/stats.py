@@ -0,0 +1,87 @@
+from typing import Any, Dict
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from pnboia_api.schemas.stats import *
+import pnboia_api.crud as crud
+from pnboia_api.app.deps import get_routed_db
+from pnboia_api.app.feed import feeds
+from pnboia_api.core.cache import caches
+from pnboia_api.db.pool import pools
+
+router = APIRouter()
+
+#######################
+# STATS.CACHE ENDPOINT
+#######################
+
+@router.get("/cache", status_code=200, response_model=Dict[str, CacheStatsBase])
+def cache_stats(
+        token: str,
+        db: Session = Depends(get_routed_db)
+    ) -> Any:
+    """
+    Hit/miss counters of the in-process caches of the worker answering
+    the request
+    """
+
+    user = crud.crud_adm.user.verify(db=db, arguments={'token=': token})
+
+    if not user.user_type == 'admin':
+        raise HTTPException(
+            status_code=400,
+            detail="You do not have permission to do this action",
+        )
+
+    return {name: cache.stats() for name, cache in caches.items()}
+
+
+#######################
+# STATS.POOL ENDPOINT
+#######################
+
+@router.get("/pool", status_code=200, response_model=Dict[str, PoolStatsBase])
+def pool_stats(
+        token: str,
+        db: Session = Depends(get_routed_db)
+    ) -> Any:
+    """
+    Checkout latency, in-use and overflow counters of the database
+    connection pools of the worker answering the request
+    """
+
+    user = crud.crud_adm.user.verify(db=db, arguments={'token=': token})
+
+    if not user.user_type == 'admin':
+        raise HTTPException(
+            status_code=400,
+            detail="You do not have permission to do this action",
+        )
+
+    return {name: metrics.stats() for name, metrics in pools.items()}
+
+
+#######################
+# STATS.STREAM ENDPOINT
+#######################
+
+@router.get("/stream", status_code=200, response_model=Dict[str, StreamStatsBase])
+def stream_stats(
+        token: str,
+        db: Session = Depends(get_routed_db)
+    ) -> Any:
+    """
+    Subscribers and poll/publish counters of the /v1/stream feeds of the
+    worker answering the request
+    """
+
+    user = crud.crud_adm.user.verify(db=db, arguments={'token=': token})
+
+    if not user.user_type == 'admin':
+        raise HTTPException(
+            status_code=400,
+            detail="You do not have permission to do this action",
+        )
+
+    return {name: feed.stats() for name, feed in feeds.items()}
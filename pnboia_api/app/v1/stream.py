@@ -0,0 +1,168 @@
+import asyncio
+import os
+from typing import Any, FrozenSet, List, Optional, Tuple
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+import pnboia_api.crud as crud
+from pnboia_api.app.deps import use_replica
+from pnboia_api.app.feed import ObservationFeed, petrobras_feed, qualified_data_feed, synoptic_buoys
+from pnboia_api.app.metadata import metadata_service
+from pnboia_api.app.utils import RowSerializer
+from pnboia_api.app.v1.qualified_data import petrobras_rows
+from pnboia_api.db.base import ReplicaSessionLocal, SessionLocal
+from pnboia_api.schemas.qualified_data import QualifiedDataBase, QualifiedDataPetrobrasBase
+
+# comment line sent when there was nothing else to send, so proxies keep the connection
+STREAM_KEEPALIVE = float(os.getenv('STREAM_KEEPALIVE', 15))
+
+router = APIRouter()
+
+
+def subscription_buoys(request: Request, token: str, buoy_ids: str = None) -> Tuple[Optional[List[int]], FrozenSet[int]]:
+    """
+    Check `token` and the comma separated `buoy_ids` the client may
+    follow (None for every buoy), and the ones of which it only sees the
+    synoptic hours (`synoptic_buoys`). It runs on a session of its own,
+    routed like `get_routed_db` and closed before the stream starts, so
+    no connection is held while it lasts.
+    """
+    db = ReplicaSessionLocal() if use_replica(request) else SessionLocal()
+    try:
+        user = crud.crud_adm.user.verify(db=db, arguments={'token=': token})
+        buoys = crud.crud_moored.buoy_registry.get_all(db)
+
+        if not buoy_ids:
+            if user.user_type == 'admin':
+                return None, frozenset()
+            open_buoys = [buoy for buoy in buoys.values() if buoy.open_data]
+            return [buoy.buoy_id for buoy in open_buoys], synoptic_buoys(user, open_buoys)
+
+        try:
+            ids = [int(buoy_id) for buoy_id in buoy_ids.split(",")]
+        except ValueError:
+            raise HTTPException(
+                status_code=400,
+                detail="Invalid buoy_ids. Comma separated buoy ids available.",
+            )
+
+        followed = [buoys.get(buoy_id) or crud.crud_moored.buoy.show(db=db, id_pk=buoy_id) for buoy_id in ids]
+        for buoy in followed:
+            if not buoy.open_data and not user.user_type == 'admin':
+                raise HTTPException(
+                    status_code=400,
+                    detail="You do not have permission to do this action",
+                )
+        return ids, synoptic_buoys(user, followed)
+    finally:
+        db.close()
+
+
+def last_event_id(request: Request) -> Optional[int]:
+    """The change_id of the last event a reconnecting client received, from its Last-Event-ID header."""
+    try:
+        return int(request.headers['last-event-id'])
+    except (KeyError, ValueError):
+        return None
+
+
+def event(row, render) -> str:
+    # the change_id lets the client resume from this row; the latest rows
+    # a new subscription starts with may not have one
+    change_id = getattr(row, 'change_id', None)
+    event_id = f"id: {change_id}\n" if change_id is not None else ""
+    return f"event: observation\n{event_id}data: {render(row)}\n\n"
+
+
+def event_stream(feed: ObservationFeed, buoy_ids: Optional[List[int]], render, since: int = None, synoptic: FrozenSet[int] = frozenset()):
+    """
+    Server-sent events of the rows `feed` publishes for `buoy_ids`,
+    rendered as JSON by `render`, only at the synoptic hours for the
+    buoys in `synoptic`. A client resuming after the change_id `since` is
+    first replayed the rows changed since.
+    """
+
+    async def generate():
+        subscription = feed.subscribe(buoy_ids, since=since, synoptic=synoptic)
+        try:
+            if since is not None:
+                replayed = since
+                while True:
+                    rows, high_water_mark = await run_in_threadpool(feed.replay, replayed, subscription)
+                    for row in rows:
+                        yield event(row, render)
+                    if high_water_mark == replayed:
+                        break
+                    replayed = high_water_mark
+                # the rows queued meanwhile were just replayed
+                subscription.since = replayed
+
+            while True:
+                try:
+                    row = await asyncio.wait_for(subscription.queue.get(), timeout=STREAM_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if subscription.wants(row):
+                    yield event(row, render)
+        finally:
+            feed.unsubscribe(subscription)
+
+    response = StreamingResponse(generate(), media_type="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+#######################
+# STREAM.QUALIFIED_DATA ENDPOINT
+#######################
+
+@router.get("/qualified_data", status_code=200)
+def qualified_data_stream(
+        request: Request,
+        token: str,
+        buoy_ids: str = None,
+    ) -> Any:
+    """
+    Server-sent events with each new or updated qualified_data row of the
+    buoys in `buoy_ids` (every buoy the user may see by default), starting
+    with the last one of each buoy, or with the rows changed after the
+    Last-Event-ID of a reconnecting client
+    """
+
+    ids, synoptic = subscription_buoys(request=request, token=token, buoy_ids=buoy_ids)
+    qualified_data_feed.check()
+    serializer = RowSerializer.for_schema(QualifiedDataBase)
+
+    return event_stream(qualified_data_feed, ids, render=serializer.dumps, since=last_event_id(request), synoptic=synoptic)
+
+#######################
+# STREAM.PETROBRAS ENDPOINT
+#######################
+
+@router.get("/petrobras", status_code=200)
+def petrobras_stream(
+        request: Request,
+        token: str,
+        buoy_ids: str = None,
+    ) -> Any:
+    """
+    The rows of /v1/qualified_data/petrobras/last as server-sent events,
+    sent as each buoy reports
+    """
+
+    ids, synoptic = subscription_buoys(request=request, token=token, buoy_ids=buoy_ids)
+    petrobras_feed.check()
+    serializer = RowSerializer.for_schema(QualifiedDataPetrobrasBase)
+    db = SessionLocal()
+    try:
+        bin_depths = metadata_service.adcp_bin_depths(db)
+    finally:
+        db.close()
+
+    def render(row):
+        return serializer.dumps(next(petrobras_rows([row], extra_fields=True, bin_depths=bin_depths)))
+
+    return event_stream(petrobras_feed, ids, render=render, since=last_event_id(request), synoptic=synoptic)
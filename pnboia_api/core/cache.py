@@ -0,0 +1,205 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+# every named cache, so /v1/stats can report them
+caches: Dict[str, Any] = {}
+
+
+class TTLCache:
+    """
+    Bounded in-process cache: entries expire `ttl` seconds after they are
+    stored and, when `maxsize` is reached, the least recently used entry
+    is dropped. Safe to share between the worker threads of a process.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60, name: str = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+        if name:
+            caches[name] = self
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                expires_at, value = item
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def invalidate(self, predicate: Callable[[Hashable, Any], bool]) -> None:
+        """Drop every entry for which `predicate(key, value)` is true."""
+        with self._lock:
+            for key in [k for k, (_, v) in self._data.items() if predicate(k, v)]:
+                del self._data[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+            }
+
+
+def fingerprint_query(*models):
+    """md5 of the full contents of the (small) tables of `models`."""
+    aggregates = ", ".join(
+        f"coalesce((SELECT string_agg(t::text, ',' ORDER BY t::text) FROM {model.__table__.fullname} t), '')"
+        for model in models
+    )
+    return text(f"SELECT md5(concat_ws('|', {aggregates}))")
+
+
+class TableVersion:
+    """
+    Tells when a table changed, whichever process changed it: `query`
+    (usually a `fingerprint_query`) is run at most every `check` seconds
+    and its result compared with the previous one. Caches drop what they
+    loaded from the table when `changed` is true, so a change made in
+    another worker shows up there within `check` seconds.
+    """
+
+    def __init__(self, query, check: float = 5):
+        self.query = query
+        self.check = check
+        self._value = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def due(self) -> bool:
+        checked_at = self._checked_at
+        return checked_at is None or time.monotonic() - checked_at >= self.check
+
+    def seen(self, value) -> bool:
+        """Record the result of `query`; true when it is not the previous one."""
+        with self._lock:
+            changed = self._checked_at is None or value != self._value
+            self._value = value
+            self._checked_at = time.monotonic()
+            return changed
+
+    def changed(self, db: Session) -> bool:
+        if not self.due():
+            return False
+        return self.seen(db.execute(self.query).scalar())
+
+    async def changed_async(self, db) -> bool:
+        if not self.due():
+            return False
+        return self.seen((await db.execute(self.query)).scalar())
+
+
+class RefreshingRegistry:
+    """
+    A small reference table kept in memory as a dict, reloaded in full
+    from the database when it is older than `refresh` seconds or after
+    `invalidate()`. Subclasses implement `load`.
+
+    With a `version`, the table is also reloaded as soon as the version
+    sees it change, before the loaded one is handed out; registries the
+    permission checks read use one.
+
+    The rows are loaded on a session of their own and detached from it,
+    so they stay readable whatever happens to the request sessions.
+    """
+
+    def __init__(self, refresh: float = 300, name: str = None, version: TableVersion = None):
+        self.refresh = refresh
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+        self._data = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+        if name:
+            caches[name] = self
+
+    def load(self, db) -> dict:
+        raise NotImplementedError
+
+    def get_all(self, db) -> dict:
+        with self._lock:
+            changed = self.version is not None and self.version.changed(db)
+            if not changed and self._data is not None and time.monotonic() - self._loaded_at < self.refresh:
+                self.hits += 1
+                return self._data
+
+            self.misses += 1
+            return self._reload(db)
+
+    def reload(self, db) -> dict:
+        """Load the table now, whatever its age."""
+        with self._lock:
+            return self._reload(db)
+
+    def _reload(self, db) -> dict:
+        registry_db = Session(bind=db.get_bind())
+        try:
+            data = self.load(registry_db)
+            registry_db.expunge_all()
+        finally:
+            registry_db.close()
+
+        self._data = data
+        self._loaded_at = time.monotonic()
+        return data
+
+    def get(self, db, key: Hashable) -> Optional[Any]:
+        return self.get_all(db).get(key)
+
+    def current(self) -> Optional[dict]:
+        """
+        The table if it is loaded and fresh, else None; never waits on a
+        reload, so `version` is not checked.
+        """
+        data, loaded_at = self._data, self._loaded_at
+        if data is not None and time.monotonic() - loaded_at < self.refresh:
+            return data
+        return None
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._data = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._data) if self._data is not None else 0,
+                "maxsize": None,
+                "ttl": self.refresh,
+            }
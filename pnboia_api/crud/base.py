@@ -1,19 +1,67 @@
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union
+import os
+import re
+import json
+import base64
+import operator
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Generic, Iterable, Iterator, List, Optional, Tuple, Type, TypeVar, Union
 
 from fastapi import HTTPException
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
-from sqlalchemy.sql import text
-from sqlalchemy import func
-from sqlalchemy import desc
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Query, Session
+from sqlalchemy.sql import literal_column
+from sqlalchemy import and_, any_, case, cast, extract, func, inspect, literal, null, text, tuple_, type_coerce
+from sqlalchemy import desc, select, BigInteger, DateTime, Integer, Numeric, Sequence
+from sqlalchemy.dialects.postgresql import ARRAY, aggregate_order_by
 from pnboia_api.core.security import create_token
 from pnboia_api.db.base import Base
+from pnboia_api.models.qualified_data import synoptic_hours
 
 ModelType = TypeVar("ModelType", bound=Base)
 CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
 
+STREAM_BATCH_SIZE = int(os.getenv('STREAM_BATCH_SIZE', 1000))
+PAGE_SIZE = int(os.getenv('PAGE_SIZE', 1000))
+# `changes` leaves out the rows changed in the last CHANGES_SETTLE seconds,
+# so a write whose transaction is still open is not overtaken by the
+# high-water mark of a later one
+CHANGES_SETTLE = int(os.getenv('CHANGES_SETTLE', 30))
+
+FILTER_OPERATORS = {
+    '>=': operator.ge,
+    '<=': operator.le,
+    '!=': operator.ne,
+    '<>': operator.ne,
+    '=': operator.eq,
+    '>': operator.gt,
+    '<': operator.lt,
+}
+# sequence of a `server_default=text("nextval('...'::regclass)")` column
+NEXTVAL = re.compile(r"nextval\('(?P<sequence>[^']+)'")
+FILTER_KEY = re.compile(r"^\s*(?P<column>.+?)\s*(?P<operator>>=|<=|!=|<>|=|>|<)?\s*$")
+# `flag` values accepted by `masked_columns`, and the columns never masked
+MASK_FLAGS = ('all', 'soft')
+MASK_IGNORED_COLUMNS = ('latitude', 'longitude')
+
+# `resample` buckets, as (date_trunc unit, number of units)
+RESAMPLE_INTERVALS = {
+    '1h': ('hour', 1),
+    '3h': ('hour', 3),
+    '6h': ('hour', 6),
+    '12h': ('hour', 12),
+    '1d': ('day', 1),
+}
+RESAMPLE_AGGREGATES = ('mean', 'min', 'max', 'last')
+# longest period the routers accept when resampling
+RESAMPLE_MAX_DAYS = int(os.getenv('RESAMPLE_MAX_DAYS', 366))
+# angles in degrees, averaged as unit vectors
+DIRECTION_COLUMN = re.compile(r"dir\d*$")
+
+EXTRACT_KEY = re.compile(r"^extract\(\s*(?P<field>\w+)\s+from\s+(?P<column>\w+)\s*\)$", re.IGNORECASE)
+
 
 class CRUDBase(Generic[ModelType]):
     def __init__(self, model: Type[ModelType]):
@@ -24,6 +72,8 @@ class CRUDBase(Generic[ModelType]):
         * `schema`: A Pydantic model (schema) class
         """
         self.model = model
+        self.change_tracking = False
+        self.id_sequence_found = False
 
     def show(self, db: Session, id_pk: Any) -> Optional[ModelType]:
         result = db.query(self.model).filter(self.model.buoy_id == id_pk).first()
@@ -33,6 +83,14 @@ class CRUDBase(Generic[ModelType]):
             )
         return result
 
+    async def show_async(self, db: AsyncSession, id_pk: Any) -> Optional[ModelType]:
+        result = (await db.execute(select(self.model).filter(self.model.buoy_id == id_pk))).scalars().first()
+        if not result:
+            raise HTTPException(
+                status_code=404, detail=f"buoy with buoy_id = {id_pk} not found"
+            )
+        return result
+
     def index(
         self,
         db: Session,
@@ -41,41 +99,464 @@ class CRUDBase(Generic[ModelType]):
         order:bool = False,
         limit: int = None,
         arguments: dict = None,
+        after: tuple = None,
+        flag: str = None,
+        fields: List[str] = None,
+        synoptic: bool = False,
     ) -> List[ModelType]:
 
-        if arguments:
-            query = self.create_query(arguments)
-        else:
-            query = "true"
+        result = self.index_query(db=db, order=order, limit=limit, arguments=arguments, after=after, flag=flag, fields=fields, synoptic=synoptic).all()
 
+        return result
+
+    async def index_async(
+        self,
+        db: AsyncSession,
+        *,
+        order:bool = False,
+        limit: int = None,
+        arguments: dict = None,
+        after: tuple = None,
+        flag: str = None,
+        fields: List[str] = None,
+        synoptic: bool = False,
+    ) -> List[ModelType]:
+        """
+        `index` for the async routers: the `index_query` statement, run on
+        an AsyncSession.
+        """
+        query = self.index_query(db=db.sync_session, order=order, limit=limit, arguments=arguments, after=after, flag=flag, fields=fields, synoptic=synoptic)
+        result = await db.execute(query.statement)
+
+        if flag in MASK_FLAGS or fields:
+            return result.all()
+        return result.scalars().all()
+
+    def index_query(
+        self,
+        db: Session,
+        *,
+        order:bool = False,
+        limit: int = None,
+        arguments: dict = None,
+        after: tuple = None,
+        flag: str = None,
+        fields: List[str] = None,
+        synoptic: bool = False,
+    ) -> Query:
+        """
+        Build the query used by `index` without executing it, so the rows
+        can be streamed instead of being loaded at once with `.all()`.
+
+        `after` is a `(buoy_id, date_time, id)` keyset: only rows past it
+        are returned, ordered by the same columns. id breaks the ties
+        between rows with the same date_time, and the (buoy_id, date_time)
+        part alone bounds the scan, so any page is read straight from the
+        (buoy_id, date_time) index. A cursor issued before id was part of
+        the keyset (id None) keeps its old meaning.
+
+        With `flag` ('all' or 'soft') the rows are the `masked_columns`
+        instead of model instances. With `fields` (see `select_fields`)
+        only those columns are selected. `synoptic` keeps only the rows
+        at the synoptic hours.
+        """
+
+        result = db.query(self.model).filter(*self.create_filters(arguments, synoptic=synoptic))
+
+        if flag in MASK_FLAGS or fields:
+            if flag in MASK_FLAGS:
+                columns = self.masked_columns(flag)
+            else:
+                columns = list(self.model.__table__.c)
+            if fields:
+                columns = [column for column in columns if column.name in fields]
+            result = result.with_entities(*columns)
+
+        if after:
+            buoy_id, date_time, id_ = after
+            if id_ is None:
+                result = result.filter(tuple_(self.model.buoy_id, self.model.date_time) > tuple_(buoy_id, date_time))
+            else:
+                result = result.filter(
+                    tuple_(self.model.buoy_id, self.model.date_time) >= tuple_(buoy_id, date_time),
+                    tuple_(self.model.buoy_id, self.model.date_time, self.model.id) > tuple_(buoy_id, date_time, id_),
+                )
+
+        if order or after:
+            result = result.order_by(self.model.buoy_id, self.model.date_time, self.model.id)
         if limit:
-            if order:
-                result = db.query(self.model).filter(text(query)).order_by(self.model.date_time).limit(limit).all()
+            result = result.limit(limit)
+
+        return result
+
+    def iter_index(
+        self,
+        db: Session,
+        *,
+        order:bool = False,
+        limit: int = None,
+        arguments: dict = None,
+        batch_size: int = None,
+        flag: str = None,
+        fields: List[str] = None,
+        synoptic: bool = False,
+    ) -> Iterator[ModelType]:
+        """
+        Streaming variant of `index`. Rows are fetched from a named
+        server-side cursor `batch_size` at a time (`STREAM_BATCH_SIZE` by
+        default), so the routers can serialize them as they arrive.
+
+        The cursor runs on `db` itself, so a streaming request holds a single
+        connection: the request session (`get_db`/`get_routed_db`) is only
+        closed once the response body has been sent.
+        """
+
+        query = self.index_query(db=db, order=order, limit=limit, arguments=arguments, flag=flag, fields=fields, synoptic=synoptic)
+        yield from (query
+            .execution_options(stream_results=True)
+            .yield_per(batch_size or STREAM_BATCH_SIZE)
+        )
+
+    def paginate(
+        self,
+        db: Session,
+        *,
+        order:bool = False,
+        limit: int = None,
+        cursor: str = None,
+        arguments: dict = None,
+        flag: str = None,
+        fields: List[str] = None,
+        synoptic: bool = False,
+    ) -> Tuple[Iterable[ModelType], Optional[str]]:
+        """
+        Keyset pagination over `(buoy_id, date_time, id)`.
+
+        When `limit` or `cursor` is given, returns a page of `limit` rows
+        (`PAGE_SIZE` by default) following `cursor`, and the cursor of the
+        next page, or None when this was the last one. Otherwise the whole
+        result is streamed with `iter_index` and no cursor is returned.
+        """
+
+        if not limit and not cursor:
+            return self.iter_index(db=db, order=order, arguments=arguments, flag=flag, fields=fields, synoptic=synoptic), None
+
+        limit = limit or PAGE_SIZE
+        after = self.decode_cursor(cursor) if cursor else None
+
+        result = self.index(db=db, order=True, limit=limit, arguments=arguments, after=after, flag=flag, fields=fields, synoptic=synoptic)
+
+        next_cursor = None
+        if len(result) == limit:
+            next_cursor = self.encode_cursor(result[-1])
+
+        return result, next_cursor
+
+    def changes(
+        self,
+        db: Session,
+        *,
+        since_id: int = None,
+        since_ts: str = None,
+        limit: int = None,
+        arguments: dict = None,
+        flag: str = None,
+        fields: List[str] = None,
+        synoptic: bool = False,
+    ) -> Tuple[list, Optional[int]]:
+        """
+        Sync mode for mirrors: the rows matching `arguments` inserted or
+        updated after the `since_id` high-water mark or, to start a sync,
+        changed after `since_ts`, `limit` (`PAGE_SIZE` by default) at a
+        time in the order of their changes. `flag` and `fields` work as in
+        `index_query`; the rows carry their `change_id`.
+
+        Returns the rows and the high-water mark to send as the next
+        `since_id`, the change_id of the last row (or `since_id` when
+        nothing changed). See `change_columns` for where it comes from.
+        """
+        self.check_change_tracking(db)
+        table_columns = self.model.__table__.c
+        change_id, updated_at = self.change_columns()
+
+        columns = self.masked_columns(flag) if flag in MASK_FLAGS else list(table_columns)
+        if fields:
+            columns = [column for column in columns if column.name in fields]
+
+        result = (db.query(*columns, change_id.label('change_id'))
+            .filter(*self.create_filters(arguments, synoptic=synoptic))
+            .filter(updated_at < datetime.utcnow() - timedelta(seconds=CHANGES_SETTLE))
+        )
+
+        if since_id is not None:
+            result = result.filter(change_id > since_id)
+        if since_ts:
+            try:
+                since_ts = datetime.fromisoformat(since_ts)
+            except ValueError:
+                raise HTTPException(
+                    status_code=400, detail="Invalid since_ts. date_time format is yyyy-mm-ddTHH:MM:SS"
+                )
+            result = result.filter(updated_at > since_ts)
+
+        rows = result.order_by(change_id).limit(limit or PAGE_SIZE).all()
+
+        high_water_mark = rows[-1].change_id if rows else since_id
+        return rows, high_water_mark
+
+    def high_water_mark(self, db: Session) -> Optional[int]:
+        """The high-water mark `changes` has reached once every settled change is read, to follow the changes made from now on."""
+        self.check_change_tracking(db)
+        change_id, updated_at = self.change_columns()
+        return (db.query(func.max(change_id))
+            .filter(updated_at < datetime.utcnow() - timedelta(seconds=CHANGES_SETTLE))
+            .scalar()
+        )
+
+    def change_columns(self) -> tuple:
+        """
+        The `(change_id, updated_at)` of the rows, for `changes`.
+
+        The change_id and updated_at (UTC) columns of the synced tables
+        are stamped on every insert and update by the stamp_change
+        trigger, change_id from the public.change_id_seq sequence, all
+        created by models/sql/002_change_tracking.sql. They are not mapped
+        on the models, which the downloads list their columns from. Rows not written since the trigger was added have neither;
+        their id and date_time stand in, and the sequence starts past
+        every id, so high-water marks taken from ids stay valid.
+        """
+        table = self.model.__table__
+        change_id = func.coalesce(literal_column(f"{table.fullname}.change_id", BigInteger), table.c.id)
+        updated_at = func.coalesce(literal_column(f"{table.fullname}.updated_at", DateTime), table.c.date_time)
+        return type_coerce(change_id, BigInteger), type_coerce(updated_at, DateTime)
+
+    def check_change_tracking(self, db: Session) -> None:
+        """
+        Raise a 501 when the table does not have the change_id and
+        updated_at columns yet, instead of the database error `changes`
+        would end in. Once they are found it is not checked again.
+        """
+        if self.change_tracking:
+            return
+        table = self.model.__table__
+        columns = {column['name'] for column in inspect(db.get_bind()).get_columns(table.name, schema=table.schema)}
+        if not {'change_id', 'updated_at'} <= columns:
+            raise HTTPException(
+                status_code=501,
+                detail=f"Sync mode is not set up for {table.fullname} yet: run pnboia_api/models/sql/002_change_tracking.sql on the database",
+            )
+        self.change_tracking = True
+
+    def masked_columns(self, flag: str) -> list:
+        """
+        The model's columns, with every value whose `flag_<column>` marks
+        it as rejected replaced by NULL in the query itself: any flag > 0
+        for `flag='all'`, only the soft flags (0 < flag < 50) for
+        `flag='soft'`. Latitude and longitude are never masked.
+        """
+        table_columns = self.model.__table__.c
+        columns = []
+
+        for column in table_columns:
+            flag_column = table_columns.get(f"flag_{column.name}")
+
+            if flag_column is None or column.name in MASK_IGNORED_COLUMNS:
+                columns.append(column)
+                continue
+
+            if flag == 'soft':
+                rejected = and_(flag_column > 0, flag_column < 50)
             else:
-                result = db.query(self.model).filter(text(query)).limit(limit).all()
+                rejected = flag_column > 0
+
+            columns.append(
+                type_coerce(case((rejected, null()), else_=column), column.type).label(column.name)
+            )
+
+        return columns
+
+    def resample(
+        self,
+        db: Session,
+        *,
+        interval: str,
+        agg: str = 'mean',
+        arguments: dict = None,
+        fields: List[str] = None,
+        synoptic: bool = False,
+    ) -> Tuple[list, List[str]]:
+        """
+        The rows matching `arguments` aggregated per buoy into `interval`
+        buckets (a RESAMPLE_INTERVALS key) by the query itself, each
+        bucket labelled with its start as date_time.
+
+        Every numeric column (or only those in `fields`) is reduced with
+        `agg`, leaving out the values with a nonzero `flag_<column>`.
+        Direction columns are averaged as unit vectors for 'mean'.
+
+        Returns the rows and the names of their columns.
+        """
+        if interval not in RESAMPLE_INTERVALS or agg not in RESAMPLE_AGGREGATES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid resample. Intervals {list(RESAMPLE_INTERVALS)} and agg {list(RESAMPLE_AGGREGATES)} available.",
+            )
 
-        elif order:
-            result = db.query(self.model).filter(text(query)).order_by(self.model.date_time).all()
+        table_columns = self.model.__table__.c
+        date_time = table_columns.date_time
+
+        # written without bound parameters, so GROUP BY and ORDER BY
+        # render the same expression as the SELECT list
+        unit, step = RESAMPLE_INTERVALS[interval]
+        bucket = func.date_trunc(literal_column(f"'{unit}'"), date_time)
+        if step > 1:
+            bucket = bucket - literal_column(f"interval '1 {unit}'") * (
+                cast(extract(unit, date_time), Integer) % literal_column(str(step))
+            )
+
+        columns = [table_columns.buoy_id, type_coerce(bucket, date_time.type).label('date_time')]
+        for column in table_columns:
+            if column.name.startswith('flag_') or column.primary_key or column.foreign_keys:
+                continue
+            if not isinstance(column.type, (Integer, Numeric)):
+                continue
+            if fields and column.name not in fields:
+                continue
+            columns.append(self.aggregate(column, agg, date_time).label(column.name))
+
+        result = (db.query(*columns)
+            .filter(*self.create_filters(arguments, synoptic=synoptic))
+            .group_by(table_columns.buoy_id, bucket)
+            .order_by(table_columns.buoy_id, bucket)
+            .all()
+        )
+
+        return result, [column.name for column in columns]
+
+    def aggregate(self, column, agg: str, date_time):
+        value = column
+        flag_column = self.model.__table__.c.get(f"flag_{column.name}")
+        if flag_column is not None and column.name not in MASK_IGNORED_COLUMNS:
+            value = case((flag_column != 0, null()), else_=column)
+
+        if agg == 'last':
+            result = func.array_agg(aggregate_order_by(value, date_time.desc())).filter(value.isnot(None))[1]
+        elif agg == 'min':
+            result = func.min(value)
+        elif agg == 'max':
+            result = func.max(value)
+        elif DIRECTION_COLUMN.search(column.name):
+            radians = func.radians(value)
+            angle = func.degrees(func.atan2(func.avg(func.sin(radians)), func.avg(func.cos(radians))))
+            result = func.mod(cast(angle, Numeric) + 360, 360)
         else:
-            result = db.query(self.model).filter(text(query)).all()
+            result = func.avg(value)
 
-        return result
+        if agg == 'mean' and isinstance(column.type, Integer):
+            result = func.round(result)
 
-    def create(self, db: Session, *, obj_in: ModelType) -> ModelType:
+        return type_coerce(result, column.type)
+
+    def select_fields(self, fields: str) -> Optional[List[str]]:
+        """
+        Parse the comma separated `fields=` parameter of the routers into
+        the column names to select, or None to select them all. buoy_id,
+        date_time and id are always included, as the pagination keyset.
+        """
+        if not fields:
+            return None
+
+        names = ['buoy_id', 'date_time', 'id']
+        for name in fields.split(','):
+            name = name.strip()
+            if name and name not in names:
+                names.append(name)
+
+        invalid = [name for name in names if name not in self.model.__table__.c]
+        if invalid:
+            raise HTTPException(
+                status_code=400, detail=f"Invalid fields: {', '.join(invalid)}"
+            )
+
+        return names
+
+    def encode_cursor(self, obj: ModelType) -> str:
+        key = json.dumps([obj.buoy_id, obj.date_time.isoformat(), obj.id])
+        return base64.urlsafe_b64encode(key.encode()).decode()
+
+    def decode_cursor(self, cursor: str) -> tuple:
+        try:
+            key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            # cursors of (buoy_id, date_time) only are still accepted
+            buoy_id, date_time, id_ = key if len(key) == 3 else (*key, None)
+            return int(buoy_id), datetime.fromisoformat(date_time), (None if id_ is None else int(id_))
+        except Exception:
+            raise HTTPException(
+                status_code=400, detail="Invalid cursor"
+            )
+
+    @property
+    def primary_key(self):
+        """The primary key column of the model, None when the key is composite."""
+        columns = inspect(self.model).primary_key
+        return columns[0] if len(columns) == 1 else None
+
+    def id_sequence(self) -> Optional[str]:
+        """
+        Qualified name of the sequence the primary key is drawn from: the
+        `Sequence` of the column or the one of its `nextval` server default.
+        """
+        column = self.primary_key
+        if column is None:
+            return None
+        if isinstance(column.default, Sequence):
+            if column.default.schema:
+                return f"{column.default.schema}.{column.default.name}"
+            return column.default.name
+        if column.server_default is not None:
+            match = NEXTVAL.search(str(getattr(column.server_default, 'arg', '')))
+            if match:
+                return match.group('sequence')
+        return None
 
+    def id_sequence_exists(self, db: Session) -> bool:
+        """
+        Whether the `Sequence` the model declares for its primary key is in
+        the database: models/sql/003_id_sequences.sql creates the ones the
+        tables did not have. A sequence named by a nextval server default
+        is the table's own, so it is there. Once found it is not checked
+        again.
+        """
+        column = self.primary_key
+        if self.id_sequence_found or not isinstance(column.default, Sequence):
+            return True
+        bind = db.get_bind()
+        if not bind.dialect.supports_sequences:
+            return True
+        self.id_sequence_found = inspect(bind).has_sequence(column.default.name, schema=column.default.schema)
+        return self.id_sequence_found
+
+    def create(self, db: Session, *, obj_in: ModelType) -> ModelType:
+        """
+        Insert `obj_in`. A primary key drawn from a sequence is left to the
+        database: nextval is part of the INSERT and the new key comes back
+        with RETURNING, so concurrent creates never collide. An integer key
+        without a sequence, or whose sequence is not created yet, is still
+        max + 1 when `obj_in` has none.
+        """
         obj_in_data = jsonable_encoder(obj_in)
+        column = self.primary_key
+        key = inspect(self.model).get_property_by_column(column).key if column is not None else None
+        sequence = self.id_sequence()
+        if sequence is not None and not self.id_sequence_exists(db):
+            sequence = None
+        if sequence is not None:
+            obj_in_data.pop(key, None)
         db_obj = self.model(**obj_in_data)
 
-
-        if str(self.model) == "<class 'pnboia_api.models.moored.Buoy'>":
-            max_id = db.query(func.max(self.model.buoy_id)).first()
-            db_obj.buoy_id = max_id[0] + 1
-        elif str(self.model) == "<class 'pnboia_api.models.drift.BuoyDrift'>":
-            max_id = db.query(func.max(self.model.buoy_id)).first()
-            db_obj.buoy_id = max_id[0] + 1
-        else:
-            max_id = db.query(func.max(self.model.id)).first()
-            db_obj.id = max_id[0] + 1
+        if sequence is None and key is not None and isinstance(column.type, Integer) and getattr(db_obj, key) is None:
+            # no sequence to draw from: concurrent creates can still collide
+            setattr(db_obj, key, (db.query(func.max(column)).scalar() or 0) + 1)
 
         db.add(db_obj)
 
@@ -86,12 +567,15 @@ class CRUDBase(Generic[ModelType]):
     def update(self, db: Session, *, id_pk: int, update_token=False, obj_in: Union[ModelType, Dict[str, Any]]
     ) -> ModelType:
 
-        if str(self.model) == "<class 'pnboia_api.models.moored.Buoy'>":
-            obj_old = db.query(self.model).filter(self.model.buoy_id == id_pk).first()
-        elif str(self.model) == "<class 'pnboia_api.models.drift.BuoyDrift'>":
-            obj_old = db.query(self.model).filter(self.model.buoy_id == id_pk).first()
-        else:
-            obj_old = db.query(self.model).filter(self.model.id == id_pk).first()
+        column = self.primary_key
+        if column is None:
+            raise HTTPException(
+                status_code=400,
+                detail=f"{self.model.__table__.fullname} has a composite primary key and cannot be updated by id",
+            )
+        obj_old = db.query(self.model).filter(column == id_pk).first()
+        if obj_old is None:
+            raise HTTPException(status_code=404, detail="Item not found")
 
         if isinstance(obj_in, dict):
             update_data = obj_in
@@ -116,21 +600,70 @@ class CRUDBase(Generic[ModelType]):
         db.commit()
         return obj
 
-    def create_query(self, kwargs):
-        x = 0
-        query = ""
-        for key, value in kwargs.items():
-            if x == 0:
-                beginning = ""
-            else:
-                beginning = " AND"
-            if type(value) == list:
-                if len(value[1]) == 1:
-                    query += f"{beginning} {key} {value[0]} ('{value[1][0]}')"
+    def create_filters(self, arguments: dict, synoptic: bool = False) -> list:
+        """
+        Turn the `arguments` convention used by the routers
+        (`{'buoy_id=': 1, 'date_time>=': '...'}`, `['in', [...]]` values,
+        `'extract(hour from date_time)'` keys) into column expressions.
+        `['any', [...]]` sends the values as a single array parameter
+        (`column = ANY(:values)`), whatever their number.
+
+        Values are sent as bound parameters, so the statement text is the
+        same on every request and both the SQLAlchemy compiled cache and
+        the server plan cache can reuse it.
+
+        `synoptic` adds the `synoptic_hours` predicate, which the synoptic
+        partial indexes of the qualified tables are declared with.
+        """
+        filters = []
+        if synoptic:
+            filters.append(synoptic_hours(self.model.date_time))
+
+        for key, value in (arguments or {}).items():
+            match = FILTER_KEY.match(key)
+            column = self.filter_column(match.group('column'))
+
+            if isinstance(value, list):
+                filter_operator, values = value
+                values = [self.filter_value(column, v) for v in values]
+                if filter_operator.strip().lower() == 'not in':
+                    filters.append(column.notin_(values))
+                elif filter_operator.strip().lower() == 'any':
+                    filters.append(column == any_(literal(values, ARRAY(column.type))))
                 else:
-                    query += f"{beginning} {key} {value[0]} {tuple(value[1])}"
+                    filters.append(column.in_(values))
             else:
-                query += f"{beginning} {key} '{value}'"
-            x = 1
+                filter_operator = FILTER_OPERATORS[match.group('operator') or '=']
+                filters.append(filter_operator(column, self.filter_value(column, value)))
+
+        return filters
+
+    def filter_column(self, name: str):
+        extract_match = EXTRACT_KEY.match(name)
+        if extract_match:
+            return extract(extract_match.group('field'), self.filter_column(extract_match.group('column')))
+
+        column = self.model.__table__.c.get(name)
+        if column is None:
+            # not mapped on this model (e.g. a column only present in the view)
+            return literal_column(name)
+
+        return column
+
+    def filter_value(self, column, value):
+        if not isinstance(value, str):
+            return value
+
+        try:
+            python_type = column.type.python_type
+        except NotImplementedError:
+            return value
+
+        if python_type in (datetime, date):
+            try:
+                value = datetime.fromisoformat(value)
+            except ValueError:
+                return value
+            return value.date() if python_type is date else value
 
-        return query
+        return value
@@ -1,5 +1,9 @@
+import os
+from collections import namedtuple
 from typing import Any, Dict, Optional, Union
 
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from pnboia_api.crud.base import CRUDBase
@@ -7,6 +11,18 @@ from pnboia_api.schemas.adm import *
 
 from pnboia_api.models.adm import *
 from pnboia_api.core.security import get_password_hash, create_token, credentials_exception
+from pnboia_api.core.cache import TableVersion, TTLCache, fingerprint_query
+
+TOKEN_CACHE_TTL = int(os.getenv('TOKEN_CACHE_TTL', 60))
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 1024))
+# seconds between checks of adm.users for changes made by other workers
+TOKEN_CACHE_CHECK = int(os.getenv('TOKEN_CACHE_CHECK', 5))
+
+# What the endpoints need from the user behind a token
+TokenUser = namedtuple('TokenUser', ['id', 'user_type'])
+
+token_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL, name='token')
+users_version = TableVersion(fingerprint_query(User), check=TOKEN_CACHE_CHECK)
 
 class CRUDUser(CRUDBase[User]):
 
@@ -27,7 +43,6 @@ class CRUDUser(CRUDBase[User]):
             token: str
         ) -> User:
 
-
         arguments = {'token=': token}
         
         user = crud.crud_adm.user.index(db=db, arguments=arguments)
@@ -38,15 +53,63 @@ class CRUDUser(CRUDBase[User]):
 
     def verify(
         self, db: Session, *, skip: int = 0, limit: int = 100, raise_error = True,
-        arguments: dict = None
+        arguments: dict = None, cache: bool = True
+    ) -> User:
+        """
+        Lookups by token alone are answered from `token_cache` with a
+        `TokenUser(id, user_type)`, sparing a query per request. Pass
+        `cache=False` to get the full `User` row.
+
+        The cache is dropped when `users_version` sees adm.users change, so
+        a token revoked or a user type changed by another worker stops
+        being served from here within TOKEN_CACHE_CHECK seconds.
+        """
+
+        token = self.cached_token(arguments, cache)
+
+        if token:
+            if users_version.changed(db):
+                token_cache.clear()
+            result = token_cache.get(token)
+            if result:
+                return result
+
+        result = db.query(self.model).filter(*self.create_filters(arguments)).first()
+
+        return self.verified(result, token=token, raise_error=raise_error)
+
+    async def verify_async(
+        self, db: AsyncSession, *, raise_error = True, arguments: dict = None, cache: bool = True
     ) -> User:
+        """
+        `verify` for the async routers, sharing `token_cache` and
+        `users_version`.
+        """
+
+        token = self.cached_token(arguments, cache)
+
+        if token:
+            if await users_version.changed_async(db):
+                token_cache.clear()
+            result = token_cache.get(token)
+            if result:
+                return result
+
+        result = (await db.execute(select(self.model).filter(*self.create_filters(arguments)))).scalars().first()
+
+        return self.verified(result, token=token, raise_error=raise_error)
 
-        if arguments:
-            query = self.create_query(arguments)
-        else:
-            query = "true"
+    def cached_token(self, arguments: dict, cache: bool) -> Optional[str]:
+        """The token of a lookup `token_cache` can answer, if any."""
+        token = arguments.get('token=') if arguments else None
+        if cache and token is not None and len(arguments) == 1:
+            return token
+        return None
 
-        result = db.query(self.model).filter(text(query)).first()
+    def verified(self, result: Optional[User], *, token: Optional[str], raise_error: bool):
+        if token and result:
+            result = TokenUser(id=result.id, user_type=result.user_type)
+            token_cache.set(token, result)
 
         if raise_error:
             if not result:
@@ -54,4 +117,15 @@ class CRUDUser(CRUDBase[User]):
 
         return result
 
+    def update(self, db: Session, *, id_pk: int, update_token=False, obj_in: Union[User, Dict[str, Any]]
+    ) -> User:
+        result = super().update(db=db, id_pk=id_pk, update_token=update_token, obj_in=obj_in)
+        token_cache.invalidate(lambda token, cached_user: cached_user.id == id_pk)
+        return result
+
+    def delete(self, db: Session, *, id_pk: int) -> User:
+        result = super().delete(db=db, id_pk=id_pk)
+        token_cache.invalidate(lambda token, cached_user: cached_user.id == id_pk)
+        return result
+
 user = CRUDUser(User)
@@ -1,28 +1,65 @@
+import os
+
 from pnboia_api.crud.base import CRUDBase
+from pnboia_api.core.cache import RefreshingRegistry, TableVersion, fingerprint_query
 from pnboia_api.models.moored import *
 from sqlalchemy import desc
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Query, Session
 from typing import List, TypeVar
 from fastapi.encoders import jsonable_encoder
 from sqlalchemy import func
 
 ModelType = TypeVar("ModelType", bound=Base)
 
+BUOY_REGISTRY_REFRESH = int(os.getenv('BUOY_REGISTRY_REFRESH', 300))
+# seconds between checks of moored.buoys for changes; 0 checks on every lookup
+BUOY_REGISTRY_CHECK = int(os.getenv('BUOY_REGISTRY_CHECK', 0))
+
+
+class BuoyRegistry(RefreshingRegistry):
+    """
+    moored.buoys indexed by buoy_id. The handlers that write to the table
+    call `invalidate()`. The `open_data` permission checks read it, so a
+    fingerprint of the (small) table is compared with the loaded one
+    before it is used, and changes made by other workers or outside the
+    API are picked up on the next lookup.
+    """
+
+    def load(self, db: Session) -> dict:
+        return {buoy.buoy_id: buoy for buoy in db.query(Buoy).all()}
+
+buoy_registry = BuoyRegistry(
+    refresh=BUOY_REGISTRY_REFRESH, name='buoy',
+    version=TableVersion(fingerprint_query(Buoy), check=BUOY_REGISTRY_CHECK),
+)
+
 
 class CRUDBuoy(CRUDBase[Buoy]):
     def index(
         self, db: Session, *, skip: int = 0, limit: int = 100, order: bool = False, arguments: dict = None
     ) -> List[Buoy]:
 
-        if arguments:
-            query = self.create_query(arguments)
-        else:
-            query = "true"
+        result = self.index_query(db=db, order=order, arguments=arguments).all()
+
+        return result
+
+    def index_query(self, db: Session, *, order: bool = False, arguments: dict = None, **kwargs) -> Query:
+
+        result = db.query(self.model).filter(*self.create_filters(arguments))
         if order:
-            result = db.query(self.model).filter(text(query)).order_by(desc(self.model.status)).order_by(self.model.name).all()
-        else:
-            result = db.query(self.model).filter(text(query)).all()
+            result = result.order_by(desc(self.model.status)).order_by(self.model.name)
+
+        return result
 
+    def show_cached(self, db: Session, id_pk: int) -> Buoy:
+        """
+        `show` served from `buoy_registry`. A buoy missing from the
+        registry (e.g. created by another worker since the last refresh)
+        is still looked up in the database.
+        """
+        result = buoy_registry.get(db, id_pk)
+        if not result:
+            return self.show(db=db, id_pk=id_pk)
         return result
 
 class CRUDAxysAdcp(CRUDBase[AxysAdcp]):
@@ -68,21 +105,16 @@ class CRUDParameters(CRUDBase[Parameters]):
         arguments: dict = None,
     ) -> List[ModelType]:
 
-        if arguments:
-            query = self.create_query(arguments)
-        else:
-            query = "true"
-
         if limit:
             if order:
-                result = db.query(self.model).filter(text(query)).order_by(self.model.id).limit(limit).all()
+                result = db.query(self.model).filter(*self.create_filters(arguments)).order_by(self.model.id).limit(limit).all()
             else:
-                result = db.query(self.model).filter(text(query)).limit(limit).all()
+                result = db.query(self.model).filter(*self.create_filters(arguments)).limit(limit).all()
 
         elif order:
-            result = db.query(self.model).filter(text(query)).order_by(self.model.id).all()
+            result = db.query(self.model).filter(*self.create_filters(arguments)).order_by(self.model.id).all()
         else:
-            result = db.query(self.model).filter(text(query)).all()
+            result = db.query(self.model).filter(*self.create_filters(arguments)).all()
 
         return result
 
@@ -97,21 +129,16 @@ class CRUDRegisterBuoys(CRUDBase[RegisterBuoys]):
         arguments: dict = None,
     ) -> List[ModelType]:
 
-        if arguments:
-            query = self.create_query(arguments)
-        else:
-            query = "true"
-
         if limit:
             if order:
-                result = db.query(self.model).filter(text(query)).order_by(self.model.start_date).limit(limit).all()
+                result = db.query(self.model).filter(*self.create_filters(arguments)).order_by(self.model.start_date).limit(limit).all()
             else:
-                result = db.query(self.model).filter(text(query)).limit(limit).all()
+                result = db.query(self.model).filter(*self.create_filters(arguments)).limit(limit).all()
 
         elif order:
-            result = db.query(self.model).filter(text(query)).order_by(self.model.start_date).all()
+            result = db.query(self.model).filter(*self.create_filters(arguments)).order_by(self.model.start_date).all()
         else:
-            result = db.query(self.model).filter(text(query)).all()
+            result = db.query(self.model).filter(*self.create_filters(arguments)).all()
 
         return result
 
@@ -1,14 +1,88 @@
-from pnboia_api.crud.base import CRUDBase
+import os
+
+from pnboia_api.crud.base import CRUDBase, FILTER_KEY
+from pnboia_api.core.cache import RefreshingRegistry
+from pnboia_api.db.base import ReplicaSessionLocal, async_replica_engine, replica_engine
 from pnboia_api.models.qualified_data import *
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+
+from typing import List, Optional
+from sqlalchemy import desc, select, true
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Query, Session, aliased
+
+LATEST_OBSERVATION_REFRESH = int(os.getenv('LATEST_OBSERVATION_REFRESH', 60))
+
+
+class LatestObservationStore(RefreshingRegistry):
+    """
+    Most recent row of each buoy in a qualified table, indexed by buoy_id.
+    A reload is one LATERAL lookup per buoy of moored.buoys, each an index
+    scan on (buoy_id, date_time), instead of the DISTINCT ON sort over the
+    whole table that `last_query` runs.
+
+    It is loaded from the read replica, so only the requests
+    `deps.use_replica` sends to the replica are answered from it; the
+    ones it keeps on the primary (read-after-write, replication lag) go
+    to the database. Without a replica every request may use it.
+    """
+
+    def __init__(self, model, **kwargs):
+        self.model = model
+        super().__init__(**kwargs)
+
+    def load(self, db: Session) -> dict:
+        buoys = Buoy.__table__
+        latest = (
+            select(self.model)
+            .where(self.model.buoy_id == buoys.c.buoy_id)
+            .order_by(desc(self.model.date_time))
+            .limit(1)
+            .correlate(buoys)
+            .lateral()
+        )
+        rows = db.query(aliased(self.model, latest)).select_from(buoys.join(latest, true())).all()
+        return {row.buoy_id: row for row in rows}
+
+    def select(self, rows: dict, arguments: dict = None) -> Optional[list]:
+        """
+        The rows matching `arguments`, in the `last_query` order (buoy_id
+        descending). None when an argument is not an equality on a column
+        of the table, which only the database can answer.
+        """
+        filters = []
+        for key, value in (arguments or {}).items():
+            match = FILTER_KEY.match(key)
+            column = match.group('column')
+            if isinstance(value, list) or (match.group('operator') or '=') != '=' or self.model.__table__.c.get(column) is None:
+                return None
+            filters.append((column, value))
+
+        return [
+            row for buoy_id, row in sorted(rows.items(), reverse=True)
+            if all(getattr(row, column) == value for column, value in filters)
+        ]
+
+    def serves(self, db) -> bool:
+        """Whether the request whose (sync or async) session is `db` may be answered from the store."""
+        return db.bind is replica_engine or db.bind is async_replica_engine
+
+    def get_all_replica(self) -> dict:
+        db = ReplicaSessionLocal()
+        try:
+            return self.get_all(db)
+        finally:
+            db.close()
 
-from typing import List
-from sqlalchemy import desc
-from sqlalchemy.orm import Session
 
 class CRUDQualifiedData(CRUDBase[QualifiedData]):
 
+    def __init__(self, model):
+        super().__init__(model)
+        self.latest = LatestObservationStore(model, refresh=LATEST_OBSERVATION_REFRESH, name=f'latest_{model.__tablename__}')
+
     def last(
         self,
         db: Session,
@@ -20,22 +94,38 @@ class CRUDQualifiedData(CRUDBase[QualifiedData]):
         arguments: dict = None
     ) -> List[QualifiedData]:
 
-        if arguments:
-            query = self.create_query(arguments)
-        else:
-            query = "true"
+        result = None
+        if last and self.latest.serves(db):
+            result = self.latest.select(self.latest.get_all(db), arguments if buoy_sel else None)
+        if result is None:
+            result = self.last_query(db=db, last=last, buoy_sel=buoy_sel, arguments=arguments).all()
 
-        if last:
-            if buoy_sel:
-                # result = db.query(self.model).filter(text(query)).order_by(desc(self.model.date_time)).all()
-                result = db.query(self.model).filter(text(query)).distinct(self.model.buoy_id).order_by(desc(self.model.buoy_id)).order_by(desc(self.model.date_time)).all()
+        if not result:
+            raise HTTPException(
+                status_code=404, detail=f"{self.model} with {arguments} not found"
+            )
 
-            else:
-                result = db.query(self.model).distinct(self.model.buoy_id).order_by(desc(self.model.buoy_id)).order_by(desc(self.model.date_time)).all()
+        return result
 
+    async def last_async(
+        self,
+        db: AsyncSession,
+        *,
+        last:bool = True,
+        buoy_sel:bool = False,
+        arguments: dict = None
+    ) -> List[QualifiedData]:
 
-        else:
-            result = db.query(self.model).distinct(self.model.buoy_id).order_by(desc(self.model.buoy_id)).order_by(self.model.date_time).all()
+        result = None
+        if last and self.latest.serves(db):
+            # a reload runs on a sync session, off the event loop
+            rows = self.latest.current()
+            if rows is None:
+                rows = await run_in_threadpool(self.latest.get_all_replica)
+            result = self.latest.select(rows, arguments if buoy_sel else None)
+        if result is None:
+            query = self.last_query(db=db.sync_session, last=last, buoy_sel=buoy_sel, arguments=arguments)
+            result = (await db.execute(query.statement)).scalars().all()
 
         if not result:
             raise HTTPException(
@@ -44,6 +134,29 @@ class CRUDQualifiedData(CRUDBase[QualifiedData]):
 
         return result
 
+    def last_query(
+        self,
+        db: Session,
+        *,
+        last:bool = True,
+        buoy_sel:bool = False,
+        arguments: dict = None
+    ) -> Query:
+
+        if last:
+            if buoy_sel:
+                # result = db.query(self.model).filter(text(query)).order_by(desc(self.model.date_time))
+                result = db.query(self.model).filter(*self.create_filters(arguments)).distinct(self.model.buoy_id).order_by(desc(self.model.buoy_id)).order_by(desc(self.model.date_time))
+
+            else:
+                result = db.query(self.model).distinct(self.model.buoy_id).order_by(desc(self.model.buoy_id)).order_by(desc(self.model.date_time))
+
+
+        else:
+            result = db.query(self.model).distinct(self.model.buoy_id).order_by(desc(self.model.buoy_id)).order_by(self.model.date_time)
+
+        return result
+
 qualified_data = CRUDQualifiedData(QualifiedData)
 
 spotter_qualified_data = CRUDQualifiedData(SpotterQualified)
@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import Any, Dict, List, Optional, Union
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc, text
+from sqlalchemy import func, desc, insert, text
 from fastapi import HTTPException
 from fastapi.encoders import jsonable_encoder
 from pnboia_api.crud.base import CRUDBase
@@ -61,7 +61,58 @@ class CRUDSailbuoyMetadata(CRUDBase[SailbuoyMetadata]):
         return db_obj
 
 
-class CRUDAutopilotData(CRUDBase[AutopilotData]):
+class CRUDSailbuoyDataBulk:
+    """
+    Bulk insert shared by the autopilot and datalogger CRUD classes.
+    """
+    def create_bulk(self, db: Session, *, objs_in: list) -> Dict[str, Any]:
+        """
+        Insert many messages in one transaction: the names are resolved to
+        sailbuoy_ids with a single query, the rows are sent with one
+        executemany and `last_date_time` is moved forward once per sailbuoy.
+        """
+        if not objs_in:
+            return {"inserted": 0, "last_date_time": {}}
+
+        names = {obj_in.name for obj_in in objs_in}
+        sailbuoy_ids = dict(
+            db.query(SailbuoyMetadata.name, SailbuoyMetadata.sailbuoy_id)
+            .filter(SailbuoyMetadata.name.in_(names))
+            .all()
+        )
+        missing = names - sailbuoy_ids.keys()
+        if missing:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Sailbuoy with name {', '.join(sorted(missing))} not found"
+            )
+
+        columns = set(self.model.__table__.columns.keys())
+        rows = []
+        last_date_time = {}
+        for obj_in in objs_in:
+            # name (and any field without a column) is not inserted
+            data = {key: value for key, value in obj_in.dict(exclude={"name"}).items() if key in columns}
+            data["sailbuoy_id"] = sailbuoy_ids[obj_in.name]
+            rows.append(data)
+
+            latest = last_date_time.get(data["sailbuoy_id"])
+            if latest is None or obj_in.sailbuoy_time > latest:
+                last_date_time[data["sailbuoy_id"]] = obj_in.sailbuoy_time
+
+        db.execute(insert(self.model), rows)
+
+        for sailbuoy_id, latest in last_date_time.items():
+            db.query(SailbuoyMetadata).filter(SailbuoyMetadata.sailbuoy_id == sailbuoy_id).update(
+                {SailbuoyMetadata.last_date_time: func.greatest(SailbuoyMetadata.last_date_time, latest)},
+                synchronize_session=False,
+            )
+        db.commit()
+
+        return {"inserted": len(rows), "last_date_time": last_date_time}
+
+
+class CRUDAutopilotData(CRUDSailbuoyDataBulk, CRUDBase[AutopilotData]):
     """
     CRUD operations for AutopilotData
     """
@@ -135,7 +186,7 @@ class CRUDAutopilotData(CRUDBase[AutopilotData]):
         return db_obj
 
 
-class CRUDDataloggerData(CRUDBase[DataloggerData]):
+class CRUDDataloggerData(CRUDSailbuoyDataBulk, CRUDBase[DataloggerData]):
     """
     CRUD operations for DataloggerData
     """
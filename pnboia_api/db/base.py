@@ -2,25 +2,82 @@
 # imported by Alembic
 import os
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from urllib.parse import quote  
 
 from dotenv import load_dotenv
 
+from pnboia_api.db.pool import (
+    InstrumentedAsyncAdaptedQueuePool, InstrumentedNullPool, InstrumentedQueuePool, instrument
+)
+
 load_dotenv()
 
-def engine_create(qc=True):
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 10))
+DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', 30))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+# behind PgBouncer in transaction mode: no client-side pool and no
+# prepared statements, which do not survive a server connection switch
+DB_PGBOUNCER = os.getenv('DB_PGBOUNCER', 'false').lower() == 'true'
+
+def pool_options(asyncio=False):
+
+    if DB_PGBOUNCER:
+        options = {'poolclass': InstrumentedNullPool}
+        if asyncio:
+            options['connect_args'] = {'statement_cache_size': 0, 'prepared_statement_cache_size': 0}
+    else:
+        options = {
+            'poolclass': InstrumentedAsyncAdaptedQueuePool if asyncio else InstrumentedQueuePool,
+            'pool_size': DB_POOL_SIZE,
+            'max_overflow': DB_MAX_OVERFLOW,
+            'pool_timeout': DB_POOL_TIMEOUT,
+            'pool_recycle': DB_POOL_RECYCLE,
+        }
+
+    options['pool_pre_ping'] = DB_POOL_PRE_PING
+
+    return options
+
+def engine_create(qc=True, replica=False):
 
     if qc:
         password = os.getenv('REMOBS_QC_DB_PASSWORD')
-        local = os.getenv('REMOBS_QC_DB_URL')
-        engine = create_engine(f"postgresql+psycopg2://{os.getenv('REMOBS_QC_DB_USR')}:{quote(password)}@{local}/{os.getenv('REMOBS_QC_DB')}")
+        local = os.getenv('REMOBS_QC_DB_REPLICA_URL' if replica else 'REMOBS_QC_DB_URL')
+        engine = create_engine(f"postgresql+psycopg2://{os.getenv('REMOBS_QC_DB_USR')}:{quote(password)}@{local}/{os.getenv('REMOBS_QC_DB')}", **pool_options())
+        instrument(engine, 'replica' if replica else 'primary')
 
     return engine
 
+def async_engine_create(qc=True, replica=False):
+
+    if qc:
+        password = os.getenv('REMOBS_QC_DB_PASSWORD')
+        local = os.getenv('REMOBS_QC_DB_REPLICA_URL' if replica else 'REMOBS_QC_DB_URL')
+        async_engine = create_async_engine(f"postgresql+asyncpg://{os.getenv('REMOBS_QC_DB_USR')}:{quote(password)}@{local}/{os.getenv('REMOBS_QC_DB')}", **pool_options(asyncio=True))
+        instrument(async_engine.sync_engine, 'async_replica' if replica else 'async')
+
+    return async_engine
+
 engine = engine_create()
+async_engine = async_engine_create()
+
+# read-only standby for the GET endpoints (see deps.get_routed_db); without
+# REMOBS_QC_DB_REPLICA_URL every session goes to the primary
+if os.getenv('REMOBS_QC_DB_REPLICA_URL'):
+    replica_engine = engine_create(replica=True)
+    async_replica_engine = async_engine_create(replica=True)
+else:
+    replica_engine = engine
+    async_replica_engine = async_engine
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=async_engine, class_=AsyncSession, expire_on_commit=False)
+ReplicaSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=replica_engine)
+AsyncReplicaSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=async_replica_engine, class_=AsyncSession, expire_on_commit=False)
 
 Base = declarative_base()
\ No newline at end of file
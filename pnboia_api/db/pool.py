@@ -0,0 +1,130 @@
+import time
+import threading
+from typing import Dict
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+
+# every instrumented pool, so /v1/stats can report them
+pools: Dict[str, "PoolMetrics"] = {}
+
+
+class PoolMetrics:
+    """
+    Checkout counters of the pool of one engine: how long `connect()`
+    took to hand out a connection (free slot, overflow or a fresh
+    connection to the server, plus the pre-ping), how many connections
+    are checked out, opened and invalidated, and how many checkouts timed
+    out.
+
+    The counts come from the pool events of the engine, which carry over
+    to the new pool `engine.dispose()` creates.
+    """
+
+    def __init__(self, name: str, engine):
+        self.name = name
+        self.engine = engine
+        self.checkouts = 0
+        self.timeouts = 0
+        self.in_use = 0
+        self.connections = 0
+        self.invalidations = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._lock = threading.Lock()
+
+        event.listen(engine, "checkout", self.checked_out)
+        event.listen(engine, "checkin", self.checked_in)
+        event.listen(engine, "connect", self.connected)
+        event.listen(engine, "invalidate", self.invalidated)
+
+        pools[name] = self
+
+    def checked_out(self, dbapi_connection, connection_record, connection_proxy) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+
+    def checked_in(self, dbapi_connection, connection_record) -> None:
+        with self._lock:
+            self.in_use -= 1
+
+    def connected(self, dbapi_connection, connection_record) -> None:
+        with self._lock:
+            self.connections += 1
+
+    def invalidated(self, dbapi_connection, connection_record, exception) -> None:
+        with self._lock:
+            self.invalidations += 1
+
+    def waited(self, wait: float) -> None:
+        with self._lock:
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+
+    def timed_out(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+
+    def stats(self) -> dict:
+        pool = self.engine.pool
+        overflow = pool.overflow() if isinstance(pool, QueuePool) else 0
+        size = pool.size() if isinstance(pool, QueuePool) else None
+        with self._lock:
+            return {
+                "pool": type(pool).__name__,
+                "size": size,
+                "in_use": self.in_use,
+                "overflow": max(overflow, 0),
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "connections": self.connections,
+                "invalidations": self.invalidations,
+                "checkout_ms_avg": self.wait_total / self.checkouts * 1000 if self.checkouts else 0.0,
+                "checkout_ms_max": self.wait_max * 1000,
+            }
+
+
+class InstrumentedPool:
+    """
+    Mixin timing `connect()`, the checkout of a connection from the pool,
+    and counting the checkouts that timed out.
+    """
+
+    metrics: PoolMetrics = None
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except TimeoutError:
+            if self.metrics:
+                self.metrics.timed_out()
+            raise
+        if self.metrics:
+            self.metrics.waited(time.perf_counter() - started)
+        return connection
+
+
+class InstrumentedQueuePool(InstrumentedPool, QueuePool):
+    ...
+
+class InstrumentedAsyncAdaptedQueuePool(InstrumentedPool, AsyncAdaptedQueuePool):
+    ...
+
+class InstrumentedNullPool(InstrumentedPool, NullPool):
+    ...
+
+
+def instrument(engine, name: str) -> None:
+    """Attach a `PoolMetrics` named `name` to the pool of `engine`."""
+    if not isinstance(engine.pool, InstrumentedPool):
+        return
+    metrics = PoolMetrics(name, engine)
+    engine.pool.metrics = metrics
+
+    @event.listens_for(engine, "engine_disposed")
+    def disposed(engine):
+        # dispose() replaces the pool; keep timing the new one
+        engine.pool.metrics = metrics
@@ -1,5 +1,5 @@
 # coding: utf-8
-from sqlalchemy import Boolean, Column, Computed, Date, DateTime, ForeignKey, Integer, Numeric, SmallInteger, String, Text, text
+from sqlalchemy import Boolean, Column, Computed, Date, DateTime, ForeignKey, Integer, Numeric, Sequence, SmallInteger, String, Text, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 
@@ -10,7 +10,7 @@ class User(Base):
     __tablename__ = 'users'
     __table_args__ = {'schema': 'adm'}
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, Sequence('users_id_seq', schema='adm'), primary_key=True, index=True)
     username = Column(String(256), nullable=True)
     email = Column(String, index=True, nullable=False)
     user_type = Column(String, default='normal')
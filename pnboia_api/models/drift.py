@@ -1,5 +1,5 @@
 # coding: utf-8
-from sqlalchemy import Column, Computed, Date, DateTime, ForeignKey, Numeric, SmallInteger, String, Text
+from sqlalchemy import Column, Computed, Date, DateTime, ForeignKey, Numeric, Sequence, SmallInteger, String, Text
 from geoalchemy2.types import Geometry
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
@@ -11,7 +11,7 @@ class BuoyDrift(Base):
     __tablename__ = 'buoys'
     __table_args__ = {'schema': 'drift', 'comment': 'Tabela com as informações de todas as boias de DERIVA do programa PNBOIA/REMOBS.'}
 
-    buoy_id = Column(SmallInteger, primary_key=True, comment='Id da boia.')
+    buoy_id = Column(SmallInteger, Sequence('buoys_buoy_id_seq', schema='drift'), primary_key=True, comment='Id da boia.')
     hull_id = Column(SmallInteger, comment='Identificação do casco.')
     model = Column(String(30), nullable=False, comment='Modelo da boia.')
     latitude_deploy = Column(Numeric(10, 4), nullable=False, comment='Latitude do lançamento da boia.')
@@ -1,5 +1,5 @@
 # coding: utf-8
-from sqlalchemy import Boolean, Column, Computed, Date, ARRAY, DateTime, ForeignKey, Integer, JSON, Numeric, SmallInteger, String, Text, text
+from sqlalchemy import Boolean, Column, Computed, Date, ARRAY, DateTime, ForeignKey, Integer, JSON, Numeric, Sequence, SmallInteger, String, Text, text
 from geoalchemy2.types import Geometry
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import INTERVAL
@@ -12,7 +12,7 @@ class Buoy(Base):
     __tablename__ = 'buoys'
     __table_args__ = {'schema': 'moored', 'comment': 'Tabela com todas informações sobre as boias fundeadas.'}
 
-    buoy_id = Column(SmallInteger, primary_key=True, comment='Id de identificação da boia.')
+    buoy_id = Column(SmallInteger, Sequence('buoys_buoy_id_seq', schema='moored'), primary_key=True, comment='Id de identificação da boia.')
     hull_id = Column(SmallInteger, comment='Identificação do casco')
     name = Column(String(30), comment='Nome atribuído à boia.')
     deploy_date = Column(Date, comment='Data em que a boia foi lançada.')
@@ -1,6 +1,6 @@
 
 # coding: utf-8
-from sqlalchemy import Boolean, Column, Computed, Date, DateTime, ForeignKey, Integer, Numeric, SmallInteger, String, Text, text
+from sqlalchemy import Boolean, Column, Computed, Date, DateTime, ForeignKey, Index, Integer, Numeric, SmallInteger, String, Text, extract, text
 from geoalchemy2.types import Geometry
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
@@ -9,6 +9,20 @@ from pnboia_api.models.moored import *
 Base = declarative_base()
 metadata = Base.metadata
 
+# hours (UTC) of the synoptic observations, the only ones some users can
+# see from project 2 buoys
+SYNOPTIC_HOURS = (0, 3, 6, 9, 12, 15, 18, 21)
+
+
+def synoptic_hours(date_time):
+    """
+    Predicate selecting the synoptic hours. The partial indexes below are
+    declared with the same expression, so the planner can match a query
+    filtered with it to them.
+    """
+    return extract('hour', date_time).in_(SYNOPTIC_HOURS)
+
+
 class QualifiedData(Base):
     __tablename__ = 'qualified_data'
     __table_args__ = {'schema': 'qualified_data', 'comment': 'Tabela contendo todos os dados qualificados e com suas respectivas flags.'}
@@ -192,6 +206,11 @@ class QualifiedData(Base):
     buoy = relationship(Buoy, foreign_keys=[buoy_id])
 
 
+# created on the database by sql/001_synoptic_indexes.sql
+Index('ix_qualified_data_synoptic', QualifiedData.buoy_id, QualifiedData.date_time,
+    postgresql_where=synoptic_hours(QualifiedData.date_time))
+
+
 class SpotterQualified(Base):
     __tablename__ = 'spotter_qualified'
     __table_args__ = {'schema': 'qualified_data'}
@@ -425,6 +444,10 @@ class BMOBrQualified(Base):
     bmobr_qualified = relationship(BmobrGeneral, foreign_keys=[id])
     # buoy = relationship(Buoy, foreign_keys=[buoy_id])
 
+# created on the database by sql/001_synoptic_indexes.sql
+Index('ix_bmobr_qualified_synoptic', BMOBrQualified.buoy_id, BMOBrQualified.date_time,
+    postgresql_where=synoptic_hours(BMOBrQualified.date_time))
+
 class PNBoiaQualified(Base):
     __tablename__ = 'axys_qualified'
     __table_args__ = {'schema': 'qualified_data', 'comment': 'Tabela contendo os dados qualificados e com suas respectivas flags das boias históricas do PNBoia.'}
@@ -1,5 +1,5 @@
 # coding: utf-8
-from sqlalchemy import Boolean, Column, Computed, Date, DateTime, ForeignKey, Integer, Numeric, SmallInteger, String, Text, text
+from sqlalchemy import Boolean, Column, Computed, Date, DateTime, ForeignKey, Integer, Numeric, Sequence, SmallInteger, String, Text, text
 from geoalchemy2.types import Geometry
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
@@ -12,7 +12,7 @@ class General(Base):
     __tablename__ = 'general'
     __table_args__ = {'schema': 'quality_control'}
 
-    id = Column(SmallInteger, primary_key=True, comment='Id da boia.')
+    id = Column(SmallInteger, Sequence('general_id_seq', schema='quality_control'), primary_key=True, comment='Id da boia.')
     buoy_id = Column(ForeignKey(Buoy.buoy_id, onupdate='CASCADE'), comment='ID da boia')
     qc_config = Column(JSON)
 
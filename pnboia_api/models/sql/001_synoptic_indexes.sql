@@ -0,0 +1,17 @@
+-- Partial indexes over the synoptic hours of the qualified tables, which
+-- the requests restricted to them (synoptic=True) are answered from.
+--
+-- The tables already exist, so create_all does not add the indexes the
+-- models declare. Keep the WHERE clause the same as `synoptic_hours` in
+-- models/qualified_data.py, or the planner will not use them.
+--
+-- Run once, outside a transaction (CREATE INDEX CONCURRENTLY):
+--   psql -f pnboia_api/models/sql/001_synoptic_indexes.sql
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_qualified_data_synoptic
+    ON qualified_data.qualified_data (buoy_id, date_time)
+    WHERE EXTRACT(hour FROM date_time) IN (0, 3, 6, 9, 12, 15, 18, 21);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_bmobr_qualified_synoptic
+    ON qualified_data.bmobr_qualified (buoy_id, date_time)
+    WHERE EXTRACT(hour FROM date_time) IN (0, 3, 6, 9, 12, 15, 18, 21);
@@ -0,0 +1,112 @@
+-- Change tracking of the tables served in sync mode (`since_id`/`since_ts`,
+-- CRUDBase.changes) and by the /v1/stream feeds.
+--
+-- The stamp_change trigger sets change_id, from one sequence shared by
+-- every table, and updated_at (UTC) on each insert and update. Rows
+-- written before the trigger keep NULLs; their id and date_time stand in,
+-- so the sequence starts past every id.
+--
+-- Run once, outside a transaction (CREATE INDEX CONCURRENTLY):
+--   psql -f pnboia_api/models/sql/002_change_tracking.sql
+
+CREATE SEQUENCE IF NOT EXISTS public.change_id_seq;
+
+SELECT setval('public.change_id_seq', greatest(
+    (SELECT max(id) FROM qualified_data.qualified_data),
+    (SELECT max(id) FROM qualified_data.spotter_qualified),
+    (SELECT max(id) FROM qualified_data.triaxys_qualified),
+    (SELECT max(id) FROM qualified_data.bmobr_qualified),
+    (SELECT max(id) FROM qualified_data.axys_qualified),
+    (SELECT max(id) FROM qualified_data.criosfera_qualified),
+    (SELECT max(id) FROM moored.axys_general),
+    (SELECT max(id) FROM moored.bmobr_raw),
+    (SELECT max(id) FROM moored.bmobr_triaxys_raw),
+    (SELECT max(id) FROM moored.spotter_all),
+    (SELECT max(id) FROM moored.spotter_system),
+    (SELECT max(id) FROM moored.bmobr_general),
+    -- never back, when run again
+    (SELECT last_value FROM public.change_id_seq),
+    1));
+
+CREATE OR REPLACE FUNCTION public.stamp_change() RETURNS trigger AS $$
+BEGIN
+    NEW.change_id := nextval('public.change_id_seq');
+    NEW.updated_at := clock_timestamp() AT TIME ZONE 'UTC';
+    RETURN NEW;
+END $$ LANGUAGE plpgsql;
+
+ALTER TABLE qualified_data.qualified_data ADD COLUMN IF NOT EXISTS change_id bigint, ADD COLUMN IF NOT EXISTS updated_at timestamp;
+DROP TRIGGER IF EXISTS stamp_change ON qualified_data.qualified_data;
+CREATE TRIGGER stamp_change BEFORE INSERT OR UPDATE ON qualified_data.qualified_data
+    FOR EACH ROW EXECUTE FUNCTION public.stamp_change();
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_qualified_data_change ON qualified_data.qualified_data (buoy_id, (coalesce(change_id, id)));
+
+ALTER TABLE qualified_data.spotter_qualified ADD COLUMN IF NOT EXISTS change_id bigint, ADD COLUMN IF NOT EXISTS updated_at timestamp;
+DROP TRIGGER IF EXISTS stamp_change ON qualified_data.spotter_qualified;
+CREATE TRIGGER stamp_change BEFORE INSERT OR UPDATE ON qualified_data.spotter_qualified
+    FOR EACH ROW EXECUTE FUNCTION public.stamp_change();
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_spotter_qualified_change ON qualified_data.spotter_qualified (buoy_id, (coalesce(change_id, id)));
+
+ALTER TABLE qualified_data.triaxys_qualified ADD COLUMN IF NOT EXISTS change_id bigint, ADD COLUMN IF NOT EXISTS updated_at timestamp;
+DROP TRIGGER IF EXISTS stamp_change ON qualified_data.triaxys_qualified;
+CREATE TRIGGER stamp_change BEFORE INSERT OR UPDATE ON qualified_data.triaxys_qualified
+    FOR EACH ROW EXECUTE FUNCTION public.stamp_change();
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_triaxys_qualified_change ON qualified_data.triaxys_qualified (buoy_id, (coalesce(change_id, id)));
+
+ALTER TABLE qualified_data.bmobr_qualified ADD COLUMN IF NOT EXISTS change_id bigint, ADD COLUMN IF NOT EXISTS updated_at timestamp;
+DROP TRIGGER IF EXISTS stamp_change ON qualified_data.bmobr_qualified;
+CREATE TRIGGER stamp_change BEFORE INSERT OR UPDATE ON qualified_data.bmobr_qualified
+    FOR EACH ROW EXECUTE FUNCTION public.stamp_change();
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_bmobr_qualified_change ON qualified_data.bmobr_qualified (buoy_id, (coalesce(change_id, id)));
+
+ALTER TABLE qualified_data.axys_qualified ADD COLUMN IF NOT EXISTS change_id bigint, ADD COLUMN IF NOT EXISTS updated_at timestamp;
+DROP TRIGGER IF EXISTS stamp_change ON qualified_data.axys_qualified;
+CREATE TRIGGER stamp_change BEFORE INSERT OR UPDATE ON qualified_data.axys_qualified
+    FOR EACH ROW EXECUTE FUNCTION public.stamp_change();
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_axys_qualified_change ON qualified_data.axys_qualified (buoy_id, (coalesce(change_id, id)));
+
+ALTER TABLE qualified_data.criosfera_qualified ADD COLUMN IF NOT EXISTS change_id bigint, ADD COLUMN IF NOT EXISTS updated_at timestamp;
+DROP TRIGGER IF EXISTS stamp_change ON qualified_data.criosfera_qualified;
+CREATE TRIGGER stamp_change BEFORE INSERT OR UPDATE ON qualified_data.criosfera_qualified
+    FOR EACH ROW EXECUTE FUNCTION public.stamp_change();
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_criosfera_qualified_change ON qualified_data.criosfera_qualified (buoy_id, (coalesce(change_id, id)));
+
+ALTER TABLE moored.axys_general ADD COLUMN IF NOT EXISTS change_id bigint, ADD COLUMN IF NOT EXISTS updated_at timestamp;
+DROP TRIGGER IF EXISTS stamp_change ON moored.axys_general;
+CREATE TRIGGER stamp_change BEFORE INSERT OR UPDATE ON moored.axys_general
+    FOR EACH ROW EXECUTE FUNCTION public.stamp_change();
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_axys_general_change ON moored.axys_general (buoy_id, (coalesce(change_id, id)));
+
+ALTER TABLE moored.bmobr_raw ADD COLUMN IF NOT EXISTS change_id bigint, ADD COLUMN IF NOT EXISTS updated_at timestamp;
+DROP TRIGGER IF EXISTS stamp_change ON moored.bmobr_raw;
+CREATE TRIGGER stamp_change BEFORE INSERT OR UPDATE ON moored.bmobr_raw
+    FOR EACH ROW EXECUTE FUNCTION public.stamp_change();
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_bmobr_raw_change ON moored.bmobr_raw (buoy_id, (coalesce(change_id, id)));
+
+ALTER TABLE moored.bmobr_triaxys_raw ADD COLUMN IF NOT EXISTS change_id bigint, ADD COLUMN IF NOT EXISTS updated_at timestamp;
+DROP TRIGGER IF EXISTS stamp_change ON moored.bmobr_triaxys_raw;
+CREATE TRIGGER stamp_change BEFORE INSERT OR UPDATE ON moored.bmobr_triaxys_raw
+    FOR EACH ROW EXECUTE FUNCTION public.stamp_change();
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_bmobr_triaxys_raw_change ON moored.bmobr_triaxys_raw (buoy_id, (coalesce(change_id, id)));
+
+ALTER TABLE moored.spotter_all ADD COLUMN IF NOT EXISTS change_id bigint, ADD COLUMN IF NOT EXISTS updated_at timestamp;
+DROP TRIGGER IF EXISTS stamp_change ON moored.spotter_all;
+CREATE TRIGGER stamp_change BEFORE INSERT OR UPDATE ON moored.spotter_all
+    FOR EACH ROW EXECUTE FUNCTION public.stamp_change();
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_spotter_all_change ON moored.spotter_all (buoy_id, (coalesce(change_id, id)));
+
+ALTER TABLE moored.spotter_system ADD COLUMN IF NOT EXISTS change_id bigint, ADD COLUMN IF NOT EXISTS updated_at timestamp;
+DROP TRIGGER IF EXISTS stamp_change ON moored.spotter_system;
+CREATE TRIGGER stamp_change BEFORE INSERT OR UPDATE ON moored.spotter_system
+    FOR EACH ROW EXECUTE FUNCTION public.stamp_change();
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_spotter_system_change ON moored.spotter_system (buoy_id, (coalesce(change_id, id)));
+
+ALTER TABLE moored.bmobr_general ADD COLUMN IF NOT EXISTS change_id bigint, ADD COLUMN IF NOT EXISTS updated_at timestamp;
+DROP TRIGGER IF EXISTS stamp_change ON moored.bmobr_general;
+CREATE TRIGGER stamp_change BEFORE INSERT OR UPDATE ON moored.bmobr_general
+    FOR EACH ROW EXECUTE FUNCTION public.stamp_change();
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_bmobr_general_change ON moored.bmobr_general (buoy_id, (coalesce(change_id, id)));
+
+-- the /v1/stream feeds read the changes of every buoy at once
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_qualified_data_change_all ON qualified_data.qualified_data ((coalesce(change_id, id)));
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_bmobr_qualified_change_all ON qualified_data.bmobr_qualified ((coalesce(change_id, id)));
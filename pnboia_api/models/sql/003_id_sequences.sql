@@ -0,0 +1,69 @@
+-- Sequences of the primary keys CRUDBase.create leaves to the database.
+--
+-- create used to allocate keys as max + 1. The keys of adm.users,
+-- drift.buoys, moored.buoys and quality_control.general now come from the
+-- sequences their models declare, created here. Until then create keeps
+-- allocating them as max + 1. Every sequence is moved past the keys
+-- max + 1 allocated, and never back, so the script can be run again.
+--
+--   psql -1 -f pnboia_api/models/sql/003_id_sequences.sql
+
+CREATE SEQUENCE IF NOT EXISTS adm.users_id_seq OWNED BY adm.users.id;
+ALTER TABLE adm.users ALTER COLUMN id SET DEFAULT nextval('adm.users_id_seq');
+SELECT setval('adm.users_id_seq', greatest(
+    (SELECT max(id) FROM adm.users),
+    (SELECT last_value FROM adm.users_id_seq)));
+
+CREATE SEQUENCE IF NOT EXISTS drift.buoys_buoy_id_seq OWNED BY drift.buoys.buoy_id;
+ALTER TABLE drift.buoys ALTER COLUMN buoy_id SET DEFAULT nextval('drift.buoys_buoy_id_seq');
+SELECT setval('drift.buoys_buoy_id_seq', greatest(
+    (SELECT max(buoy_id) FROM drift.buoys),
+    (SELECT last_value FROM drift.buoys_buoy_id_seq)));
+
+CREATE SEQUENCE IF NOT EXISTS moored.buoys_buoy_id_seq OWNED BY moored.buoys.buoy_id;
+ALTER TABLE moored.buoys ALTER COLUMN buoy_id SET DEFAULT nextval('moored.buoys_buoy_id_seq');
+SELECT setval('moored.buoys_buoy_id_seq', greatest(
+    (SELECT max(buoy_id) FROM moored.buoys),
+    (SELECT last_value FROM moored.buoys_buoy_id_seq)));
+
+CREATE SEQUENCE IF NOT EXISTS quality_control.general_id_seq OWNED BY quality_control.general.id;
+ALTER TABLE quality_control.general ALTER COLUMN id SET DEFAULT nextval('quality_control.general_id_seq');
+SELECT setval('quality_control.general_id_seq', greatest(
+    (SELECT max(id) FROM quality_control.general),
+    (SELECT last_value FROM quality_control.general_id_seq)));
+
+-- sequences the tables already had
+
+SELECT setval('moored.axys_adcp_id_seq', greatest(
+    (SELECT max(id) FROM moored.axys_adcp),
+    (SELECT last_value FROM moored.axys_adcp_id_seq)));
+SELECT setval('moored.axys_general_id_seq', greatest(
+    (SELECT max(id) FROM moored.axys_general),
+    (SELECT last_value FROM moored.axys_general_id_seq)));
+SELECT setval('moored.bmobr_raw_id_seq', greatest(
+    (SELECT max(id) FROM moored.bmobr_raw),
+    (SELECT last_value FROM moored.bmobr_raw_id_seq)));
+SELECT setval('moored.bmobr_triaxys_raw_id_seq', greatest(
+    (SELECT max(id) FROM moored.bmobr_triaxys_raw),
+    (SELECT max(id) FROM moored.triaxys_raw),
+    (SELECT max(id) FROM moored.triaxys_status),
+    (SELECT last_value FROM moored.bmobr_triaxys_raw_id_seq)));
+SELECT setval('moored.spotter_smart_moring_config_id_seq', greatest(
+    (SELECT max(id) FROM moored.spotter_smart_mooring_config),
+    (SELECT last_value FROM moored.spotter_smart_moring_config_id_seq)));
+SELECT setval('moored.spotter_system_id_seq', greatest(
+    (SELECT max(id) FROM moored.spotter_system),
+    (SELECT last_value FROM moored.spotter_system_id_seq)));
+SELECT setval('moored.alerts_id_seq', greatest(
+    (SELECT max(id) FROM moored.alerts),
+    (SELECT last_value FROM moored.alerts_id_seq)));
+SELECT setval('moored.setup_buoy_id_seq', greatest(
+    (SELECT max(id) FROM moored.setup_buoy),
+    (SELECT max(id) FROM moored.parameters),
+    (SELECT last_value FROM moored.setup_buoy_id_seq)));
+SELECT setval('sailbuoy.autopilot_data_id_seq', greatest(
+    (SELECT max(id) FROM sailbuoy.autopilot_data),
+    (SELECT last_value FROM sailbuoy.autopilot_data_id_seq)));
+SELECT setval('sailbuoy.datalogger_data_id_seq', greatest(
+    (SELECT max(id) FROM sailbuoy.datalogger_data),
+    (SELECT last_value FROM sailbuoy.datalogger_data_id_seq)));
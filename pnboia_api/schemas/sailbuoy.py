@@ -446,6 +446,11 @@ class DataloggerDataResponse(SailbuoyBase):
     class Config(SailbuoyBase.Config):
         pass
 
+class BulkInsertResponse(BaseModel):
+    """Result of a bulk autopilot/datalogger insert."""
+    inserted: int = Field(..., description="Number of rows inserted")
+    last_date_time: Dict[str, datetime] = Field(..., description="Latest sailbuoy_time of the batch, by sailbuoy_id")
+
 class PaginatedResponse(BaseModel):
     """Generic paginated response model."""
     total: int
@@ -0,0 +1,34 @@
+# coding: utf-8
+from pydantic import BaseModel
+from typing import Optional
+
+
+class CacheStatsBase(BaseModel):
+    hits: int
+    misses: int
+    size: int
+    maxsize: Optional[int]
+    ttl: float
+
+
+class PoolStatsBase(BaseModel):
+    pool: str
+    size: Optional[int]
+    in_use: int
+    overflow: int
+    checkouts: int
+    timeouts: int
+    connections: int
+    invalidations: int
+    checkout_ms_avg: float
+    checkout_ms_max: float
+
+
+class StreamStatsBase(BaseModel):
+    subscribers: int
+    buoys: int
+    polls: int
+    published: int
+    dropped: int
+    errors: int
+    interval: float
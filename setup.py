@@ -10,6 +10,12 @@ setup(name='pnboia_api',
       description="Project Description",
       packages=find_packages(),
       install_requires=requirements,
+      # optional: zstd responses and parquet/arrow downloads are offered
+      # only when they are installed
+      extras_require={
+          'zstd': ['zstandard'],
+          'columnar': ['pyarrow'],
+      },
       test_suite='tests',
       # include_package_data: to install data from MANIFEST.in
       include_package_data=True,
@@ -0,0 +1,97 @@
+import math
+import os
+from datetime import datetime
+
+# pnboia_api.db.base creates its engines at import; they only connect when used
+for key, value in {
+    'REMOBS_QC_DB_USR': 'pnboia',
+    'REMOBS_QC_DB_PASSWORD': 'pnboia',
+    'REMOBS_QC_DB_URL': 'localhost:5432',
+    'REMOBS_QC_DB': 'pnboia',
+}.items():
+    os.environ.setdefault(key, value)
+
+import pytest
+from sqlalchemy import Integer, create_engine, event
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+# the PostgreSQL schemas of the models, attached as SQLite databases
+SCHEMAS = ('adm', 'drift', 'moored', 'qualified_data', 'quality_control', 'sailbuoy')
+
+
+def greatest(*values):
+    values = [value for value in values if value is not None]
+    return max(values) if values else None
+
+
+def date_trunc(unit, value):
+    """date_trunc of the 'hour' and 'day' units, on SQLite's DateTime strings."""
+    if value is None:
+        return None
+    value = datetime.fromisoformat(value).replace(minute=0, second=0, microsecond=0)
+    if unit == 'day':
+        value = value.replace(hour=0)
+    return value.isoformat(" ")
+
+
+MATH_FUNCTIONS = {
+    'radians': lambda x: None if x is None else math.radians(x),
+    'degrees': lambda x: None if x is None else math.degrees(x),
+    'sin': lambda x: None if x is None else math.sin(x),
+    'cos': lambda x: None if x is None else math.cos(x),
+    'atan2': lambda y, x: None if y is None or x is None else math.atan2(y, x),
+    'mod': lambda x, y: None if x is None or y is None else math.fmod(x, y),
+}
+
+
+@pytest.fixture
+def engine():
+    """In-memory SQLite engine standing in for the PostgreSQL database."""
+    # shared with the threadpool the sync endpoints run in
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+
+    @event.listens_for(engine, "connect")
+    def connect(dbapi_connection, connection_record):
+        for schema in SCHEMAS:
+            dbapi_connection.execute(f"ATTACH DATABASE ':memory:' AS {schema}")
+        # PostgreSQL functions the queries under test use
+        dbapi_connection.create_function("greatest", -1, greatest)
+        dbapi_connection.create_function("date_trunc", 2, date_trunc)
+        # math functions, which not every SQLite build has
+        for name, function in MATH_FUNCTIONS.items():
+            dbapi_connection.create_function(name, function.__code__.co_argcount, function)
+        for name in ("ST_AsEWKB", "AsEWKB"):
+            dbapi_connection.create_function(name, 1, lambda value: value)
+
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    session = Session(bind=engine)
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def create_tables(engine):
+    """
+    Create the tables of the given models. Columns are left untyped, since
+    the server defaults and computed columns of the models are PostgreSQL
+    only; a single integer primary key is an SQLite rowid, so it is
+    allocated on insert like the sequences do.
+    """
+    def create(*models):
+        for model in models:
+            table = model.__table__
+            columns = []
+            for column in table.columns:
+                if list(table.primary_key) == [column] and isinstance(column.type, Integer):
+                    columns.append(f'"{column.name}" INTEGER PRIMARY KEY')
+                else:
+                    columns.append(f'"{column.name}"')
+            with engine.begin() as connection:
+                connection.exec_driver_sql(f"CREATE TABLE {table.fullname} ({', '.join(columns)})")
+    return create
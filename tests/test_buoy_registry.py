@@ -0,0 +1,37 @@
+import pytest
+from sqlalchemy import insert, text, update
+
+from pnboia_api.core.cache import TableVersion
+from pnboia_api.crud import crud_moored
+from pnboia_api.models.moored import Buoy
+
+
+@pytest.fixture
+def registry(db, create_tables, monkeypatch):
+    create_tables(Buoy)
+    db.execute(insert(Buoy), [{'buoy_id': 1, 'name': 'SPOTTER 1', 'open_data': True}])
+    db.commit()
+    # fingerprint_query is PostgreSQL only
+    version = TableVersion(text("SELECT group_concat(buoy_id || ':' || open_data) FROM moored.buoys"), check=0)
+    registry = crud_moored.BuoyRegistry(refresh=3600, version=version)
+    monkeypatch.setattr(crud_moored, 'buoy_registry', registry)
+    return registry
+
+
+def close_elsewhere(engine):
+    """Close the buoy data the way another worker would, behind the registry."""
+    with engine.begin() as connection:
+        connection.execute(update(Buoy).where(Buoy.buoy_id == 1).values(open_data=False))
+
+
+def test_lookups_are_served_from_the_registry(db, registry):
+    assert crud_moored.buoy.show_cached(db=db, id_pk=1).open_data
+    crud_moored.buoy.show_cached(db=db, id_pk=1)
+    assert (registry.hits, registry.misses) == (1, 1)
+
+
+def test_closed_buoy_is_seen_on_the_next_lookup(db, engine, registry):
+    assert crud_moored.buoy.show_cached(db=db, id_pk=1).open_data
+    close_elsewhere(engine)
+    assert not crud_moored.buoy.show_cached(db=db, id_pk=1).open_data
+    assert registry.misses == 2
@@ -0,0 +1,93 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import insert, text
+
+from pnboia_api.crud.crud_qualified_data import qualified_data
+from pnboia_api.models.qualified_data import QualifiedData
+
+START = datetime(2024, 1, 1)
+
+
+@pytest.fixture
+def rows(db, engine, create_tables):
+    create_tables(QualifiedData)
+    # the columns the stamp_change trigger fills, which the models do not map
+    with engine.begin() as connection:
+        connection.exec_driver_sql("ALTER TABLE qualified_data.qualified_data ADD COLUMN change_id")
+        connection.exec_driver_sql("ALTER TABLE qualified_data.qualified_data ADD COLUMN updated_at")
+    # rows written before the trigger: no change_id nor updated_at
+    db.execute(insert(QualifiedData), [
+        {'id': index, 'buoy_id': 1, 'date_time': START + timedelta(hours=index)} for index in range(1, 6)
+    ])
+    db.commit()
+
+
+def stamp(db, id, change_id, updated_at):
+    """What the trigger does when row `id` is updated."""
+    db.execute(
+        text("UPDATE qualified_data.qualified_data SET change_id = :change_id, updated_at = :updated_at WHERE id = :id"),
+        {'id': id, 'change_id': change_id, 'updated_at': updated_at.strftime("%Y-%m-%d %H:%M:%S.%f")},
+    )
+    db.commit()
+
+
+def harvest(db, since_id=None, limit=2):
+    """Every row id and the high-water marks, following them until nothing changed."""
+    ids, marks = [], []
+    while True:
+        page, mark = qualified_data.changes(db=db, since_id=since_id, limit=limit, arguments={'buoy_id=': 1})
+        ids += [row.id for row in page]
+        marks.append(mark)
+        if mark == since_id:
+            return ids, marks
+        since_id = mark
+
+
+def test_high_water_mark(db, rows):
+    ids, marks = harvest(db)
+    assert ids == [1, 2, 3, 4, 5]
+    # the ids stand in for the change_id of rows the trigger has not stamped
+    assert marks == [2, 4, 5, 5]
+
+
+def test_updated_rows_are_synced_again(db, rows):
+    stamp(db, 2, 10, datetime.utcnow() - timedelta(hours=1))
+
+    page, mark = qualified_data.changes(db=db, since_id=5, arguments={'buoy_id=': 1})
+    assert [row.id for row in page] == [2]
+    assert page[0].change_id == mark == 10
+    # ...and only once
+    assert qualified_data.changes(db=db, since_id=mark, arguments={'buoy_id=': 1}) == ([], 10)
+
+
+def test_recent_changes_wait_to_settle(db, rows):
+    stamp(db, 3, 11, datetime.utcnow())
+    ids, marks = harvest(db, since_id=5)
+    assert ids == [] and marks == [5]
+
+
+def test_since_ts_is_change_time(db, rows):
+    # observed on START + 4h, updated long after
+    stamp(db, 4, 12, START + timedelta(days=30))
+
+    page, mark = qualified_data.changes(db=db, since_ts=(START + timedelta(days=1)).isoformat(), arguments={'buoy_id=': 1})
+    assert [row.id for row in page] == [4]
+    assert mark == 12
+
+
+def test_invalid_since_ts(db, rows):
+    with pytest.raises(HTTPException) as error:
+        qualified_data.changes(db=db, since_ts="yesterday")
+    assert error.value.status_code == 400
+
+
+def test_without_change_tracking(db, create_tables, monkeypatch):
+    create_tables(QualifiedData)
+    # found by the tests before
+    monkeypatch.setattr(qualified_data, 'change_tracking', False)
+    for sync in (lambda: qualified_data.changes(db=db, since_id=0), lambda: qualified_data.high_water_mark(db)):
+        with pytest.raises(HTTPException) as error:
+            sync()
+        assert error.value.status_code == 501
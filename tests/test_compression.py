@@ -0,0 +1,128 @@
+import asyncio
+import gzip
+import json
+
+import pytest
+from starlette.responses import Response, StreamingResponse
+
+from pnboia_api.app.compression import CompressionMiddleware, negotiate, zstandard
+
+# zstd is optional (the `zstd` extra)
+ZSTD = pytest.param('zstd', marks=pytest.mark.skipif(zstandard is None, reason="zstandard is not installed"))
+
+BODY = json.dumps([{'buoy_id': 2, 'date_time': f'2024-01-01T{hour:02}:00:00', 'sst': 21.5} for hour in range(24)] * 40).encode()
+CHUNKS = [BODY[start:start + 8192] for start in range(0, len(BODY), 8192)]
+
+
+class Receive:
+    """The request once, then nothing until the response is sent, like a client that stays connected."""
+
+    def __init__(self):
+        self.sent = False
+
+    async def __call__(self):
+        if self.sent:
+            await asyncio.sleep(3600)
+        self.sent = True
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+
+def request(app, accept_encoding='gzip', messages=None):
+    """Run `app` behind the middleware; the headers of the response and its body messages."""
+    scope = {
+        'type': 'http', 'method': 'GET', 'path': '/', 'query_string': b'',
+        'headers': [(b'accept-encoding', accept_encoding.encode())] if accept_encoding else [],
+    }
+    messages = [] if messages is None else messages
+    receive = Receive()
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(CompressionMiddleware(app, minimum_size=1024)(scope, receive, send))
+    start, *bodies = messages
+    return {key.decode(): value.decode() for key, value in start['headers']}, bodies
+
+
+def decompress(encoding, data):
+    if encoding == 'zstd':
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    return gzip.decompress(data)
+
+
+@pytest.mark.parametrize("accept_encoding, encoding", [
+    ('gzip', 'gzip'),
+    pytest.param('gzip, zstd', 'zstd', marks=ZSTD.marks),
+    ('zstd;q=0, *', 'gzip'),
+])
+def test_single_message(accept_encoding, encoding):
+    headers, bodies = request(Response(BODY, media_type='application/json', headers={'ETag': '"abc"'}), accept_encoding)
+
+    assert len(bodies) == 1
+    assert headers['content-encoding'] == encoding
+    assert headers['vary'] == 'Accept-Encoding'
+    assert headers['etag'] == 'W/"abc"'
+    assert int(headers['content-length']) == len(bodies[0]['body']) < len(BODY)
+    assert decompress(encoding, bodies[0]['body']) == BODY
+
+
+@pytest.mark.parametrize("encoding", ['gzip', ZSTD])
+def test_streaming(encoding):
+    async def chunks():
+        for chunk in CHUNKS:
+            yield chunk
+
+    headers, bodies = request(StreamingResponse(chunks(), media_type='text/csv'), encoding)
+
+    assert headers['content-encoding'] == encoding
+    assert 'content-length' not in headers
+    assert [body['more_body'] for body in bodies][-1] is False
+    assert decompress(encoding, b''.join(body['body'] for body in bodies)) == BODY
+
+
+@pytest.mark.parametrize("encoding", ['gzip', ZSTD])
+def test_streaming_is_not_buffered(encoding):
+    # a few MB of rows: more than the compressors keep before emitting a block
+    rows = (f"2,2024-01-01T00:{minute % 60:02}:00,{minute * 0.37 % 31:.2f},{minute * 7 % 360}\n" for minute in range(200000))
+    data = "".join(rows).encode()
+    chunks = [data[start:start + 65536] for start in range(0, len(data), 65536)]
+    messages = []
+    sent = []
+
+    async def stream():
+        for chunk in chunks:
+            # the messages the middleware has passed on by now
+            sent.append(len(messages) - 1)
+            yield chunk
+
+    headers, bodies = request(StreamingResponse(stream(), media_type='text/csv'), encoding, messages=messages)
+
+    # compressed data went out before the last chunk was produced
+    assert sent[-1] > 0
+    assert decompress(encoding, b''.join(body['body'] for body in bodies)) == data
+
+
+def test_small_body_is_sent_as_is():
+    headers, bodies = request(Response(b'{"ok": true}', media_type='application/json'))
+    assert 'content-encoding' not in headers
+    assert bodies[0]['body'] == b'{"ok": true}'
+
+
+@pytest.mark.parametrize("media_type", ['application/vnd.apache.parquet', 'text/event-stream'])
+def test_passthrough_types(media_type):
+    headers, bodies = request(Response(BODY, media_type=media_type))
+    assert 'content-encoding' not in headers
+    assert bodies[0]['body'] == BODY
+
+
+def test_without_accept_encoding():
+    headers, bodies = request(Response(BODY, media_type='application/json'), accept_encoding=None)
+    assert 'content-encoding' not in headers
+    assert bodies[0]['body'] == BODY
+
+
+def test_negotiate():
+    assert negotiate('') is None
+    assert negotiate('identity') is None
+    assert negotiate('gzip;q=0, zstd;q=0') is None
+    assert negotiate('br, gzip;q=0.5') == 'gzip'
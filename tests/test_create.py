@@ -0,0 +1,81 @@
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event, insert
+from sqlalchemy.dialects import postgresql
+
+from pnboia_api.crud.crud_moored import bmobr_general
+from pnboia_api.crud.crud_qualified_data import qualified_data
+from pnboia_api.crud.crud_quality_control import general
+from pnboia_api.models.qualified_data import QualifiedData
+from pnboia_api.models.quality_control import General
+
+
+@pytest.fixture
+def statements(engine):
+    """The SQL sent to the database."""
+    statements = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def executed(connection, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    yield statements
+    event.remove(engine, "before_cursor_execute", executed)
+
+
+def test_sequence_key_is_left_to_the_database(db, create_tables, statements):
+    create_tables(General)
+
+    # an id sent by the client is not used
+    first = general.create(db=db, obj_in={'id': 7, 'buoy_id': 1})
+    second = general.create(db=db, obj_in={'buoy_id': 2})
+
+    assert (first.id, second.id) == (1, 2)
+    assert not any('max(' in statement for statement in statements)
+
+
+def test_missing_sequence_falls_back_to_max_plus_one(db, engine, create_tables, monkeypatch):
+    create_tables(General)
+    db.execute(insert(General), [{'id': 4, 'buoy_id': 1}])
+    db.commit()
+    # a database with sequences, where 003_id_sequences.sql was not run yet
+    monkeypatch.setattr(engine.dialect, 'supports_sequences', True)
+    monkeypatch.setattr(engine.dialect, 'has_sequence', lambda connection, name, schema=None, **kw: False)
+    monkeypatch.setattr(general, 'id_sequence_found', False)
+
+    assert general.create(db=db, obj_in={'buoy_id': 2}).id == 5
+    assert general.id_sequence_found is False
+
+
+def test_sequence_key_is_drawn_in_the_insert():
+    statement = insert(General.__table__).values(buoy_id=1).return_defaults()
+    sql = str(statement.compile(dialect=postgresql.dialect()))
+    assert "VALUES (nextval('quality_control.general_id_seq')" in sql
+    assert "RETURNING quality_control.general.id" in sql
+
+
+def test_key_without_sequence_is_max_plus_one(db, create_tables):
+    create_tables(QualifiedData)
+    db.execute(insert(QualifiedData), [{'id': 5, 'buoy_id': 1, 'date_time': datetime(2024, 1, 1)}])
+    db.commit()
+
+    assert qualified_data.id_sequence() is None
+    assert qualified_data.create(db=db, obj_in={'buoy_id': 1}).id == 6
+    # a key given by the client is kept
+    assert qualified_data.create(db=db, obj_in={'id': 20, 'buoy_id': 1}).id == 20
+
+
+def test_update_missing_row(db, create_tables):
+    create_tables(General)
+    with pytest.raises(HTTPException) as error:
+        general.update(db=db, id_pk=1, obj_in={'buoy_id': 2})
+    assert error.value.status_code == 404
+
+
+def test_update_composite_key(db):
+    assert bmobr_general.primary_key is None
+    with pytest.raises(HTTPException) as error:
+        bmobr_general.update(db=db, id_pk=1, obj_in={})
+    assert error.value.status_code == 400
@@ -0,0 +1,107 @@
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from pnboia_api.app.feed import ObservationFeed, Subscription, synoptic_buoys
+from pnboia_api.crud.crud_qualified_data import qualified_data
+from pnboia_api.models.qualified_data import QualifiedData
+
+START = datetime(2024, 1, 1)
+
+
+@pytest.fixture
+def feed(engine, create_tables, monkeypatch):
+    create_tables(QualifiedData)
+    with engine.begin() as connection:
+        connection.exec_driver_sql("ALTER TABLE qualified_data.qualified_data ADD COLUMN change_id")
+        connection.exec_driver_sql("ALTER TABLE qualified_data.qualified_data ADD COLUMN updated_at")
+
+    feed = ObservationFeed(qualified_data, name='test', interval=3600)
+    monkeypatch.setattr(feed, 'session', lambda: Session(bind=engine))
+    # the LATERAL lookup of the store is PostgreSQL only
+    monkeypatch.setattr(qualified_data.latest, 'reload', lambda db: {})
+    yield feed
+
+
+def write(db, ids, buoy_id=1):
+    db.execute(insert(QualifiedData), [
+        {'id': id, 'buoy_id': buoy_id, 'date_time': START + timedelta(hours=id)} for id in ids
+    ])
+    db.commit()
+
+
+def test_poll_publishes_every_new_row(db, feed):
+    write(db, [1, 2])
+    assert feed.poll() == []
+    assert feed.high_water_mark == 2
+
+    write(db, [3, 4, 5])
+    rows = feed.poll()
+    assert [row.id for row in rows] == [3, 4, 5]
+    assert feed.high_water_mark == 5
+
+
+def test_publish_queues_rows_of_the_subscribed_buoys(db, feed):
+    write(db, [1])
+    write(db, [2], buoy_id=2)
+    feed.high_water_mark = 0
+
+    async def follow():
+        subscription = feed.subscribe([1])
+        feed.task.cancel()
+        feed.publish(feed.poll())
+        return [subscription.queue.get_nowait().id for _ in range(subscription.queue.qsize())]
+
+    assert asyncio.run(follow()) == [1]
+    assert feed.latest[2].id == 2
+
+
+def test_subscription_since_skips_rows_already_sent(db, feed):
+    write(db, [1, 2, 3])
+    feed.high_water_mark = 0
+    rows = feed.poll()
+
+    async def follow():
+        subscription = feed.subscribe(since=2)
+        feed.task.cancel()
+        feed.publish(rows)
+        return [subscription.queue.get_nowait().id for _ in range(subscription.queue.qsize())]
+
+    assert asyncio.run(follow()) == [3]
+
+
+def test_replay_after_last_event_id(db, feed):
+    write(db, [1, 2, 3])
+    write(db, [4], buoy_id=2)
+
+    subscription = Subscription([1])
+    rows, high_water_mark = feed.replay(1, subscription)
+    assert [row.id for row in rows] == [2, 3]
+    assert high_water_mark == 3
+    assert feed.replay(high_water_mark, subscription) == ([], 3)
+
+
+def test_project_2_buoys_are_synoptic_for_other_users():
+    buoys = [SimpleNamespace(buoy_id=1, project_id=1), SimpleNamespace(buoy_id=2, project_id=2)]
+    assert synoptic_buoys(SimpleNamespace(user_type='user'), buoys) == {2}
+    assert synoptic_buoys(SimpleNamespace(user_type='petrobras'), buoys) == set()
+    assert synoptic_buoys(SimpleNamespace(user_type='admin'), buoys) == set()
+
+
+def test_synoptic_subscription_skips_other_hours(db, feed):
+    # hours 1 to 6 of buoy 2, a project 2 buoy followed by a user who is not petrobras
+    write(db, range(1, 7), buoy_id=2)
+    buoys = [SimpleNamespace(buoy_id=2, project_id=2)]
+    subscription = Subscription([2], synoptic=synoptic_buoys(SimpleNamespace(user_type='user'), buoys))
+
+    rows, high_water_mark = feed.replay(0, subscription)
+    assert [row.date_time.hour for row in rows] == [3, 6]
+    # the mark still moves past the rows left out
+    assert high_water_mark == 6
+
+    feed.high_water_mark = 0
+    assert [row.date_time.hour for row in feed.poll() if subscription.wants(row)] == [3, 6]
@@ -0,0 +1,62 @@
+from datetime import datetime
+
+from sqlalchemy import insert, select
+from sqlalchemy.dialects import postgresql
+
+from pnboia_api.crud.crud_qualified_data import qualified_data
+from pnboia_api.models.qualified_data import QualifiedData
+
+
+def compile_filters(arguments, **kwargs):
+    statement = select(QualifiedData.id).filter(*qualified_data.create_filters(arguments, **kwargs))
+    compiled = statement.compile(dialect=postgresql.dialect())
+    return str(compiled), compiled.params
+
+
+def test_values_are_bound():
+    sql, params = compile_filters({'buoy_id=': 2, 'date_time>=': '2024-01-01T00:00:00'})
+    assert "qualified_data.qualified_data.buoy_id = %(buoy_id_1)s" in sql
+    assert "qualified_data.qualified_data.date_time >= %(date_time_1)s" in sql
+    assert params == {'buoy_id_1': 2, 'date_time_1': datetime(2024, 1, 1)}
+
+
+def test_statement_text_does_not_depend_on_values():
+    first, _ = compile_filters({'buoy_id=': 2, 'date_time>=': '2024-01-01'})
+    second, _ = compile_filters({'buoy_id=': 5, 'date_time>=': '2023-06-30T12:00:00'})
+    assert first == second
+
+
+def test_in_and_not_in():
+    sql, params = compile_filters({'buoy_id': ['in', [1, 2]], 'raw_id': ['not in', [3]]})
+    assert "buoy_id IN (__[POSTCOMPILE_buoy_id_1])" in sql
+    assert "raw_id NOT IN (__[POSTCOMPILE_raw_id_1])" in sql
+    assert params == {'buoy_id_1': [1, 2], 'raw_id_1': [3]}
+
+
+def test_any_is_a_single_array_parameter():
+    sql, params = compile_filters({'buoy_id': ['any', [1, 2, 3]]})
+    assert "buoy_id = ANY (%(param_1)s::SMALLINT[])" in sql
+    assert params == {'param_1': [1, 2, 3]}
+
+
+def test_extract_key():
+    sql, params = compile_filters({'extract(hour from date_time)': ['in', [0, 12]]})
+    assert "EXTRACT(hour FROM qualified_data.qualified_data.date_time) IN" in sql
+    assert list(params.values()) == [[0, 12]]
+
+
+def test_unknown_column_is_kept_as_literal():
+    sql, params = compile_filters({'sensor_name<>': 'x'})
+    assert "WHERE sensor_name != %(sensor_name_1)s" in sql
+    assert params == {'sensor_name_1': 'x'}
+
+
+def test_filters_select_rows(db, create_tables):
+    create_tables(QualifiedData)
+    db.execute(insert(QualifiedData), [
+        {'id': 1, 'buoy_id': 1, 'date_time': datetime(2024, 1, 1)},
+        {'id': 2, 'buoy_id': 1, 'date_time': datetime(2024, 1, 2)},
+        {'id': 3, 'buoy_id': 2, 'date_time': datetime(2024, 1, 2)},
+    ])
+    filters = qualified_data.create_filters({'buoy_id=': 1, 'date_time>=': '2024-01-02'})
+    assert [row.id for row in db.query(QualifiedData.id).filter(*filters)] == [2]
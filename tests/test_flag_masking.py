@@ -0,0 +1,68 @@
+import itertools
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import insert
+
+from pnboia_api.crud.crud_qualified_data import qualified_data
+from pnboia_api.models.qualified_data import QualifiedData
+
+PARAMETERS = ('sst', 'pres', 'wspd1', 'latitude')
+FLAGS = (None, 0, 1, 4, 49, 50, 51)
+
+
+@pytest.fixture
+def rows(db, create_tables):
+    create_tables(QualifiedData)
+    rows = []
+    # every flag for every parameter, in shifting combinations
+    for index, flags in enumerate(itertools.islice(itertools.product(FLAGS, repeat=len(PARAMETERS)), 0, None, 5)):
+        row = {'id': index + 1, 'buoy_id': 1, 'date_time': datetime(2024, 1, 1) + timedelta(minutes=10 * index)}
+        for number, (parameter, flag) in enumerate(zip(PARAMETERS, flags)):
+            row[parameter] = float(index * 10 + number)
+            row[f'flag_{parameter}'] = flag
+        rows.append(row)
+    db.execute(insert(QualifiedData), rows)
+    db.commit()
+    return rows
+
+
+def pandas_masking(rows, flag):
+    """The DataFrame masking /qualified_data and /petrobras did before it moved to SQL."""
+    result_df = pd.DataFrame(rows)
+    column_flag = []
+    for column in result_df.columns:
+        if column[0:4] == "flag":
+            column_flag.append(column.split("_")[1])
+    for c in column_flag:
+        if c not in ['latitude', 'longitude']:
+            if flag == 'all':
+                result_df.loc[result_df[f"flag_{c}"]>0, f'{c}'] = np.nan
+            elif flag == 'soft':
+                result_df.loc[(result_df[f"flag_{c}"]>0)&(result_df[f"flag_{c}"]<50), f'{c}'] = np.nan
+    return result_df
+
+
+@pytest.mark.parametrize("flag", ['all', 'soft'])
+def test_sql_masking_matches_pandas(db, rows, flag):
+    expected = pandas_masking(rows, flag)
+    result = qualified_data.index(db=db, order=True, arguments={'buoy_id=': 1}, flag=flag)
+
+    assert [row.id for row in result] == list(expected['id'])
+    for row, (_, expected_row) in zip(result, expected.iterrows()):
+        for parameter in PARAMETERS:
+            value = getattr(row, parameter)
+            if pd.isna(expected_row[parameter]):
+                assert value is None, (row.id, parameter)
+            else:
+                assert value == expected_row[parameter], (row.id, parameter)
+            # flags are returned whatever the masking
+            assert getattr(row, f'flag_{parameter}') == rows[row.id - 1][f'flag_{parameter}']
+
+
+def test_masking_is_not_a_no_op(db, rows):
+    result = qualified_data.index(db=db, order=True, arguments={'buoy_id=': 1}, flag='all')
+    assert any(row.sst is None for row in result)
+    assert all(row.latitude is not None for row in result)
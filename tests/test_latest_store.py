@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, insert
+
+from pnboia_api.crud import crud_qualified_data
+from pnboia_api.crud.crud_qualified_data import qualified_data
+from pnboia_api.models.qualified_data import QualifiedData
+
+
+@pytest.fixture
+def primary_only(monkeypatch):
+    """A replica other than the test database, so `db` stands for a primary session."""
+    replica = create_engine("sqlite://")
+    monkeypatch.setattr(crud_qualified_data, 'replica_engine', replica)
+    yield
+    replica.dispose()
+
+
+def test_store_serves_replica_sessions(db, engine, monkeypatch):
+    monkeypatch.setattr(crud_qualified_data, 'replica_engine', engine)
+    assert qualified_data.latest.serves(db)
+
+
+def test_store_does_not_serve_primary_sessions(db, primary_only):
+    assert not qualified_data.latest.serves(db)
+
+
+def test_last_on_the_primary_reads_the_database(db, create_tables, primary_only, monkeypatch):
+    create_tables(QualifiedData)
+    db.execute(insert(QualifiedData), [
+        {'id': index, 'buoy_id': 1, 'date_time': datetime(2024, 1, 1) + timedelta(hours=index)}
+        for index in range(1, 4)
+    ])
+    db.commit()
+
+    def stale_store(db):
+        raise AssertionError("the store was read")
+    monkeypatch.setattr(qualified_data.latest, 'get_all', stale_store)
+
+    result = qualified_data.last(db=db, arguments={'buoy_id=': 1}, last=True, buoy_sel=True)
+    assert result[0].date_time == datetime(2024, 1, 1, 3)
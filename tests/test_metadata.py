@@ -0,0 +1,29 @@
+import pytest
+from sqlalchemy import insert, text
+
+from pnboia_api.app.metadata import REFERENCE_MODELS, MetadataService
+from pnboia_api.models.moored import SetupBuoy
+
+SETUP = {
+    'height_anemometer_1': 4.7, 'height_anemometer_2': 4.3, 'height_thermohygrometer': 3.8,
+    'height_barometer': 3.8, 'blanking_distance_adcp': 0.5, 'depth_temp_sensor': 1,
+}
+
+
+@pytest.fixture
+def metadata(db, create_tables, monkeypatch):
+    create_tables(*REFERENCE_MODELS)
+    # fingerprint_query is PostgreSQL only
+    monkeypatch.setattr(MetadataService, 'fingerprint', text("SELECT count(*) FROM moored.setup_buoy"))
+    return MetadataService(refresh=3600)
+
+
+def test_adcp_bin_depths_of_the_latest_setup(db, metadata):
+    db.execute(insert(SetupBuoy), [
+        {**SETUP, 'register_id': 2, 'depth_adcp': 5, 'cell_size_adcp': 3.5, 'number_cells_adcp': 20},
+        {**SETUP, 'register_id': 2, 'depth_adcp': 2, 'cell_size_adcp': 4, 'number_cells_adcp': 3},
+        {**SETUP, 'register_id': 22, 'depth_adcp': 1.5, 'cell_size_adcp': 3.5, 'number_cells_adcp': 2},
+    ])
+    db.commit()
+
+    assert metadata.adcp_bin_depths(db) == {2: (2.0, 6.0, 10.0), 22: (1.5, 5.0)}
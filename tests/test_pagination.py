@@ -0,0 +1,65 @@
+import base64
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import insert
+
+from pnboia_api.crud.crud_qualified_data import qualified_data
+from pnboia_api.models.qualified_data import QualifiedData
+
+START = datetime(2024, 1, 1)
+
+
+@pytest.fixture
+def rows(db, create_tables):
+    create_tables(QualifiedData)
+    # buoy 1 reports three observations with the same date_time
+    times = [START, START + timedelta(hours=1), START + timedelta(hours=1), START + timedelta(hours=1), START + timedelta(hours=2)]
+    db.execute(insert(QualifiedData), [
+        {'id': index, 'buoy_id': buoy_id, 'date_time': date_time}
+        for index, (buoy_id, date_time) in enumerate([(1, time) for time in times] + [(2, START)], start=1)
+    ])
+    db.commit()
+
+
+def harvest(db, limit):
+    """Every id, following next_cursor until the last page."""
+    ids, cursor = [], None
+    while True:
+        page, cursor = qualified_data.paginate(db=db, limit=limit, cursor=cursor)
+        ids += [row.id for row in page]
+        if cursor is None:
+            return ids
+
+
+def test_cursor_round_trip():
+    row = QualifiedData(id=7, buoy_id=2, date_time=START)
+    assert qualified_data.decode_cursor(qualified_data.encode_cursor(row)) == (2, START, 7)
+
+
+def test_cursor_without_id_is_accepted():
+    cursor = base64.urlsafe_b64encode(json.dumps([2, START.isoformat()]).encode()).decode()
+    assert qualified_data.decode_cursor(cursor) == (2, START, None)
+
+
+@pytest.mark.parametrize("cursor", ["not a cursor", base64.urlsafe_b64encode(b'[1]').decode()])
+def test_invalid_cursor(cursor):
+    with pytest.raises(HTTPException) as error:
+        qualified_data.decode_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 10])
+def test_pages_cover_equal_date_times(db, rows, limit):
+    # pages of 2 end between the three rows at START + 1h
+    assert harvest(db, limit) == [1, 2, 3, 4, 5, 6]
+
+
+def test_last_page_has_no_cursor(db, rows):
+    page, cursor = qualified_data.paginate(db=db, limit=6)
+    assert len(page) == 6
+    assert cursor is not None
+    page, cursor = qualified_data.paginate(db=db, limit=6, cursor=cursor)
+    assert page == [] and cursor is None
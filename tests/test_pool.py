@@ -0,0 +1,73 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError
+
+from pnboia_api.db.pool import InstrumentedNullPool, InstrumentedQueuePool, instrument, pools
+
+
+@pytest.fixture
+def queue_engine(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}", poolclass=InstrumentedQueuePool,
+        pool_size=1, max_overflow=0, pool_timeout=0.1,
+    )
+    instrument(engine, 'test_queue')
+    yield engine
+    engine.dispose()
+    pools.pop('test_queue')
+
+
+def test_checkouts_are_counted(queue_engine):
+    for _ in range(3):
+        with queue_engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+
+    stats = pools['test_queue'].stats()
+    assert stats['pool'] == 'InstrumentedQueuePool'
+    assert (stats['size'], stats['in_use'], stats['checkouts'], stats['connections']) == (1, 0, 3, 1)
+    assert stats['checkout_ms_max'] >= stats['checkout_ms_avg'] > 0
+
+
+def test_in_use_and_timeouts(queue_engine):
+    with queue_engine.connect():
+        assert pools['test_queue'].stats()['in_use'] == 1
+        with pytest.raises(TimeoutError):
+            queue_engine.connect()
+
+    stats = pools['test_queue'].stats()
+    assert (stats['in_use'], stats['checkouts'], stats['timeouts']) == (0, 1, 1)
+
+
+def test_invalidations(queue_engine):
+    with queue_engine.connect() as connection:
+        connection.invalidate()
+    with queue_engine.connect():
+        pass
+
+    stats = pools['test_queue'].stats()
+    assert (stats['invalidations'], stats['connections'], stats['in_use']) == (1, 2, 0)
+
+
+def test_counting_survives_dispose(queue_engine):
+    with queue_engine.connect():
+        pass
+    queue_engine.dispose()
+    with queue_engine.connect():
+        pass
+
+    stats = pools['test_queue'].stats()
+    assert (stats['checkouts'], stats['connections'], stats['in_use']) == (2, 2, 0)
+    assert queue_engine.pool.metrics is pools['test_queue']
+
+
+def test_null_pool(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=InstrumentedNullPool)
+    instrument(engine, 'test_null')
+    try:
+        for _ in range(2):
+            with engine.connect():
+                pass
+        stats = pools['test_null'].stats()
+        assert (stats['size'], stats['in_use'], stats['checkouts'], stats['connections']) == (None, 0, 2, 2)
+    finally:
+        pools.pop('test_null')
@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import insert
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Query
+
+from pnboia_api.crud.crud_qualified_data import qualified_data
+from pnboia_api.models.qualified_data import QualifiedData
+
+START = datetime(2024, 1, 1)
+
+
+@pytest.fixture
+def rows(db, create_tables):
+    create_tables(QualifiedData)
+    db.execute(insert(QualifiedData), [
+        {'id': 1, 'buoy_id': 1, 'date_time': START, 'sst': 20, 'flag_sst': 0, 'wdir1': 350, 'flag_wdir1': 0},
+        {'id': 2, 'buoy_id': 1, 'date_time': START + timedelta(minutes=10), 'sst': 22, 'flag_sst': 0, 'wdir1': 10, 'flag_wdir1': 0},
+        # flagged values are left out of every aggregate
+        {'id': 3, 'buoy_id': 1, 'date_time': START + timedelta(minutes=20), 'sst': 30, 'flag_sst': 4, 'wdir1': 180, 'flag_wdir1': 1},
+        {'id': 4, 'buoy_id': 1, 'date_time': START + timedelta(hours=1, minutes=5), 'sst': 25, 'flag_sst': 0, 'wdir1': 80, 'flag_wdir1': 0},
+        {'id': 5, 'buoy_id': 1, 'date_time': START + timedelta(hours=1, minutes=15), 'sst': 27, 'flag_sst': 0, 'wdir1': 100, 'flag_wdir1': 0},
+        {'id': 6, 'buoy_id': 2, 'date_time': START + timedelta(minutes=30), 'sst': 18, 'flag_sst': 0, 'wdir1': 90, 'flag_wdir1': 0},
+    ])
+    db.commit()
+
+
+def resample(db, interval, agg):
+    result, columns = qualified_data.resample(db=db, interval=interval, agg=agg, fields=['sst', 'wdir1'])
+    assert columns == ['buoy_id', 'date_time', 'wdir1', 'sst']
+    return [(row.buoy_id, row.date_time, row.wdir1, float(row.sst)) for row in result]
+
+
+def test_hourly_mean(db, rows):
+    # 350 and 10 degrees average to north, not to 180
+    assert resample(db, '1h', 'mean') == [
+        (1, START, 0, 21.0),
+        (1, START + timedelta(hours=1), 90, 26.0),
+        (2, START, 90, 18.0),
+    ]
+
+
+@pytest.mark.parametrize("agg, expected", [
+    ('min', [(1, START, 10, 20.0), (1, START + timedelta(hours=1), 80, 25.0), (2, START, 90, 18.0)]),
+    ('max', [(1, START, 350, 22.0), (1, START + timedelta(hours=1), 100, 27.0), (2, START, 90, 18.0)]),
+])
+def test_hourly_min_max(db, rows, agg, expected):
+    assert resample(db, '1h', agg) == expected
+
+
+def test_daily_mean(db, rows):
+    assert resample(db, '1d', 'mean') == [(1, START, 45, 23.5), (2, START, 90, 18.0)]
+
+
+def test_circular_mean_of_opposite_quadrants(db, create_tables):
+    create_tables(QualifiedData)
+    db.execute(insert(QualifiedData), [
+        {'id': index, 'buoy_id': 1, 'date_time': START, 'wdir1': wdir1, 'flag_wdir1': 0}
+        for index, wdir1 in enumerate([300, 330, 20], start=1)
+    ])
+    result, _ = qualified_data.resample(db=db, interval='1d', agg='mean', fields=['wdir1'])
+    assert [row.wdir1 for row in result] == [336]
+
+
+def test_multi_hour_buckets_start_on_the_step(db, monkeypatch):
+    # interval arithmetic is PostgreSQL only, so the statement is compiled instead of run
+    statements = []
+    monkeypatch.setattr(Query, 'all', lambda query: statements.append(query.statement) or [])
+    qualified_data.resample(db=db, interval='3h', agg='mean', fields=['sst'])
+
+    sql = str(statements[0].compile(dialect=postgresql.dialect()))
+    bucket = (
+        "date_trunc('hour', qualified_data.qualified_data.date_time) - interval '1 hour' * "
+        "(CAST(EXTRACT(hour FROM qualified_data.qualified_data.date_time) AS INTEGER) %% 3)"
+    )
+    assert f"{bucket} AS date_time" in sql
+    assert f"GROUP BY qualified_data.qualified_data.buoy_id, {bucket} ORDER BY" in sql
+
+
+@pytest.mark.parametrize("interval, agg", [('2h', 'mean'), ('1h', 'median')])
+def test_invalid_resample(db, interval, agg):
+    with pytest.raises(HTTPException) as error:
+        qualified_data.resample(db=db, interval=interval, agg=agg)
+    assert error.value.status_code == 400
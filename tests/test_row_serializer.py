@@ -0,0 +1,53 @@
+import json
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from geoalchemy2.shape import from_shape
+from shapely.geometry import Point
+
+from pnboia_api.app.utils import RowSerializer
+from pnboia_api.models.qualified_data import QualifiedData
+from pnboia_api.schemas.qualified_data import (
+    QualifiedDataBase, QualifiedDataBaseAlias, QualifiedDataPetrobrasBase, SpotterQualifiedSchema
+)
+
+ROWS = [
+    # what the database driver returns: Decimal coordinates, ints in float columns
+    QualifiedData(
+        id=1, raw_id=10, buoy_id=2, date_time=datetime(2024, 1, 1, 12, 30),
+        latitude=Decimal('-25.1234'), longitude=Decimal('-45.5'),
+        geom=from_shape(Point(-45.5, -25.1234), srid=4326),
+        sst=21, flag_sst=0, wspd1=5.5, flag_wspd1=4, wdir1=270, swvht1=None,
+    ),
+    # floats in integer columns, no geometry, nothing else set
+    QualifiedData(id=2, buoy_id=2, date_time=datetime(2024, 1, 1, 12, 40), wdir1=180.0, flag_sst=1.0),
+]
+
+
+def pydantic_json(schema, row):
+    return json.loads(schema.from_orm(row).json(by_alias=True))
+
+
+@pytest.mark.parametrize("schema", [QualifiedDataBase, QualifiedDataBaseAlias, QualifiedDataPetrobrasBase, SpotterQualifiedSchema])
+@pytest.mark.parametrize("row", ROWS, ids=['driver values', 'coerced values'])
+def test_serializer_matches_pydantic(schema, row):
+    serializer = RowSerializer.for_schema(schema)
+    assert json.loads(serializer.dumps(row)) == pydantic_json(schema, row)
+
+
+def test_geometry_goes_through_the_schema_validator():
+    data = json.loads(RowSerializer.for_schema(QualifiedDataBaseAlias).dumps(ROWS[0]))
+    assert data['geom'] == 'POINT (-45.5 -25.1234)'
+
+
+def test_fields_restrict_the_output():
+    fields = ['buoy_id', 'date_time', 'sst']
+    serializer = RowSerializer.for_schema(SpotterQualifiedSchema, fields=fields)
+    expected = {key: value for key, value in pydantic_json(SpotterQualifiedSchema, ROWS[0]).items() if key in fields}
+    assert json.loads(serializer.dumps(ROWS[0])) == expected
+
+
+def test_dumps_list():
+    serializer = RowSerializer.for_schema(QualifiedDataBase)
+    assert json.loads(serializer.dumps_list(ROWS)) == [pydantic_json(QualifiedDataBase, row) for row in ROWS]
@@ -0,0 +1,104 @@
+import asyncio
+import json
+from datetime import datetime
+
+import pytest
+from fastapi import FastAPI, HTTPException
+
+from pnboia_api.app.v1.sailbuoy import VALID_TOKENS, router
+from pnboia_api.crud.crud_sailbuoy import autopilot_data
+from pnboia_api.db.database import get_db
+from pnboia_api.models.sailbuoy import AutopilotData, SailbuoyMetadata
+from pnboia_api.schemas.sailbuoy import AutopilotDataCreate
+
+START = datetime(2024, 1, 1)
+
+
+@pytest.fixture
+def sailbuoy(db, create_tables):
+    create_tables(SailbuoyMetadata, AutopilotData)
+    db.add(SailbuoyMetadata(sailbuoy_id='SB2432', name='SB2432A', imei='300434060000000', last_date_time=START))
+    db.commit()
+
+
+def message(hour, name='SB2432A', **fields):
+    return {'sailbuoy_id': 'SB2432', 'name': name, 'sailbuoy_time': START.replace(hour=hour).isoformat(), **fields}
+
+
+def post(app, path, body: bytes, content_type='application/json'):
+    """POST `body` to `app`; the status and the JSON response."""
+    scope = {
+        'type': 'http', 'method': 'POST', 'path': path,
+        'query_string': f'token={VALID_TOKENS[0]}'.encode(),
+        'headers': [(b'content-type', content_type.encode())],
+    }
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    start, *bodies = messages
+    return start['status'], json.loads(b''.join(body['body'] for body in bodies))
+
+
+@pytest.fixture
+def app(db):
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_db] = lambda: db
+    return app
+
+
+def test_create_bulk(db, sailbuoy):
+    result = autopilot_data.create_bulk(db=db, objs_in=[
+        AutopilotDataCreate(**message(3, lat=-23.5)), AutopilotDataCreate(**message(1)),
+    ])
+
+    assert result == {'inserted': 2, 'last_date_time': {'SB2432': START.replace(hour=3)}}
+    rows = db.query(AutopilotData).order_by(AutopilotData.id).all()
+    assert [(row.sailbuoy_id, row.sailbuoy_time.hour, row.lat) for row in rows] == [('SB2432', 3, -23.5), ('SB2432', 1, None)]
+    assert db.get(SailbuoyMetadata, 'SB2432').last_date_time == START.replace(hour=3)
+
+
+def test_create_bulk_keeps_a_later_last_date_time(db, sailbuoy):
+    db.get(SailbuoyMetadata, 'SB2432').last_date_time = START.replace(hour=12)
+    db.commit()
+
+    autopilot_data.create_bulk(db=db, objs_in=[AutopilotDataCreate(**message(3))])
+    db.expire_all()
+    assert db.get(SailbuoyMetadata, 'SB2432').last_date_time == START.replace(hour=12)
+
+
+def test_create_bulk_unknown_name(db, sailbuoy):
+    with pytest.raises(HTTPException) as error:
+        autopilot_data.create_bulk(db=db, objs_in=[AutopilotDataCreate(**message(3)), AutopilotDataCreate(**message(4, name='SB9999A'))])
+    assert error.value.status_code == 404
+    assert db.query(AutopilotData).count() == 0
+
+
+def test_create_bulk_empty(db, sailbuoy):
+    assert autopilot_data.create_bulk(db=db, objs_in=[]) == {'inserted': 0, 'last_date_time': {}}
+
+
+def test_bulk_route_json(app, db, sailbuoy):
+    status, result = post(app, '/autopilot/bulk', json.dumps([message(1), message(2)]).encode())
+    assert status == 200
+    assert result['inserted'] == 2
+
+
+def test_bulk_route_ndjson(app, db, sailbuoy):
+    body = "\n".join(json.dumps(item) for item in [message(1), message(2), message(3)]) + "\n"
+    status, result = post(app, '/autopilot/bulk', body.encode(), content_type='application/x-ndjson')
+    assert status == 200
+    assert result['inserted'] == 3
+
+
+def test_bulk_route_validates_every_item(app, db, sailbuoy):
+    status, result = post(app, '/autopilot/bulk', json.dumps([message(1), message(2, lat=120)]).encode())
+    assert status == 422
+    assert result['detail'][0]['loc'] == ['body', 1, 'lat']
+    assert db.query(AutopilotData).count() == 0
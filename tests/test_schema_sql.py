@@ -0,0 +1,23 @@
+import re
+from pathlib import Path
+
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateIndex
+
+from pnboia_api.models.qualified_data import BMOBrQualified, QualifiedData
+
+SQL = Path(__file__).parent.parent / "pnboia_api" / "models" / "sql"
+
+
+def normalize(sql):
+    return re.sub(r"\s+", " ", sql).strip()
+
+
+def test_synoptic_indexes_match_the_models():
+    script = normalize((SQL / "001_synoptic_indexes.sql").read_text())
+    for model in (QualifiedData, BMOBrQualified):
+        for index in model.__table__.indexes:
+            if index.dialect_options['postgresql']['where'] is None:
+                continue
+            ddl = str(CreateIndex(index).compile(dialect=postgresql.dialect()))
+            assert normalize(ddl.replace("CREATE INDEX", "CREATE INDEX CONCURRENTLY IF NOT EXISTS")) in script
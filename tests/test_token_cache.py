@@ -0,0 +1,51 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import insert, text, update
+
+from pnboia_api.crud import crud_adm
+from pnboia_api.models.adm import User
+
+TOKEN = 'abc'
+
+
+@pytest.fixture
+def users(db, create_tables, monkeypatch):
+    create_tables(User)
+    db.execute(insert(User), [{'id': 1, 'email': 'a@b.c', 'user_type': 'normal', 'password': 'x', 'token': TOKEN}])
+    db.commit()
+    # fingerprint_query is PostgreSQL only
+    version = crud_adm.TableVersion(text("SELECT group_concat(id || user_type || token) FROM adm.users"), check=0)
+    monkeypatch.setattr(crud_adm, 'users_version', version)
+    crud_adm.token_cache.clear()
+    yield
+    crud_adm.token_cache.clear()
+
+
+def change_elsewhere(engine, **values):
+    """Update adm.users the way another worker would, behind the cache."""
+    with engine.begin() as connection:
+        connection.execute(update(User).where(User.id == 1).values(**values))
+
+
+def verify(db):
+    return crud_adm.user.verify(db=db, arguments={'token=': TOKEN})
+
+
+def test_token_lookups_are_cached(db, engine, users):
+    assert verify(db) == crud_adm.TokenUser(id=1, user_type='normal')
+    crud_adm.users_version.check = 3600
+    change_elsewhere(engine, user_type='admin')
+    assert verify(db).user_type == 'normal'
+
+
+def test_changes_from_other_workers_drop_the_cache(db, engine, users):
+    assert verify(db).user_type == 'normal'
+    change_elsewhere(engine, user_type='admin')
+    assert verify(db).user_type == 'admin'
+
+
+def test_revoked_token_is_refused(db, engine, users):
+    verify(db)
+    change_elsewhere(engine, token='rotated')
+    with pytest.raises(HTTPException):
+        verify(db)